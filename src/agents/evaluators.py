@@ -0,0 +1,202 @@
+"""
+This module contains position evaluators, which give the prior probability of
+each move in a position and optionally an estimate of its value. They guide
+the selection of moves by the PUCT agent in `mcts_puct`.
+"""
+
+import numpy as np
+import rules
+
+
+class Evaluator(object):
+    """
+    Base class for evaluators, which gives every legal move the same prior and
+    makes no estimate of the value.
+    """
+
+    def evaluate(self, board, player):
+        """
+        Evaluates a position.
+
+        Args:
+            board (numpy.ndarray): two dimensional array representing the board
+            player (int): the side of the player to move
+
+        Returns:
+            numpy.ndarray: the prior probability of each cell, flattened, which
+                is zero for occupied cells and sums to one
+            float: the estimated value of the position for the player to move,
+                1 for a win, 0.5 for a draw and 0 for a loss, or None if it is
+                not estimated
+        """
+        empty = board.ravel() == rules.EMPTY
+        return empty / float(max(empty.sum(), 1)), None
+
+    def evaluate_batch(self, boards, players):
+        """
+        Evaluates a batch of positions. Evaluators that gain from batching,
+        such as networks, override this to evaluate them together.
+
+        Args:
+            boards (numpy.ndarray): array of shape (count, rows, cols) with the
+                boards
+            players (numpy.ndarray): the side of the player to move on each
+                board
+
+        Returns:
+            numpy.ndarray: array of shape (count, cells) with the prior
+                probability of each cell
+            [float]: the estimated value of each position for the player to
+                move, or None where it is not estimated
+        """
+        results = [self.evaluate(board, player)
+                for board, player in zip(boards, players)]
+        return (np.asarray([priors for priors, _ in results]),
+                [value for _, value in results])
+
+
+class AfterStateEvaluator(Evaluator):
+    """
+    Base class for evaluators backed by a table of after-state values, i.e.
+    values of the positions reached after a move, for the player who made it.
+
+    The prior of each move is a softmax over the values of the positions it
+    leads to, and the value of a position is the value recorded for it,
+    reversed to be for the player to move. Subclasses implement `value`.
+
+    Attributes:
+        temperature (float): softmax temperature, where lower temperatures
+            concentrate the priors on the moves with the highest values
+    """
+
+    def __init__(self, temperature=0.1):
+        """
+        Constructor.
+
+        Args:
+            temperature (float): softmax temperature for the priors
+        """
+        self.temperature = temperature
+
+    def evaluate(self, board, player):
+        empty = np.flatnonzero(board.ravel() == rules.EMPTY)
+        priors = np.zeros(board.size)
+        if len(empty):
+            board = board.copy()
+            values = np.empty(len(empty))
+            for i, cell in enumerate(empty):
+                board.flat[cell] = player
+                value = self.value(board, player)
+                values[i] = 0.5 if value is None else value
+                board.flat[cell] = rules.EMPTY
+            weights = np.exp((values - values.max()) / self.temperature)
+            priors[empty] = weights / weights.sum()
+        value = self.value(board, -player)
+        return priors, None if value is None else 1.0 - value
+
+    def value(self, board, player):
+        """
+        Returns the recorded value of a position.
+
+        Args:
+            board (numpy.ndarray): two dimensional array representing the board
+            player (int): the side of the player who made the last move
+
+        Returns:
+            float: the value of the position for the player who made the last
+                move, or None if it is not recorded
+        """
+        raise NotImplementedError
+
+
+class ReinforcementEvaluator(AfterStateEvaluator):
+    """
+    Adapter for the state value tables learned by the agents in the
+    `reinforcement` module.
+
+    The agents record values only for the positions reached by their own
+    moves, from their own point of view, so moves by the other side are given
+    the default value and positions reached by them are not valued.
+
+    Example use:
+    >> evaluator = ReinforcementEvaluator(trained_agent)
+    >> agent = MCTSAgentPUCT(evaluator=evaluator)
+
+    Attributes:
+        agent (Player): the reinforcement learning agent holding the table
+    """
+
+    def __init__(self, agent, temperature=0.1):
+        """
+        Constructor.
+
+        Args:
+            agent (Player): a trained `ReinforcementAgent1` or
+                `ReinforcementAgent2`, whose side is the side its values were
+                learned for
+            temperature (float): softmax temperature for the priors
+        """
+        super(ReinforcementEvaluator, self).__init__(temperature)
+        self.agent = agent
+
+    def value(self, board, player):
+        if player != self.agent.side:
+            return None
+        return self.agent.value(board)
+
+
+class RankValueEvaluator(AfterStateEvaluator):
+    """
+    Evaluator backed by an array of after-state values indexed by position
+    rank, as used by `tablebase` and `rollout.EpsilonGreedyRollout`.
+
+    Attributes:
+        values (numpy.ndarray): array indexed by position rank with the value
+            of each position for the player who made the last move
+    """
+
+    def __init__(self, values, temperature=0.1):
+        """
+        Constructor.
+
+        Args:
+            values (numpy.ndarray): array of values indexed by position rank,
+                such as the array returned by `rollout.tablebase_values`
+            temperature (float): softmax temperature for the priors
+        """
+        super(RankValueEvaluator, self).__init__(temperature)
+        self.values = values
+
+    def value(self, board, player):
+        powers = 3 ** np.arange(board.size, dtype=np.int64)
+        return float(self.values[np.dot(np.mod(board.ravel(), 3), powers)])
+
+
+class NetworkEvaluator(Evaluator):
+    """
+    Evaluator backed by a policy and value network such as
+    `network.MLPNetwork`, which evaluates batches of positions in a single
+    pass.
+
+    Attributes:
+        network (MLPNetwork): the network
+    """
+
+    def __init__(self, network):
+        """
+        Constructor.
+
+        Args:
+            network (MLPNetwork): the network, which must have been built for
+                the shape of the boards evaluated
+        """
+        self.network = network
+
+    def evaluate(self, board, player):
+        priors, values = self.evaluate_batch(board[np.newaxis], [player])
+        return priors[0], values[0]
+
+    def evaluate_batch(self, boards, players):
+        priors, values = self.network.predict(
+                np.asarray(boards).reshape(len(boards), -1), players)
+        return priors, list(values)
@@ -0,0 +1,92 @@
+"""
+This module contains agents that use Monte Carlo tree search with Sequential
+Halving at the root to select moves.
+"""
+
+from agents.mcts_ucb1 import MCTSAgentUCB1
+from agents.mcts_tree import ROOT, NO_NODE
+import math
+import numpy as np
+
+
+class MCTSAgentHalving(MCTSAgentUCB1):
+    """
+    Agent that uses Monte Carlo tree search (MCTS) with Sequential Halving at
+    the root and UCB1 below it to choose the next move.
+
+    UCB1 minimises the regret of every playout, so at the root it keeps
+    spending playouts on the move that looks best. Only the final choice
+    matters at the root, though, and with a fixed number of playouts that is
+    better served by spreading them so the best move is identified reliably.
+    Once every root move has a child, the playout budget is split into
+    ceil(log2(moves)) rounds. In each round the remaining moves share the
+    round's playouts equally, in turn, and the better half of them by value
+    go through to the next round. The move chosen is the best of the
+    moves remaining when the search stops.
+
+    The budget is max_playouts, so the search should not be stopped early by
+    the convergence limit or the time budget for the halving to finish.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """Constructor, taking the same arguments as `MCTSAgentUCB1`."""
+        super(MCTSAgentHalving, self).__init__(*args, **kwargs)
+        self.__survivors = None
+        self.__plan = []
+        self.__playouts = 0
+
+    def moves(self, board):
+        self.__survivors = None
+        self.__plan = []
+        self.__playouts = 0
+        best_moves = super(MCTSAgentHalving, self).moves(board)
+        if self.__survivors is None or self.processes > 1:
+            return best_moves
+        tree = self.tree
+        survivors = self.__survivors
+        values = self.__values(survivors)
+        return [tree.cell(tree.move[child])
+                for child in survivors[values == values.max()]]
+
+    def mcts(self, board, root_child=NO_NODE):
+        tree = self.tree
+        if (root_child == NO_NODE and tree.child_count[ROOT] and
+                not tree.has_untried(ROOT)):
+            if not self.__plan:
+                self.__next_round()
+            root_child = self.__plan.pop()
+        count = self.playout_count
+        root_child = super(MCTSAgentHalving, self).mcts(board, root_child)
+        self.__playouts += self.playout_count - count
+        return root_child
+
+    def __next_round(self):
+        """Keeps the better half of the remaining root children, or starts
+        the first round with all of them, and plans the playouts of the next
+        round."""
+        if self.__survivors is None:
+            self.__survivors = self.tree.children(ROOT)
+        elif len(self.__survivors) > 1:
+            values = self.__values(self.__survivors)
+            order = np.argsort(-values, kind='mergesort')
+            self.__survivors = self.__survivors[order[:(len(order) + 1) //
+                    2]]
+
+        # The playouts left are split equally between the rounds left, so
+        # any rounding of earlier rounds is made up in later ones, and each
+        # remaining child gets an equal share of the round, taken in turn
+        survivors = self.__survivors
+        rounds = max(int(math.ceil(math.log(len(survivors), 2))), 1)
+        share = max((self.max_playouts - self.__playouts) // (
+                self.rollout_batch * rounds * len(survivors)), 1)
+        self.__plan = np.tile(survivors, share)[::-1].tolist()
+
+    def __values(self, children):
+        """Returns the values of root children for the root player, raising
+        proven wins and lowering proven losses."""
+        tree = self.tree
+        targets = tree.target[children]
+        values = tree.wins[targets] / np.maximum(tree.visits[targets], 1)
+        if self.solver:
+            values = self.solver_scores(children, values)
+        return values
@@ -0,0 +1,105 @@
+"""
+This module contains tools to run Monte Carlo tree searches in parallel.
+"""
+
+from agents.mcts_tree import TreeStore, ROOT
+import multiprocessing
+import random
+import numpy as np
+
+
+class RootParallel(object):
+    """
+    Class running root-parallel MCTS, where independent searches of the same
+    position are run with different random seeds in a pool of worker
+    processes. The searches share nothing while running, so there is no
+    locking, and the statistics of the root children are merged once they
+    finish.
+
+    The pool is created on the first search and kept until `close` is called,
+    so the cost of starting the workers is not paid on every move.
+
+    Example use:
+    >> parallel = RootParallel(4)
+    >> tree = parallel.search(MCTSAgentUCB1, {'time_budget': 0.5}, board, side)
+    >> tree.best_moves()
+
+    Attributes:
+        processes (int): number of worker processes, and of searches run for
+            each position
+        playouts (int): total number of playouts in the last search
+    """
+
+    def __init__(self, processes):
+        """
+        Constructor.
+
+        Args:
+            processes (int): number of worker processes
+        """
+        self.processes = processes
+        self.playouts = 0
+        self.__pool = None
+
+    def search(self, agent_class, kwargs, board, side):
+        """
+        Runs one search in each worker and merges the results.
+
+        Args:
+            agent_class (type): the MCTS agent class to run in the workers,
+                which must store its tree in a `tree` attribute
+            kwargs (dict): keyword arguments for the agent constructor
+            board (numpy.ndarray): two dimensional array representing the board
+            side (int): the side of the player to move
+
+        Returns:
+            TreeStore: a tree holding the root and a child for every move
+                searched, with the visits and wins summed over the workers
+        """
+        if self.__pool is None:
+            self.__pool = multiprocessing.Pool(self.processes)
+        tasks = [(agent_class, kwargs, board, side, random.getrandbits(31))
+                for _ in range(self.processes)]
+        results = self.__pool.map(_search, tasks)
+
+        # Sum the statistics for each move over the workers
+        visits = np.zeros(board.size, dtype=np.int64)
+        wins = np.zeros(board.size)
+        self.playouts = 0
+        for root_visits, moves, move_visits, move_wins in results:
+            self.playouts += root_visits
+            np.add.at(visits, moves, move_visits)
+            np.add.at(wins, moves, move_wins)
+
+        tree = TreeStore(board, side)
+        tree.visits[ROOT] = self.playouts
+        tree.wins[ROOT] = wins.sum()
+        for move in np.flatnonzero(visits):
+            child_board = board.copy()
+            child_board.flat[move] = side
+            child = tree.add_child(ROOT, move, child_board)
+            tree.visits[child] = visits[move]
+            tree.wins[child] = wins[move]
+        return tree
+
+    def close(self):
+        """Shuts down the worker processes."""
+        if self.__pool is not None:
+            self.__pool.terminate()
+            self.__pool.join()
+            self.__pool = None
+
+
+def _search(task):
+    """Runs a single search in a worker process and returns the statistics of
+    the root and its children, read through any transposition links."""
+    agent_class, kwargs, board, side, seed = task
+    random.seed(seed)
+    np.random.seed(seed)
+    agent = agent_class(side=side, **kwargs)
+    agent.move(board)
+    tree = agent.tree
+    children = tree.children(ROOT)
+    targets = tree.target[children]
+    return (int(tree.visits[ROOT]), tree.move[children],
+            tree.visits[targets], tree.wins[targets])
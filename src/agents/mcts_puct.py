@@ -0,0 +1,353 @@
+"""
+This module contains agents that use Monte Carlo tree search guided by move
+priors (PUCT) to select moves.
+"""
+
+from agents.mcts_ucb1 import MCTSAgentUCB1
+from agents.mcts_tree import TreeStore, ROOT, NO_NODE
+from agents.evaluators import Evaluator
+import rules
+import math
+import numpy as np
+
+
+class MCTSAgentPUCT(MCTSAgentUCB1):
+    """
+    Agent that uses Monte Carlo tree search (MCTS) with PUCT selection to
+    choose the next move.
+
+    When a leaf is reached all of its children are added to the tree at once,
+    and an evaluator gives each of them a prior probability. Children are then
+    selected by the PUCT rule
+
+        Q + c_puct * P * sqrt(N) / (1 + n)
+
+    where Q is the child's value, P its prior, n its visits and N the visits
+    of its parent, so moves with high priors are searched first and the
+    search relies more on the values as the visits grow. Unvisited children
+    take the value of their parent. If the evaluator also estimates the value
+    of the leaf, the estimate is blended with the results of the games played
+    from it. The most visited move is chosen at the root.
+
+    Evaluators such as networks are much faster per position when given many
+    positions at once, so leaves may be queued and evaluated in batches. A
+    virtual loss is added to the path to each queued leaf until it is
+    evaluated, which steers the following selections onto other paths. When
+    the value estimates are given full weight no games are played from
+    batched leaves, so each leaf costs only its share of the evaluation.
+
+    Attributes:
+        evaluator (Evaluator): source of the move priors and leaf values
+        c_puct (float): weight of the priors relative to the values
+        value_weight (float): weight of the evaluator's value estimates
+            relative to the results of the games played from each leaf
+        eval_batch (int): number of leaves evaluated together, or 1 to
+            evaluate each leaf when it is reached
+        virtual_loss (int): number of lost games added to the path to each
+            queued leaf
+        sample_moves (int): number of tokens on the board below which moves
+            are drawn in proportion to the root visits rather than chosen
+            greedily, to vary the games for self-play
+        search_history ([(numpy.ndarray, int, numpy.ndarray)]): the flattened
+            board, the side to move and the root visit distribution over the
+            cells for each search since the game started
+    """
+
+    def __init__(self, time_budget=0.50, max_playouts=1000000,
+            convergence_limit=1000, uctk=math.sqrt(2), clock_interval=16,
+            reuse_tree=True, processes=1, rollout_batch=1,
+            transpositions=False, symmetries=False, max_nodes=None,
+            prune=True, rollout_policy=None, ponder=False, solver=False,
+            expand_all=False, minimax_cells=0, book=None, time_manager=None,
+            trace=None, confidence=None, evaluator=None, c_puct=1.5,
+            value_weight=0.5, eval_batch=1, virtual_loss=1, sample_moves=0,
+            side=None, logger=None):
+        """
+        Constructor.
+
+        Args:
+            time_budget (float): number of seconds to build tree and choose move
+            max_playouts (int): number of playouts to build tree and choose move
+            convergence_limit (int): number of playouts without a change in
+                the best moves after which the search stops
+            uctk (float): unused, as PUCT replaces the UCB1 exploration term
+            clock_interval (int): number of playouts between checks of the
+                time budget
+            reuse_tree (bool): when true the tree is kept between moves
+            processes (int): number of worker processes for root-parallel
+                search, or 1 to search in this process
+            rollout_batch (int): number of vectorised games played
+                from each new leaf, or 1 for a single playout
+            transpositions (bool): must be false, as priors are stored for
+                each move rather than each position
+            symmetries (bool): must be false, as transpositions are not
+                supported
+            max_nodes (int): optional limit on the number of node slots in the
+                tree
+            prune (bool): when true the tree is pruned to half of max_nodes
+                when it is full, otherwise it stops growing
+            rollout_policy (RolloutPolicy): optional policy playing the games
+                from each new leaf
+            ponder (bool): when true the agent keeps searching during the
+                opponent's turn
+            solver (bool): when true proven wins, losses and draws are
+                propagated up the tree and used to choose the move
+            expand_all (bool): must be false, as leaves are expanded a node at
+                a time
+            minimax_cells (int): number of empty cells at or below which
+                leaves are valued by minimax, or 0 for no exact values
+            book (OpeningBook): optional store of opening statistics carried
+                across games
+            time_manager (TimeManager): optional manager of a clock for the
+                whole game
+            trace (TraceRecorder): optional recorder of the root statistics
+            confidence (float): number of standard errors for the confidence
+                bounds of the early stopping rules, or None
+            evaluator (Evaluator): source of the move priors and leaf values,
+                or None for uniform priors and no value estimates
+            c_puct (float): weight of the priors relative to the values
+            value_weight (float): weight between 0 and 1 of the evaluator's
+                value estimates relative to the results of the games
+            eval_batch (int): number of leaves evaluated together, which may
+                not be more than 1 when pondering, solving or limiting the
+                number of nodes
+            virtual_loss (int): number of lost games added to the path to
+                each queued leaf
+            sample_moves (int): number of tokens on the board below which
+                moves are sampled in proportion to the root visits
+            side (int): the player side, defined in the game rules
+            logger (RootLogger): optional logger for output
+        """
+        if transpositions or symmetries:
+            raise ValueError("PUCT does not support transpositions.")
+        if expand_all:
+            raise ValueError("PUCT does not support expanding whole "
+                    "playouts.")
+        if eval_batch > 1 and (ponder or solver or max_nodes):
+            raise ValueError("Batched evaluation does not support pondering, "
+                    "the solver or a node limit.")
+        super(MCTSAgentPUCT, self).__init__(time_budget, max_playouts,
+                convergence_limit, uctk, clock_interval, reuse_tree, processes,
+                rollout_batch, transpositions, symmetries, max_nodes, prune,
+                rollout_policy, ponder, solver, expand_all, minimax_cells,
+                book, time_manager, trace, confidence, side, logger)
+        self.evaluator = evaluator or Evaluator()
+        self.c_puct = c_puct
+        self.value_weight = value_weight
+        self.eval_batch = eval_batch
+        self.virtual_loss = virtual_loss
+        self.sample_moves = sample_moves
+        self.search_history = []
+        self.__leaf_value = None
+        self.__queue = []
+
+    def start(self):
+        super(MCTSAgentPUCT, self).start()
+        self.search_history = []
+
+    def move(self, board):
+        if (np.count_nonzero(board) >= self.sample_moves or
+                self.processes > 1):
+            return super(MCTSAgentPUCT, self).move(board)
+        moves = self.moves(board)
+        if not len(self.tree.children(ROOT)):
+            # Forced moves are played without a search
+            return tuple(moves[0])
+        policy = self.search_history[-1][2]
+        return tuple(self.tree.cell(np.random.choice(len(policy), p=policy)))
+
+    def moves(self, board):
+        best_moves = super(MCTSAgentPUCT, self).moves(board)
+        if self.processes > 1:
+            # Merged trees from parallel searches have no proven values
+            return best_moves
+
+        tree = self.tree
+        children = tree.children(ROOT)
+        if not len(children):
+            return best_moves
+        visits = self.move_scores(children)
+        policy = np.zeros(board.size)
+        policy[tree.move[children]] = visits / max(visits.sum(), 1)
+        self.search_history.append((board.ravel().copy(), self.side, policy))
+        if self.solver:
+            visits = self.solver_scores(children, visits)
+        return [tree.cell(tree.move[child])
+                for child in children[visits == visits.max()]]
+
+    def move_scores(self, children):
+        """
+        Returns the scores by which the move is chosen from the root children,
+        which for PUCT are their visits.
+
+        Args:
+            children (numpy.ndarray): indices of the root children
+
+        Returns:
+            numpy.ndarray: the number of visits of each child
+        """
+        return self.tree.visits[children].astype(float)
+
+    def mcts(self, board, root_child=NO_NODE):
+        if self.eval_batch == 1:
+            return super(MCTSAgentPUCT, self).mcts(board, root_child)
+
+        # A leaf reached again before it has been evaluated ends the batch
+        # early, as it would otherwise be evaluated twice
+        path, board, player, root_child = self.__select(board)
+        if any(path[-1] == queued[-1] for queued, _, _ in self.__queue):
+            self.finish_search()
+            path, board, player, root_child = self.__select(board)
+
+        # Leaves that need no evaluation are completed at once, and the rest
+        # are queued behind a virtual loss. The scores of the root children
+        # are not final while any leaf is queued, so the best children are
+        # then found again from all of them once the batch has been evaluated
+        # rather than from the root child of each iteration
+        if (rules.winner(board) is not None or rules.board_full(board) or
+                (len(path) > 1 and self._exact(board))):
+            winners, boards = self.playouts(board, player, self.rollout_batch)
+            self.__complete(path, boards, self.__results(winners))
+            return NO_NODE if self.__queue else root_child
+        self.__add_virtual_loss(path, self.virtual_loss)
+        self.__queue.append((path, board, player))
+        if len(self.__queue) >= self.eval_batch:
+            self.finish_search()
+        return NO_NODE
+
+    def finish_search(self):
+        """Evaluates the queued leaves in a single batch, then expands them
+        and passes their values up the tree in place of the virtual losses,
+        and finds the best root children from the completed statistics."""
+        queue, self.__queue = self.__queue, []
+        if not queue:
+            return
+        priors, values = self.evaluator.evaluate_batch(
+                np.asarray([board for _, board, _ in queue]),
+                np.asarray([player for _, _, player in queue]))
+        for (path, board, player), leaf_priors, value in zip(queue, priors,
+                values):
+            self.__add_virtual_loss(path, -self.virtual_loss)
+            self.__add_children(path[-1], player, board, leaf_priors)
+            if value is not None:
+                value = value if player == self.side else 1.0 - value
+            if value is not None and self.value_weight >= 1:
+                boards = board.reshape(1, -1)
+                results = np.asarray([value])
+            else:
+                winners, boards = self.playouts(board, player,
+                        self.rollout_batch)
+                results = self.__results(winners)
+                if value is not None:
+                    results = ((1 - self.value_weight) * results +
+                            self.value_weight * value)
+            self.__complete(path, boards, results)
+        self.refresh_best_children()
+
+    def ucb1_scores(self, nodes, player, exploration):
+        tree = self.tree
+        visits = tree.visits[nodes]
+        parent = tree.parent[nodes[0]]
+        value = tree.wins[parent] / max(tree.visits[parent], 1)
+        values = np.where(visits > 0, tree.wins[nodes] /
+                np.maximum(visits, 1), value)
+        if player != self.side:
+            # Get values from opponent's point of view
+            values = 1.0 - values
+        return values + (self.c_puct * tree.prior[nodes] *
+                math.sqrt(max(tree.visits[parent], 1)) / (1.0 + visits))
+
+    def expand(self, node, player, board):
+        """
+        Adds every untried child of a non-terminal leaf with the priors given
+        by the evaluator, and plays a batch of games from the leaf.
+
+        Args:
+            node (int): index of the leaf reached by selection
+            player (int): the side of the player to move at the leaf
+            board (numpy.ndarray): the board at the leaf
+
+        Returns:
+            int: NO_NODE, as the games are played from the leaf itself
+            int: index of the leaf
+            numpy.ndarray: the winner of each game
+            numpy.ndarray: the flattened final board of each game
+            numpy.ndarray: the board at the leaf
+        """
+        self.__leaf_value = None
+        if (self.expanding and self.tree.has_untried(node) and
+                (node == ROOT or not self._exact(board)) and
+                rules.winner(board) is None and not rules.board_full(board)):
+            priors, value = self.evaluator.evaluate(board, player)
+            self.__add_children(node, player, board, priors)
+            if value is not None:
+                self.__leaf_value = value if player == self.side else (
+                        1.0 - value)
+        winners, boards = self.playouts(board, player, self.rollout_batch)
+        return NO_NODE, node, winners, boards, board
+
+    def backpropagate(self, path, boards, results):
+        if self.__leaf_value is not None:
+            results = ((1 - self.value_weight) * results +
+                    self.value_weight * self.__leaf_value)
+            self.__leaf_value = None
+        super(MCTSAgentPUCT, self).backpropagate(path, boards, results)
+
+    def parallel_kwargs(self):
+        kwargs = super(MCTSAgentPUCT, self).parallel_kwargs()
+        kwargs.update(evaluator=self.evaluator, c_puct=self.c_puct,
+                value_weight=self.value_weight, eval_batch=self.eval_batch,
+                virtual_loss=self.virtual_loss)
+        return kwargs
+
+    def new_tree(self, board):
+        return TreeStore(board, self.side, capacity_limit=self.max_nodes,
+                solver=self.solver, priors=True)
+
+    def __select(self, board):
+        """Descends the tree from the root to a leaf by the PUCT rule,
+        returning the path, the board and the player to move at the leaf and
+        the root child on the path."""
+        tree = self.tree
+        node = ROOT
+        player = self.side
+        board = board.copy()
+        path = [ROOT]
+        while tree.child_count[node] and not tree.has_untried(node):
+            children = tree.children(node)
+            node = children[self.ucb1_scores(children, player, 0.0).argmax()]
+            board.flat[tree.move[node]] = player
+            path.append(node)
+            player = -player
+        return path, board, player, path[1] if len(path) > 1 else NO_NODE
+
+    def __add_children(self, node, player, board, priors):
+        """Adds every untried child of a node, and sets the priors of all of
+        its children, including any seeded from an opening book."""
+        tree = self.tree
+        for move in tree.untried_moves(node):
+            board.flat[move] = player
+            tree.add_child(node, move, board)
+            board.flat[move] = rules.EMPTY
+        children = tree.children(node)
+        tree.prior[children] = priors[tree.move[children]]
+
+    def __add_virtual_loss(self, path, count):
+        """Adds a number of games, lost by the player making each move, to the
+        nodes below the root on a path, or removes them if negative."""
+        tree = self.tree
+        tree.visits[path[1:]] += count
+
+        # Wins are for the root player, who loses the games at the nodes
+        # reached by its own moves and wins those reached by the opponent
+        tree.wins[path[2::2]] += count
+
+    def __results(self, winners):
+        """Returns the score of each game for the root player."""
+        return np.where(winners == self.side, 1.0,
+                np.where(winners == -self.side, 0.0, 0.5))
+
+    def __complete(self, path, boards, results):
+        """Passes the results of an iteration up its path."""
+        self.backpropagate(path, boards, results)
+        self.playout_count += len(results)
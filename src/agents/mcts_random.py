@@ -3,11 +3,11 @@ This module contains agents that use Monte Carlo tree search to select moves.
 """
 
 from players import Player
+from agents.mcts_tree import TreeStore, ROOT, NO_NODE
+from agents.mcts_parallel import RootParallel
 import rules
 import time
 import random
-import graphing.mcts_graph as graphing
-import itertools
 import datetime
 
 
@@ -20,55 +20,77 @@ class MCTSAgentRandom(Player):
     Attributes:
         time_budget (float): number of seconds to build tree and choose move
         max_playouts (int): number of playouts to build tree and choose move
-        tree_root (TreeNode): the root node of the MCTS tree
+        tree (TreeStore): the MCTS tree built for the last move
+        processes (int): number of worker processes running independent
+            searches (root parallelisation), or 1 to search in this process
     """
 
-    def __init__(self, time_budget=0.50, max_playouts=1000000,
+    def __init__(self, time_budget=0.50, max_playouts=1000000, processes=1,
             side=None, logger=None):
         """
         Constructor.
         
         Args:
             time_budget (float): number of seconds to build tree and choose move
+            max_playouts (int): number of playouts to build tree and choose move
+            processes (int): number of worker processes for root-parallel
+                search, or 1 to search in this process
             side (int): the player side, defined in the game rules
             logger (RootLogger): optional logger for output
         """
         super(MCTSAgentRandom, self).__init__(side, logger)
         self.time_budget = time_budget
         self.max_playouts = max_playouts
-        self.root_node = None
+        self.processes = processes
+        self.tree = None
+        self.__parallel = None
 
     def move(self, board):
+        if self.processes > 1:
+            # Merge the root statistics of independent parallel searches
+            if self.__parallel is None:
+                self.__parallel = RootParallel(self.processes)
+            kwargs = dict(time_budget=self.time_budget,
+                    max_playouts=self.max_playouts)
+            self.tree = self.__parallel.search(MCTSAgentRandom, kwargs, board,
+                    self.side)
+            return self.tree.best_moves(ROOT)[0]
         return self.mcts(board)
 
+    def close(self):
+        """Shuts down the worker processes used for root-parallel search."""
+        if self.__parallel:
+            self.__parallel.close()
+
     def mcts(self, board):
         max_time = time.time() + self.time_budget
-        root_node = TreeNode(board)
+        self.tree = tree = TreeStore(board, self.side)
         playout_count = 0
 
         while time.time() < max_time and playout_count < self.max_playouts:
             # Start at tree root (current actual state)
-            current_node = root_node
+            current_node = ROOT
             current_player = self.side
+            current_board = board.copy()
 
             while True:
                 # Check for terminal state
-                winner = rules.winner(current_node.state)
-                if winner or rules.board_full(current_node.state):
+                winner = rules.winner(current_board)
+                if winner or rules.board_full(current_board):
                     break
 
                 # Pick a random move
-                empty_cells = rules.empty_cells(current_node.state)
+                empty_cells = rules.empty_cells(current_board)
                 move = tuple(random.choice(empty_cells))
+                flat_move = move[0] * board.shape[1] + move[1]
+                current_board[move] = current_player
 
                 # Add to tree if not present
-                if move not in current_node.child_nodes.keys():
-                    # If not, create a TreeNode for it
-                    new_board = current_node.state.copy()
-                    new_board[move] = current_player
-                    current_node.child_nodes[move] = TreeNode(
-                            new_board, current_node)
-                current_node = current_node.child_nodes[move]
+                child = tree.child(current_node, flat_move)
+                if child == NO_NODE:
+                    child = tree.add_child(current_node, flat_move,
+                            current_board)
+                current_node = child
 
                 # Swap players
                 current_player = -current_player
@@ -80,85 +102,24 @@ class MCTSAgentRandom(Player):
                 result = 0.0
             else:
                 result = 0.5
-            while current_node is not root_node:
-                current_node.visits += 1
-                current_node.wins += result
-                current_node = current_node.parent
+            while current_node != NO_NODE:
+                tree.visits[current_node] += 1
+                tree.wins[current_node] += result
+                current_node = tree.parent[current_node]
 
             playout_count += 1
 
         print "Number of MCTS playouts:", playout_count
 
-        self.root_node = current_node
-
         # Return move with highest score
-        best_move = root_node.best_move()
+        best_move = tree.best_moves(ROOT)[0]
         return best_move
 
 
-class TreeNode(object):
-    """
-    Class representing a single node in the MCTS tree. 
-    
-    Attributes:
-        id (int): unique number identifying the node in the tree
-        state (numpy.ndarray): two dimensional array representing the game board
-        parent (int): id of the parent of this node or None
-        visits (int): number of times this node has been visited
-        wins (int): number of visits to this node that have resulted in a win
-        child_nodes ({(int, int):TreeNode}): dict of child nodes in the form 
-            (Move:ChildNode), where Move is the tuple of coordinates required to 
-            reach the board state corresponding to ChildNode 
-    """
-    new_id = itertools.count().next  # function that returns sequential integers
-
-    def __init__(self, board, parent=None):
-        """
-        Constructor.
-        
-        Args:
-            board (numpy.ndarray): two dimensional array representing the game 
-                board
-            parent (int): id of the parent of this node or None
-        """
-        self.id = TreeNode.new_id()  # get a unique number to identify the node
-        self.state = board
-        self.parent = parent
-        self.visits = 0;
-        self.wins = 0;
-        self.child_nodes = {}
-
-    def best_move(self):
-        """
-        Finds and returns the move leading to the child node with the highest
-        score.
-         
-        Returns:
-            (int, int): tuple with the coordinates of the new move (x, y)
-        """
-        best_move = None
-        for move in self.child_nodes:
-            if (best_move is None or self.child_nodes[move].score() >
-                    self.child_nodes[best_move].score()):
-                best_move = move
-
-        return best_move
-
-    def score(self):
-        """Returns the score for this node, the ratio of wins resulting from 
-        this node to the number of times it was visited."""
-        if self.visits != 0:
-            return float(self.wins) / float(self.visits)
-        else:
-            return None
-
-    def __str__(self):
-        """Returns a string representation of the board state represented by 
-        this node."""
-        return rules.board_str(self.state)
-
 def generate_graph(root_node):
-    # Visualise the tree
+    # Visualise the tree, importing the graphing module here as it depends on
+    # pygraphviz
+    import graphing.mcts_graph as graphing
     print "Generating graph..."
     t = time.time()
 
@@ -198,7 +159,7 @@ if __name__ == "__main__":
         game = TicTacToe([human, mcts_agent], shuffle=True, logger=logger)
         while True:
             game.run()
-            generate_graph(mcts_agent.root_node)
+            generate_graph(mcts_agent.tree.view())
 
     else:
         random.seed(7)
@@ -216,4 +177,4 @@ if __name__ == "__main__":
         board = np.asarray([[-1, 1, 1], [0, -1, 1], [1, -1, 0]])
         mcts_agent.move(board)
 
-        generate_graph(mcts_agent.root_node)
+        generate_graph(mcts_agent.tree.view())
@@ -0,0 +1,157 @@
+"""
+This module contains agents that use Monte Carlo tree search with rapid action
+value estimation (RAVE) to select moves.
+"""
+
+from agents.mcts_ucb1 import MCTSAgentUCB1
+from agents.mcts_tree import TreeStore, ROOT
+import math
+import numpy as np
+
+
+class MCTSAgentRAVE(MCTSAgentUCB1):
+    """
+    Agent that uses Monte Carlo tree search (MCTS) with RAVE to choose the next
+    move.
+
+    In tic-tac-toe the value of a move depends little on when it is played, so
+    each playout is also used to update the all-moves-as-first (AMAF)
+    statistics of every child of every node on its path whose move was later
+    played by the same player. AMAF statistics accumulate much faster than the
+    statistics of the children themselves, but are biased, so the two values
+    are blended with a weight that shifts from the AMAF value to the child's
+    own value as the child is visited, using the schedule
+
+        beta = sqrt(equivalence / (3 * visits + equivalence))
+
+    where the equivalence parameter is the number of visits at which the two
+    values are given about equal weight. The blended values are also used to
+    choose the move at the root, where they are more reliable than the
+    children's own values after few playouts.
+
+    Attributes:
+        equivalence (float): number of visits at which the child and AMAF
+            values are weighted about equally
+    """
+
+    def __init__(self, time_budget=0.50, max_playouts=1000000,
+            convergence_limit=1000, uctk=math.sqrt(2), clock_interval=16,
+            reuse_tree=True, processes=1, rollout_batch=1,
+            transpositions=False, symmetries=False, max_nodes=None,
+            prune=True, rollout_policy=None, ponder=False, solver=False,
+            expand_all=False, minimax_cells=0, book=None, time_manager=None,
+            trace=None, confidence=None, equivalence=100, side=None,
+            logger=None):
+        """
+        Constructor.
+
+        Args:
+            time_budget (float): number of seconds to build tree and choose move
+            max_playouts (int): number of playouts to build tree and choose move
+            convergence_limit (int): number of playouts without a change in
+                the best moves after which the search stops
+            uctk (float): constant for UCB1 calculation
+            clock_interval (int): number of playouts between checks of the
+                time budget
+            reuse_tree (bool): when true the tree is kept between moves
+            processes (int): number of worker processes for root-parallel
+                search, or 1 to search in this process
+            rollout_batch (int): number of vectorised games played
+                from each new node, or 1 for a single playout
+            transpositions (bool): when true the tree is a graph with one
+                node for each position
+            symmetries (bool): must be false, as symmetric transpositions are
+                not supported
+            max_nodes (int): optional limit on the number of node slots in the
+                tree
+            prune (bool): when true the tree is pruned to half of max_nodes
+                when it is full, otherwise it stops growing
+            rollout_policy (RolloutPolicy): optional policy playing the games
+                from each new node
+            ponder (bool): when true the agent keeps searching during the
+                opponent's turn
+            solver (bool): when true proven wins, losses and draws are
+                propagated up the tree and used to choose the move
+            expand_all (bool): when true every move of each random playout is
+                added to the tree
+            minimax_cells (int): number of empty cells at or below which
+                leaves are valued by minimax, or 0 for no exact values
+            book (OpeningBook): optional store of opening statistics carried
+                across games
+            time_manager (TimeManager): optional manager of a clock for the
+                whole game
+            trace (TraceRecorder): optional recorder of the root statistics
+            confidence (float): number of standard errors for the confidence
+                bounds of the early stopping rules, or None
+            equivalence (float): number of visits at which the child and AMAF
+                values are weighted about equally
+            side (int): the player side, defined in the game rules
+            logger (RootLogger): optional logger for output
+        """
+        # Symmetric transpositions are not supported, as the final boards of
+        # playouts through a link are rotated or reflected relative to the
+        # nodes above it
+        if symmetries:
+            raise ValueError("RAVE does not support symmetric transpositions.")
+        super(MCTSAgentRAVE, self).__init__(time_budget, max_playouts,
+                convergence_limit, uctk, clock_interval, reuse_tree, processes,
+                rollout_batch, transpositions, symmetries, max_nodes, prune,
+                rollout_policy, ponder, solver, expand_all, minimax_cells,
+                book, time_manager, trace, confidence, side, logger)
+        self.equivalence = equivalence
+
+    def moves(self, board):
+        best_moves = super(MCTSAgentRAVE, self).moves(board)
+        if self.processes > 1:
+            # Merged trees from parallel searches have no AMAF statistics
+            return best_moves
+
+        tree = self.tree
+        children = tree.children(ROOT)
+        if not len(children):
+            # Forced moves are played without a search
+            return best_moves
+        values = self.ucb1_scores(tree.target[children], self.side, 0.0)
+        if self.solver:
+            values = self.solver_scores(children, values)
+        return [tree.cell(tree.move[child])
+                for child in children[values == values.max()]]
+
+    def ucb1_scores(self, nodes, player, exploration):
+        tree = self.tree
+        visits = tree.visits[nodes]
+        amaf_visits = np.maximum(tree.amaf_visits[nodes], 1)
+        beta = np.sqrt(self.equivalence / (3.0 * visits + self.equivalence))
+        scores = ((1 - beta) * tree.wins[nodes] / visits +
+                beta * tree.amaf_wins[nodes] / amaf_visits)
+        if player != self.side:
+            # Get scores from opponent's point of view
+            scores = 1.0 - scores
+        return scores + exploration / np.sqrt(visits)
+
+    def backpropagate(self, path, boards, results):
+        super(MCTSAgentRAVE, self).backpropagate(path, boards, results)
+
+        # Update the AMAF statistics of the children of each node on the path
+        # for every game in which the player to move at the node later played
+        # the child's move
+        tree = self.tree
+        player = self.side
+        for node in path:
+            count = tree.child_count[node]
+            if count:
+                first = tree.first_child[node]
+                targets = tree.target[first:first + count]
+                played = boards[:, tree.move[first:first + count]] == player
+                tree.amaf_visits[targets] += played.sum(axis=0)
+                tree.amaf_wins[targets] += results.dot(played)
+            player = -player
+
+    def parallel_kwargs(self):
+        kwargs = super(MCTSAgentRAVE, self).parallel_kwargs()
+        kwargs['equivalence'] = self.equivalence
+        return kwargs
+
+    def new_tree(self, board):
+        return TreeStore(board, self.side, transpositions=self.transpositions,
+                amaf=True, capacity_limit=self.max_nodes, solver=self.solver)
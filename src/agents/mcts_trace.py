@@ -0,0 +1,142 @@
+"""
+This module contains a recorder of the progress of MCTS searches, for tuning
+the search parameters from the way the root statistics converge.
+
+Every few playouts the recorder takes a sample of the visits, wins and UCB1
+scores of each root child, indexed by the cell of its move, into preallocated
+arrays. The arrays are a ring buffer, so a long run keeps the latest samples
+without growing, and a sample costs a few array copies. Samples may be saved
+to a `.npz` file, or to a CSV file with a row for each child of each sample,
+for the notebooks in the `analysis` package.
+
+Example use:
+>> trace = TraceRecorder(interval=50)
+>> agent = MCTSAgentUCB1(trace=trace)
+>> ... play games ...
+>> trace.save('trace.npz')
+"""
+
+import csv
+import numpy as np
+
+
+class TraceRecorder(object):
+    """
+    Class recording samples of the root statistics during MCTS searches.
+
+    Attributes:
+        interval (int): number of playouts between samples
+        capacity (int): number of samples kept, after which the oldest
+            samples are overwritten
+        count (int): number of samples taken, including any overwritten
+        searches (int): number of searches started
+    """
+
+    # Names of the arrays holding the samples, in the order they are saved
+    FIELDS = ('search', 'playouts', 'elapsed', 'visits', 'wins', 'scores')
+
+    def __init__(self, interval=100, capacity=10000):
+        """
+        Constructor.
+
+        Args:
+            interval (int): number of playouts between samples
+            capacity (int): number of samples kept
+        """
+        self.interval = interval
+        self.capacity = capacity
+        self.count = 0
+        self.searches = 0
+        self.__arrays = None
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def begin(self, board):
+        """
+        Starts a new search, clearing the samples if the board has a different
+        number of cells to the last.
+
+        Args:
+            board (numpy.ndarray): two dimensional array representing the board
+        """
+        arrays = self.__arrays
+        if arrays is None or arrays['visits'].shape[1] != board.size:
+            shape = (self.capacity, board.size)
+            self.__arrays = {
+                'search': np.zeros(self.capacity, dtype=np.int32),
+                'playouts': np.zeros(self.capacity, dtype=np.int64),
+                'elapsed': np.zeros(self.capacity),
+                'visits': np.zeros(shape),
+                'wins': np.zeros(shape),
+                'scores': np.zeros(shape),
+            }
+            self.count = 0
+        self.searches += 1
+
+    def record(self, playouts, elapsed, moves, visits, wins, scores):
+        """
+        Takes a sample of the root statistics. Cells with no root child are
+        recorded as NaN.
+
+        Args:
+            playouts (int): number of playouts since the search started
+            elapsed (float): number of seconds since the search started
+            moves (numpy.ndarray): the cell of the move of each root child
+            visits (numpy.ndarray): the visits of each root child
+            wins (numpy.ndarray): the wins of each root child, for the player
+                to move at the root
+            scores (numpy.ndarray): the UCB1 score of each root child
+        """
+        arrays = self.__arrays
+        index = self.count % self.capacity
+        arrays['search'][index] = self.searches
+        arrays['playouts'][index] = playouts
+        arrays['elapsed'][index] = elapsed
+        for name, values in (('visits', visits), ('wins', wins),
+                ('scores', scores)):
+            row = arrays[name][index]
+            row.fill(np.nan)
+            row[moves] = values
+        self.count += 1
+
+    def samples(self):
+        """
+        Returns the samples kept, oldest first.
+
+        Returns:
+            {str: numpy.ndarray}: arrays keyed by the names in FIELDS, with the
+                search number, playouts and elapsed seconds of each sample,
+                and arrays of shape (samples, cells) with the visits, wins and
+                scores of the root children
+        """
+        if self.__arrays is None:
+            return dict((name, np.zeros(0)) for name in self.FIELDS)
+        order = np.arange(self.count - len(self), self.count) % self.capacity
+        return dict((name, self.__arrays[name][order])
+                for name in self.FIELDS)
+
+    def save(self, path):
+        """
+        Saves the samples to a `.npz` file, or to a CSV file if the path ends
+        in `.csv`. CSV files have a row for each root child of each sample,
+        with the sample fields followed by the cell of the child.
+
+        Args:
+            path (string): the path to the output file
+        """
+        samples = self.samples()
+        with open(path, 'wb') as trace_file:
+            if not path.endswith('.csv'):
+                np.savez_compressed(trace_file, **samples)
+                return
+            writer = csv.writer(trace_file)
+            writer.writerow(('search', 'playouts', 'elapsed', 'cell',
+                    'visits', 'wins', 'score'))
+            for i in range(len(self)):
+                for cell in np.flatnonzero(~np.isnan(samples['visits'][i])):
+                    writer.writerow((samples['search'][i],
+                            samples['playouts'][i], samples['elapsed'][i],
+                            cell, samples['visits'][i, cell],
+                            samples['wins'][i, cell],
+                            samples['scores'][i, cell]))
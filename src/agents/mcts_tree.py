@@ -0,0 +1,484 @@
+"""
+This module contains an array-backed tree store for Monte Carlo tree search.
+"""
+
+import sys
+import numpy as np
+import rules
+
+# Index of the root node, and the index used when there is no node
+ROOT = 0
+NO_NODE = -1
+
+# Names of the arrays holding the node data
+_arrays = ('visits', 'wins', 'parent', 'first_child', 'child_count', 'move',
+        'untried', 'target')
+
+
+class TreeStore(object):
+    """
+    Class storing an MCTS tree as a set of flat arrays indexed by node.
+
+    Each node is a row across the arrays rather than a Python object, so a tree
+    of a million nodes takes a few tens of megabytes and creates no garbage.
+    The children of a node occupy a contiguous block of indices, reserved when
+    the first child is added with one slot for every untried move. Moves are
+    stored as flat cell indices, and boards are not stored at all: the board at
+    a node is rebuilt by replaying the moves on the path from the root.
+
+    Scores are recorded from the point of view of the player to move at the
+    root, with a draw counting as half a win.
+
+    When transpositions are enabled, nodes are also entered in a table keyed
+    by position, optionally canonicalised over rotations and reflections, and
+    the tree becomes a directed acyclic graph. A child that reaches a position
+    already in the table still takes a slot in its parent's block, but the
+    slot is a link: its target is the existing node, which holds the shared
+    statistics and children, and the link itself is never expanded. With
+    symmetric transpositions the target may be a rotation or reflection of the
+    linked position, so the board at the target must be rebuilt from its own
+    path before its children are played.
+
+    The arrays double in size as the tree grows, up to an optional capacity
+    limit. Trees without transpositions may be pruned to keep them within a
+    node budget, by removing the children of the least visited nodes.
+
+    Attributes:
+        board (numpy.ndarray): two dimensional array representing the board at
+            the root node
+        side (int): the side of the player to move at the root node
+        size (int): number of node slots in use, including reserved slots
+        capacity (int): number of node slots allocated
+        capacity_limit (int): number of node slots beyond which the arrays are
+            only grown as far as required, or None for no limit
+        visits (numpy.ndarray): number of times each node has been visited
+        wins (numpy.ndarray): number of visits to each node that have resulted
+            in a win for the root player
+        parent (numpy.ndarray): index of the parent of each node or NO_NODE
+        first_child (numpy.ndarray): index of the first child of each node or
+            NO_NODE
+        child_count (numpy.ndarray): number of children added to each node
+        move (numpy.ndarray): flat index of the cell played to reach each node,
+            or NO_NODE for the root
+        untried (numpy.ndarray): packed bitmask of the moves that have not been
+            added as children, one row of bytes for each node
+        target (numpy.ndarray): index of the node holding the statistics of
+            each node, which differs from the node only for links
+        table ({str: int}): map of position keys to nodes if transpositions
+            are enabled, otherwise None
+        symmetric (bool): when true positions are canonicalised over symmetries
+        amaf (bool): when true AMAF statistics are recorded for each node
+        amaf_visits (numpy.ndarray): number of playouts through the parent of
+            each node in which its move was played by the same player at any
+            later point (all moves as first), if AMAF statistics are enabled
+        amaf_wins (numpy.ndarray): number of those playouts that resulted in a
+            win for the root player, if AMAF statistics are enabled
+        solver (bool): when true proven values are recorded for each node
+        proven (numpy.ndarray): the game value of each node for the root
+            player if it has been proven, 1 for a win, 0.5 for a draw and 0
+            for a loss, otherwise NaN, if proven values are enabled
+        priors (bool): when true a prior probability is recorded for each node
+        prior (numpy.ndarray): the prior probability of the move to each node,
+            if priors are enabled
+    """
+
+    def __init__(self, board, side, capacity=1024, transpositions=False,
+            symmetric=False, amaf=False, capacity_limit=None, solver=False,
+            priors=False):
+        """
+        Constructor.
+
+        Args:
+            board (numpy.ndarray): two dimensional array representing the board
+                at the root node
+            side (int): the side of the player to move at the root node
+            capacity (int): number of node slots to allocate initially
+            transpositions (bool): when true nodes for the same position are
+                shared, turning the tree into a directed acyclic graph
+            symmetric (bool): when true transpositions also include positions
+                equivalent under rotation and reflection
+            amaf (bool): when true arrays are added for AMAF statistics
+            capacity_limit (int): optional number of node slots beyond which
+                the arrays are not grown more than required
+            solver (bool): when true an array is added for proven values
+            priors (bool): when true an array is added for move priors
+        """
+        self.board = board.copy()
+        self.side = side
+        self.size = 0
+        self.capacity = 0
+        self.capacity_limit = capacity_limit
+        self.visits = np.zeros(0, dtype=np.int32)
+        self.wins = np.zeros(0, dtype=np.float64)
+        self.parent = np.zeros(0, dtype=np.int32)
+        self.first_child = np.zeros(0, dtype=np.int32)
+        self.child_count = np.zeros(0, dtype=np.int16)
+        self.move = np.zeros(0, dtype=np.int16)
+        self.untried = np.zeros((0, (board.size + 7) // 8), dtype=np.uint8)
+        self.target = np.zeros(0, dtype=np.int32)
+        self.__arrays = _arrays
+        self.amaf = amaf
+        if amaf:
+            self.amaf_visits = np.zeros(0, dtype=np.int32)
+            self.amaf_wins = np.zeros(0, dtype=np.float64)
+            self.__arrays += ('amaf_visits', 'amaf_wins')
+        self.solver = solver
+        if solver:
+            self.proven = np.zeros(0, dtype=np.float32)
+            self.__arrays += ('proven',)
+        self.priors = priors
+        if priors:
+            self.prior = np.zeros(0, dtype=np.float32)
+            self.__arrays += ('prior',)
+        self.table = {} if transpositions else None
+        self.symmetric = symmetric
+        if capacity_limit:
+            capacity = min(capacity, capacity_limit)
+        self.__grow(max(capacity, 1))
+        self.__init_node(self.__allocate(1), NO_NODE, NO_NODE, self.board)
+
+    def add_child(self, node, move, board):
+        """
+        Adds a child to a node, removing the move from its untried moves. If
+        the position is already in the transposition table the child is added
+        as a link to the existing node.
+
+        Args:
+            node (int): index of the parent node
+            move (int): flat index of the cell played to reach the child
+            board (numpy.ndarray): the board after the move has been played
+
+        Returns:
+            int: index of the new child node
+        """
+        if self.first_child[node] == NO_NODE:
+            # Reserve a slot for every move that may be added to this node
+            self.first_child[node] = self.__allocate(self.untried_count(node))
+        child = self.first_child[node] + self.child_count[node]
+        self.child_count[node] += 1
+        self.__set_untried(node, move, False)
+        self.__init_node(child, node, move, board)
+        return child
+
+    def child(self, node, move):
+        """
+        Returns the index of the child reached by a move, or NO_NODE if the
+        move has not been added to the tree.
+        """
+        children = self.children(node)
+        found = np.flatnonzero(self.move[children] == move)
+        return int(children[found[0]]) if len(found) else NO_NODE
+
+    def children(self, node):
+        """Returns an array with the indices of the children of a node."""
+        first = self.first_child[node]
+        if first == NO_NODE:
+            return np.zeros(0, dtype=np.int32)
+        return np.arange(first, first + self.child_count[node], dtype=np.int32)
+
+    def key(self, board):
+        """Returns the transposition table key for a board."""
+        if self.symmetric:
+            return rules.canonical(board)
+        return board.tostring()
+
+    def untried_moves(self, node):
+        """Returns an array with the flat indices of the untried moves."""
+        bits = np.unpackbits(self.untried[node])[:self.board.size]
+        return np.flatnonzero(bits)
+
+    def untried_count(self, node):
+        """Returns the number of untried moves at a node."""
+        return int(np.unpackbits(self.untried[node]).sum())
+
+    def has_untried(self, node):
+        """Returns True if any moves at a node have not been tried."""
+        return self.untried[node].any()
+
+    def path(self, node):
+        """Returns the list of flat move indices from the root to a node."""
+        moves = []
+        while self.parent[node] != NO_NODE:
+            moves.append(int(self.move[node]))
+            node = self.parent[node]
+        moves.reverse()
+        return moves
+
+    def node_board(self, node):
+        """Returns the board at a node, rebuilt from the path from the root."""
+        board = self.board.copy()
+        player = self.side
+        for move in self.path(node):
+            board.flat[move] = player
+            player = -player
+        return board
+
+    def cell(self, move):
+        """Converts a flat move index to a tuple of board coordinates."""
+        return divmod(int(move), self.board.shape[1])
+
+    def score(self, node):
+        """Returns the ratio of wins to visits for a node, or None if it has
+        not been visited."""
+        node = self.target[node]
+        visits = self.visits[node]
+        return float(self.wins[node]) / visits if visits else None
+
+    def best_children(self, node=ROOT):
+        """
+        Finds and returns the children of a node with the highest scores.
+
+        Args:
+            node (int): index of the parent node
+
+        Returns:
+            [int]: list of the indices of the best children
+        """
+        children = self.children(node)
+        targets = self.target[children]
+        visited = self.visits[targets] > 0
+        children, targets = children[visited], targets[visited]
+        if not len(children):
+            return []
+        scores = self.wins[targets] / self.visits[targets]
+        return children[scores == scores.max()].tolist()
+
+    def best_moves(self, node=ROOT):
+        """
+        Finds and returns the moves leading to the child nodes with the highest
+        scores.
+
+        Args:
+            node (int): index of the parent node
+
+        Returns:
+            [(int, int)]: list of tuples with the coordinates of the moves
+        """
+        return [self.cell(self.move[child])
+                for child in self.best_children(node)]
+
+    def subtree(self, node):
+        """
+        Returns a new tree holding a copy of the subtree below a node, with the
+        node as its root. The rest of the tree is not copied, so the old tree
+        can be discarded to free it. Graphs with transpositions cannot be
+        copied, as links may lead outside the subtree.
+
+        Args:
+            node (int): index of the node to become the new root
+
+        Returns:
+            TreeStore: the new tree
+        """
+        return self.__copy(node, 1024)
+
+    def prune(self, size):
+        """
+        Returns a copy of the tree with the children of the least visited
+        nodes removed, so that it takes at most the given number of node
+        slots. The moves of the removed children become untried moves of their
+        parents again, which keep their own statistics. As no node has more
+        visits than its parent, keeping the children of every node with at
+        least a minimum number of visits keeps a connected tree.
+
+        Args:
+            size (int): the maximum number of node slots in the pruned tree
+
+        Returns:
+            TreeStore: the pruned tree, with the same capacity as this tree
+        """
+        # Nodes with children, leaving out unused reserved slots, which have
+        # no visits
+        nodes = np.flatnonzero((self.first_child[:self.size] != NO_NODE) &
+                (self.visits[:self.size] > 0))
+        visits = self.visits[nodes]
+        blocks = self.child_count[nodes] + np.unpackbits(self.untried[nodes],
+                axis=1).sum(axis=1)
+
+        # Find the lowest visit count for which the blocks of all the nodes
+        # with at least that many visits fit, counting the root slot
+        order = np.argsort(-visits, kind='mergesort')
+        visits = visits[order]
+        sizes = 1 + np.cumsum(blocks[order])
+        ends = np.flatnonzero(np.append(visits[1:] != visits[:-1], True))
+        fits = ends[sizes[ends] <= size]
+        if len(fits):
+            min_visits = visits[fits[-1]]
+        else:
+            min_visits = self.visits[ROOT] + 1
+        return self.__copy(ROOT, self.capacity, min_visits)
+
+    @property
+    def nbytes(self):
+        """Returns an estimate of the memory used by the tree in bytes,
+        including the transposition table."""
+        total = sum(getattr(self, name).nbytes for name in self.__arrays)
+        if self.table is not None:
+            total += sys.getsizeof(self.table) + sum(sys.getsizeof(key)
+                    for key in self.table)
+        return total
+
+    def view(self, node=ROOT):
+        """Returns a NodeView of a node, for use with `MCTSGraph`."""
+        return NodeView(self, node)
+
+    def __allocate(self, count):
+        """Reserves a block of node slots and returns the index of the first,
+        growing the arrays if required."""
+        first = self.size
+        if first + count > self.capacity:
+            capacity = max(2 * self.capacity, first + count)
+            if self.capacity_limit:
+                capacity = max(min(capacity, self.capacity_limit),
+                        first + count)
+            self.__grow(capacity)
+        self.size += count
+        return first
+
+    def __copy(self, node, capacity, min_visits=0):
+        """Returns a new tree holding a copy of the subtree below a node,
+        leaving out the children of nodes with fewer than the minimum number
+        of visits."""
+        if self.table is not None:
+            raise ValueError("Subtrees of a transposition graph cannot be "
+                    "copied.")
+        moves = self.path(node)
+        side = self.side if len(moves) % 2 == 0 else -self.side
+        tree = TreeStore(self.node_board(node), side, capacity=capacity,
+                amaf=self.amaf, capacity_limit=self.capacity_limit,
+                solver=self.solver, priors=self.priors)
+        for name in tree.__arrays:
+            getattr(tree, name)[ROOT] = getattr(self, name)[node]
+        tree.parent[ROOT] = tree.move[ROOT] = NO_NODE
+        tree.target[ROOT] = ROOT
+
+        # Copy the child blocks breadth first, so that each block stays
+        # contiguous and the parent indices can be remapped as it is copied
+        queue = [(node, ROOT)]
+        for old_node, new_node in queue:
+            first = self.first_child[old_node]
+            if first == NO_NODE:
+                continue
+            count = self.child_count[old_node]
+            if self.visits[old_node] < min_visits:
+                # Remove the children, making their moves untried again
+                tree.first_child[new_node] = NO_NODE
+                tree.child_count[new_node] = 0
+                for move in self.move[first:first + count]:
+                    tree.__set_untried(new_node, move, True)
+                continue
+            new_first = tree.__allocate(count + self.untried_count(old_node))
+            tree.first_child[new_node] = new_first
+            for name in tree.__arrays:
+                getattr(tree, name)[new_first:new_first + count] = getattr(
+                        self, name)[first:first + count]
+            tree.parent[new_first:new_first + count] = new_node
+            tree.target[new_first:new_first + count] = np.arange(new_first,
+                    new_first + count)
+            queue.extend(zip(range(first, first + count),
+                    range(new_first, new_first + count)))
+
+        # Scores are kept from the point of view of the player at the root
+        if side != self.side:
+            tree.wins[:tree.size] = tree.visits[:tree.size] - tree.wins[
+                    :tree.size]
+            if tree.amaf:
+                tree.amaf_wins[:tree.size] = (tree.amaf_visits[:tree.size] -
+                        tree.amaf_wins[:tree.size])
+            if tree.solver:
+                tree.proven[:tree.size] = 1 - tree.proven[:tree.size]
+        return tree
+
+    def __grow(self, capacity):
+        """Reallocates the arrays with a larger capacity."""
+        for name in self.__arrays:
+            array = getattr(self, name)
+            resized = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            resized[:self.size] = array[:self.size]
+            setattr(self, name, resized)
+        self.capacity = capacity
+
+    def __init_node(self, node, parent, move, board):
+        """Initialises the slot for a new node."""
+        self.visits[node] = 0
+        self.wins[node] = 0
+        self.parent[node] = parent
+        self.first_child[node] = NO_NODE
+        self.child_count[node] = 0
+        self.move[node] = move
+        self.target[node] = node
+        if self.amaf:
+            self.amaf_visits[node] = 0
+            self.amaf_wins[node] = 0
+        if self.solver:
+            self.proven[node] = np.nan
+        if self.priors:
+            self.prior[node] = 0
+        if self.table is not None:
+            key = self.key(board)
+            if key in self.table:
+                # Link to the existing node, which is expanded instead
+                self.target[node] = self.table[key]
+                self.untried[node] = 0
+                return
+            self.table[key] = node
+        self.untried[node] = np.packbits(board.ravel() == rules.EMPTY)
+
+    def __set_untried(self, node, move, value):
+        """Sets or clears the bit for a move in the untried moves of a node."""
+        mask = 0x80 >> (move & 7)
+        if value:
+            self.untried[node, move >> 3] |= mask
+        else:
+            self.untried[node, move >> 3] &= ~mask & 0xff
+
+
+class NodeView(object):
+    """
+    Adapter presenting a node in a TreeStore with the attributes of an object
+    based tree node, so that the tree can be rendered by `MCTSGraph`.
+
+    Attributes:
+        id (int): index of the node in the tree store
+        parent (NodeView): view of the parent node or None
+        visits (int): number of times the node has been visited
+        wins (float): number of visits that have resulted in a win
+        ucb1_score (float): always None, as UCB1 scores are not stored
+    """
+
+    def __init__(self, tree, node, parent=None):
+        """
+        Constructor.
+
+        Args:
+            tree (TreeStore): the tree containing the node
+            node (int): index of the node
+            parent (NodeView): view of the parent node or None
+        """
+        self.__tree = tree
+        self.id = int(node)
+        self.parent = parent
+        self.visits = int(tree.visits[tree.target[node]])
+        self.wins = float(tree.wins[tree.target[node]])
+        self.ucb1_score = None
+
+    @property
+    def child_nodes(self):
+        """Returns a dict of child views keyed by move coordinates."""
+        tree = self.__tree
+        return dict((tree.cell(tree.move[child]), NodeView(tree, child, self))
+                for child in tree.children(tree.target[self.id]))
+
+    @property
+    def state(self):
+        """Returns the board at this node."""
+        return self.__tree.node_board(self.id)
+
+    def score(self):
+        """Returns the ratio of wins to visits for this node."""
+        return self.__tree.score(self.id)
+
+    def __str__(self):
+        """Returns a string representation of the board state represented by
+        this node."""
+        return rules.board_str(self.state)
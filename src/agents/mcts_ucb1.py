@@ -3,13 +3,27 @@ This module contains agents that use Monte Carlo tree search to select moves.
 """
 
 from players import Player
+from agents.mcts_tree import TreeStore, ROOT, NO_NODE
+from agents.mcts_parallel import RootParallel
+from agents.minimax import MiniMaxTable
+from agents import rollout
 import rules
 import time
 import random
-import graphing.mcts_graph as graphing
-import itertools
+import threading
 import datetime
 import math
+import numpy as np
+
+# Reasons for a search to stop, reported in `MCTSAgentUCB1.stop_reason`
+STOP_TIME = 'time'  # the time budget, or the time manager's limit, ran out
+STOP_CLOCK = 'clock'  # the time manager judged the best move settled
+STOP_PLAYOUTS = 'playouts'  # max_playouts were made
+STOP_CONVERGED = 'converged'  # the best moves did not change for a while
+STOP_UNREACHABLE = 'unreachable'  # the leader cannot be caught in the budget
+STOP_CONFIDENT = 'confident'  # the confidence bounds separate the leader
+STOP_PROVEN = 'proven'  # the solver proved the value of the root
+STOP_FORCED = 'forced'  # the move was forced, so there was no search
 
 
 class MCTSAgentUCB1(Player):
@@ -19,227 +33,965 @@ class MCTSAgentUCB1(Player):
     This version uses UCB1 to select nodes.
 
     Attributes:
-        tree_root (TreeNode): the root node of the MCTS tree
+        tree (TreeStore): the MCTS tree built for the last move
         playout_count (int): total number of MCTS playouts, i.e. the number
           of visits at the root node
+        playouts_per_second (float): playout rate for the last move
         time_budget (float): number of seconds to build tree and choose move
         max_playouts (int): number of playouts to build tree and choose move
         convergence_limit (int): returns the current best move if it has not 
           changed after this number of iterations
         utck (float): parameter controlling the exploration rate of the UCB1 
           algorithm 
+        clock_interval (int): number of playouts between checks of the time
+          budget
+        reuse_tree (bool): when true the subtree reached by the last two moves
+          is kept as the root of the tree for the next move
+        processes (int): number of worker processes running independent
+          searches (root parallelisation), or 1 to search in this process
+        rollout_batch (int): number of games played at once from each
+          new node (leaf parallelisation), or 1 for a single playout
+        transpositions (bool): when true nodes for the same position reached
+          by different move orders are shared
+        symmetries (bool): when true transpositions include positions that
+          are equivalent under rotation and reflection
+        max_nodes (int): number of node slots the tree may take, or None for
+          no limit
+        prune (bool): when true the children of the least visited nodes are
+          removed once the tree reaches max_nodes, otherwise the tree stops
+          growing and playouts start from its leaves
+        prune_count (int): number of times the tree was pruned for the last
+          move
+        rollout_policy (RolloutPolicy): policy playing the games from new
+          nodes, or None for random games
+        ponder (bool): when true the search continues below the chosen move
+          in a background thread until the agent is next asked to move
+        ponder_playouts (int): number of playouts made while pondering before
+          the last move
+        solver (bool): when true game values proven in the tree are passed
+          up to the root (MCTS-Solver), proven nodes are no longer searched,
+          and the search stops once the value of the root is proven
+        expand_all (bool): when true every move of a single random playout
+          is added to the tree, rather than one node for each iteration
+        minimax_cells (int): leaves with at most this number of empty cells
+          are valued exactly by a cached minimax search rather than by
+          rollouts, or 0 to always play rollouts
+        book (OpeningBook): store of opening statistics that is used to seed
+          the tree and updated with the playouts of each search, or None
+        time_manager (TimeManager): divides a clock for the whole game
+          between the moves in place of the time budget, or None
+        trace (TraceRecorder): records samples of the root statistics during
+          each search, or None
+        confidence (float): number of standard errors for the confidence
+          bounds of the early stopping rules, or None for no early stopping
+        stop_reason (str): why the last search stopped, one of the STOP_
+          constants, or None after a root-parallel search
     """
 
     def __init__(self, time_budget=0.50, max_playouts=1000000,
-            convergence_limit=1000, uctk=math.sqrt(2), side=None, logger=None):
+            convergence_limit=1000, uctk=math.sqrt(2), clock_interval=16,
+            reuse_tree=True, processes=1, rollout_batch=1,
+            transpositions=False, symmetries=False, max_nodes=None,
+            prune=True, rollout_policy=None, ponder=False, solver=False,
+            expand_all=False, minimax_cells=0, book=None, time_manager=None,
+            trace=None, confidence=None, side=None, logger=None):
         """
         Constructor.
 
         Args:
             time_budget (float): number of seconds to build tree and choose move
+            max_playouts (int): number of playouts to build tree and choose move
+            convergence_limit (int): number of playouts without a change in
+                the best moves after which the search stops
             uctk (float): constant for UCB1 calculation
+            clock_interval (int): number of playouts between checks of the
+                time budget
+            reuse_tree (bool): when true the tree is kept between moves
+            processes (int): number of worker processes for root-parallel
+                search, or 1 to search in this process
+            rollout_batch (int): number of vectorised games played
+                from each new node, or 1 for a single playout
+            transpositions (bool): when true the tree is a graph with one
+                node for each position
+            symmetries (bool): when true symmetric positions share a node
+            max_nodes (int): optional limit on the number of node slots in the
+                tree, each taking `TreeStore.nbytes / TreeStore.capacity` bytes
+            prune (bool): when true the tree is pruned to half of max_nodes
+                when it is full, otherwise it stops growing
+            rollout_policy (RolloutPolicy): optional policy playing the games
+                from each new node, such as `rollout.WinBlockRollout`
+            ponder (bool): when true the agent keeps searching during the
+                opponent's turn, which requires tree reuse in a single process
+                without transpositions
+            solver (bool): when true proven wins, losses and draws are
+                propagated up the tree and used to choose the move
+            expand_all (bool): when true, and there is no rollout policy or
+                batch, every move of each playout is added to the tree
+            minimax_cells (int): number of empty cells at or below which
+                leaves are valued by minimax, or 0 for no exact values
+            book (OpeningBook): optional store of opening statistics carried
+                across games, which is saved when a game finishes if it has
+                a path
+            time_manager (TimeManager): optional manager of a clock for the
+                whole game, which replaces the time budget and requires a
+                single process
+            trace (TraceRecorder): optional recorder of the root statistics
+                every `trace.interval` playouts, which is not used by
+                root-parallel searches
+            confidence (float): when set, the search stops once the most
+                visited root child cannot be overtaken with the playouts
+                left, or once the lower confidence bound of the best child is
+                above the upper bounds of the others, where the bounds are
+                this number of standard errors from the mean
             side (int): the player side, defined in the game rules
             logger (RootLogger): optional logger for output
         """
+        if ponder and (not reuse_tree or transpositions or processes > 1):
+            raise ValueError("Pondering requires tree reuse in a single "
+                    "process without transpositions.")
+        if time_manager is not None and processes > 1:
+            raise ValueError("The time manager requires a single process.")
         super(MCTSAgentUCB1, self).__init__(side, logger)
         self.time_budget = time_budget
         self.max_playouts = max_playouts
         self.convergence_limit = convergence_limit
         self.uctk = uctk
-        self.root_node = None
+        self.clock_interval = clock_interval
+        self.reuse_tree = reuse_tree
+        self.processes = processes
+        self.rollout_batch = rollout_batch
+        self.transpositions = transpositions
+        self.symmetries = symmetries
+        self.max_nodes = max_nodes
+        self.prune = prune
+        self.prune_count = 0
+        self.rollout_policy = rollout_policy
+        self.ponder = ponder
+        self.ponder_playouts = 0
+        self.solver = solver
+        self.expand_all = expand_all
+        self.minimax_cells = minimax_cells
+        self.book = book
+        self.time_manager = time_manager
+        self.trace = trace
+        self.confidence = confidence
+        self.stop_reason = None
+        self.tree = None
         self.playout_count = 0
+        self.playouts_per_second = None
+        self.__log_table = np.zeros(0)
+        self.__best_children = []
+        self.__best_changed = False
+        self.__best_score = None
+        self.__parallel = None
+        self.__expand = True
+        self.__headroom = 0
+        self.__ponder_thread = None
+        self.__ponder_stop = threading.Event()
+        self.__scratch = None
+        self.__minimax = MiniMaxTable()
+
+    def start(self):
+        if self.time_manager is not None:
+            self.time_manager.start()
 
     def move(self, board):
         # Return the first move in the list of optimal moves found
         move = self.moves(board)[0]
+        if self.ponder:
+            self.__start_pondering(board, move)
         return tuple(move)
 
     def moves(self, board):
-        max_time = time.time() + self.time_budget
-        self.root_node = UCTTreeNode(board, self.side)
-        self.playout_count = 0
-        best_moves = []
+        self.__stop_pondering()
+        if self.processes > 1:
+            return self.__parallel_moves(board)
+
+        start_time = time.time()
+        max_time = start_time + self.time_budget
+        manager = self.time_manager
+        if manager is not None:
+            # Forced moves are played at once, leaving an empty tree
+            move = manager.forced_move(board, self.side)
+            if move is not None:
+                self.tree = self.new_tree(board)
+                self.playout_count = 0
+                self.stop_reason = STOP_FORCED
+                manager.update(time.time() - start_time)
+                return [move]
+            target, limit = manager.budget(board)
+            max_time = start_time + limit
+        self.tree = self.__root_tree(board)
+        if self.solver and not np.isnan(self.tree.proven[ROOT]):
+            # A leaf valued exactly is proven before it has any children, so
+            # a reused root keeps its value only if its children prove it
+            self.tree.proven[ROOT] = np.nan
+            self.__prove(ROOT, 0)
+        if self.__scratch is None or self.__scratch.board.size != board.size:
+            self.__scratch = rollout.ScratchPlayout(board.shape)
+        if self.book is not None:
+            self.__seed_tree(board)
+            book_stats = self.__book_stats(board)
+        self.playout_count = int(self.tree.visits[ROOT])
+        self.__best_children = self.tree.best_children(ROOT)
+        self.__best_score = (self.tree.score(self.__best_children[0])
+                if self.__best_children else None)
+        self.__best_changed = False
+        start_count = self.playout_count
+        next_sample = start_count
+        if self.trace is not None:
+            self.trace.begin(board)
+        iterations = 0
         best_moves_repeats = 0
 
-        # Repeat MCTS algorithm until one of the stopping criteria has been met
-        while (time.time() < max_time and self.playout_count < self.max_playouts
-                and best_moves_repeats < self.convergence_limit):
-            self.mcts(board)
+        # Node slots that a single iteration may reserve: one block for each
+        # move of a fully expanded playout, or a single block in batch mode
+        empty = int((board == rules.EMPTY).sum())
+        self.__headroom = (empty if self.__single_node() else
+                empty * (empty + 1) // 2)
+        self.__expand = True
+        self.prune_count = 0
 
-            # Update the list of best moves, incrementing the counter used to
-            # check convergence
-            new_best_moves = self.root_node.best_moves()
-            if new_best_moves == best_moves:
-                best_moves_repeats += 1
-            else:
+        # Repeat MCTS algorithm until one of the stopping criteria has been
+        # met, reading the clock and checking the early stopping rules only
+        # every few iterations
+        self.stop_reason = None
+        while (self.playout_count - start_count < self.max_playouts and
+                best_moves_repeats < self.convergence_limit):
+            if iterations % self.clock_interval == 0:
+                # At least one iteration is run, so that there is a move to
+                # play however little time is left
+                now = time.time()
+                if now >= max_time and iterations:
+                    self.stop_reason = STOP_TIME
+                elif manager is not None and iterations and self.__clock_stop(
+                        manager, now - start_time,
+                        self.playout_count - start_count, target, limit):
+                    self.stop_reason = STOP_CLOCK
+                elif self.confidence is not None and iterations:
+                    self.stop_reason = self.__early_stop(
+                            now - start_time, max_time - now,
+                            self.max_playouts - self.playout_count +
+                            start_count, self.playout_count - start_count)
+                if self.stop_reason:
+                    break
+            if self.solver and not np.isnan(self.tree.proven[ROOT]):
+                self.stop_reason = STOP_PROVEN
+                break
+            if (self.max_nodes and self.__expand and
+                    self.tree.size + self.__headroom > self.max_nodes):
+                self.__limit_tree()
+            root_child = self.mcts(board)
+            iterations += 1
+            if (self.trace is not None and
+                    self.playout_count >= next_sample):
+                self.__record_trace(start_time, start_count)
+                next_sample = self.playout_count + self.trace.interval
+
+            # Update the best moves from the only root child whose score has
+            # changed, unless they were found again from every child during
+            # the iteration, incrementing the counter used to check
+            # convergence
+            changed = (self.__update_best_children(root_child) or
+                    self.__best_changed)
+            self.__best_changed = False
+            if changed:
                 best_moves_repeats = 0
-            best_moves = new_best_moves
+            else:
+                best_moves_repeats += 1
+        self.finish_search()
+        if self.stop_reason is None:
+            self.stop_reason = (STOP_CONVERGED if
+                    best_moves_repeats >= self.convergence_limit else
+                    STOP_PLAYOUTS)
+        if (self.trace is not None and
+                self.playout_count != next_sample - self.trace.interval):
+            # The final statistics, unless they were the last sample
+            self.__record_trace(start_time, start_count)
+
+        playouts = self.playout_count - start_count
+        if self.book is not None:
+            self.__update_book(board, book_stats)
+        self.playouts_per_second = playouts / max(time.time() - start_time,
+                1e-9)
+        if manager is not None:
+            manager.update(time.time() - start_time)
+        if self.logger:
+            self.logger.info("MCTS: {} playouts, {:.0f} playouts/s, {} "
+                    "visits at root, stopped by {}".format(playouts,
+                    self.playouts_per_second, self.playout_count,
+                    self.stop_reason))
+            if manager is not None:
+                self.logger.info("MCTS: {:.2f}s left on the game clock"
+                        .format(manager.remaining))
+            if self.ponder:
+                self.logger.info("MCTS: {} playouts while pondering".format(
+                        self.ponder_playouts))
+            self.logger.info("MCTS: tree of {} nodes, {:.1f} MB, pruned {} "
+                    "times".format(self.tree.size, self.tree.nbytes / 1e6,
+                    self.prune_count))
+
+        # Return moves with highest scores, preferring proven wins and
+        # avoiding proven losses
+        if self.solver:
+            tree = self.tree
+            children = tree.children(ROOT)
+            targets = tree.target[children]
+            visited = tree.visits[targets] > 0
+            children, targets = children[visited], targets[visited]
+            if len(children):
+                scores = self.solver_scores(children,
+                        tree.wins[targets] / tree.visits[targets])
+                self.__best_children = children[
+                        scores == scores.max()].tolist()
+        return [self.tree.cell(self.tree.move[child])
+                for child in self.__best_children]
+
+    @property
+    def expanding(self):
+        """True while new nodes may be added to the tree, which stops when
+        the tree is full and cannot be pruned."""
+        return self.__expand
 
-        # Return moves with highest scores
-        return best_moves
+    def mcts(self, board, root_child=NO_NODE):
+        """
+        Runs a single iteration of the search, adding the nodes it visits to
+        the tree.
+
+        Args:
+            board (numpy.ndarray): the board at the root of the tree
+            root_child (int): optional root child to descend to first, rather
+                than selecting one, used when pondering
 
-    def mcts(self, board):
-        # Start at tree root (current actual state)
-        current_node = self.root_node
+        Returns:
+            int: index of the root child on the path of the playout, or NO_NODE
+                if the root is terminal
+        """
+        # Start at tree root (current actual state), replaying the moves on the
+        # path through the tree on a copy of the board
+        tree = self.tree
+        current_node = ROOT
         current_player = self.side
+        board = board.copy()
+        exploration = self.uctk * self.__log_sqrt(self.playout_count)
+        path = [ROOT]
+        if root_child != NO_NODE:
+            current_node, board = self.__follow(root_child, current_player,
+                    board)
+            path.append(current_node)
+            current_player = -current_player
 
         # Select
-        while current_node.child_nodes and not current_node.untried_moves:
+        while tree.child_count[current_node] and not tree.has_untried(
+                current_node):
             # This node has been fully expanded (no untried moves) and is
-            # not terminal so use UCB1 to select a child and descend tree
-            ucb1 = lambda child: self.ucb1_score(child, current_player)
-            child_nodes = sorted(current_node.child_nodes.values(), key=ucb1)
-
-            # Choose move with highest UCB1 score after sorting
-            current_node = child_nodes[-1]
+            # not terminal so use UCB1 to select a child and descend tree,
+            # reading the statistics of linked nodes from their targets
+            first = tree.first_child[current_node]
+            targets = tree.target[first:first + tree.child_count[current_node]]
+            scores = self.ucb1_scores(targets, current_player, exploration)
+            if self.solver:
+                # Proven children need no more playouts
+                scores[~np.isnan(tree.proven[targets])] = -np.inf
+            child = first + scores.argmax()
+            if current_node == ROOT:
+                root_child = child
+            current_node, board = self.__follow(child, current_player, board)
+            path.append(current_node)
 
             # Swap players
             current_player = -current_player
 
         # Expand / rollout
-        if current_node.untried_moves != []:
+        if self.__single_node():
+            # Expand a single node and play the games from it on boards that
+            # do not enter the tree
+            parent = current_node
+            child, current_node, winners, boards, board = (
+                    self.expand(current_node, current_player, board))
+            if child != NO_NODE:
+                path.append(current_node)
+                if parent == ROOT:
+                    root_child = child
+        elif self.__expand and tree.has_untried(current_node):
             # Now do a random playout since we don't have any
-            # information from this move on
+            # information from this move on, adding every move to the tree
             while True:
-                # Check for terminal state
-                winner = rules.winner(current_node.state)
-                if winner or rules.board_full(current_node.state):
+                # Check for terminal state, or a leaf below the root to be
+                # valued exactly
+                winner = rules.winner(board)
+                if winner or rules.board_full(board) or (
+                        current_node != ROOT and self._exact(board)):
                     break
 
                 # There are untried moves so pick one at random
-                move = current_node.untried_moves.pop(
-                    random.randrange(len(current_node.untried_moves)))
-                move = tuple(move)
+                untried_moves = tree.untried_moves(current_node)
+                move = untried_moves[random.randrange(len(untried_moves))]
 
-                # Note that usually only the first new move is added to the
-                # tree (i.e. one node per iteration) possibly to save space,
-                # not sure yet
-
-                # Add new node to the tree and remove from untried moves
-                new_board = current_node.state.copy()
-                new_board[move] = current_player  # apply the move
-                current_node.child_nodes[move] = UCTTreeNode(new_board,
-                    current_player, current_node)
-
-                # Move down the tree
-                current_node = current_node.child_nodes[move]
+                # Add new node to the tree, removing it from the untried moves,
+                # and move down the tree
+                board.flat[move] = current_player  # apply the move
+                child = tree.add_child(current_node, move, board)
+                if current_node == ROOT:
+                    root_child = child
+                current_node, board = self.__follow(child, current_player,
+                        board)
+                path.append(current_node)
 
                 # Swap players
                 current_player = -current_player
 
-        # Backpropagate
-        # Terminal state reached so backpropagate result
-        winner = rules.winner(current_node.state)
-        while current_node:
-            current_node.visits += 1
-            if winner == self.side:
-                current_node.wins += 1
-            elif winner == -self.side:
-                current_node.wins += 0
+                # Stop expanding at a transposition, as its node already has
+                # children
+                if current_node != child:
+                    break
+
+        if not self.__single_node():
+            # Terminal state reached, unless expansion stopped at a
+            # transposition, a leaf valued exactly or a full tree, in which
+            # case finish with a playout
+            winner = rules.winner(board)
+            if winner is None and not rules.board_full(board):
+                winners, boards = self.playouts(board, current_player)
             else:
-                current_node.wins += 0.5
-            current_node = current_node.parent
+                winners = np.asarray([winner or rules.EMPTY])
+                boards = board.reshape(1, -1)
 
-        self.playout_count += 1
+        # Backpropagate
+        results = np.where(winners == self.side, 1.0,
+                np.where(winners == -self.side, 0.0, 0.5))
+        self.backpropagate(path, boards, results)
+        self.playout_count += len(results)
+        if self.solver:
+            # Terminal and exactly valued nodes are proven by their result,
+            # and the search may also end at a transposition proven by
+            # another path
+            if (rules.winner(board) is not None or rules.board_full(board) or
+                    self._exact(board)):
+                tree.proven[current_node] = results[0]
+            if not np.isnan(tree.proven[current_node]):
+                self.__solve(path)
 
-        # # Visualise the tree
-        # g = graphing.MCTSGraph(root_node=self.root_node, sort_nodes=False)
-        # path = "tree_graph_{}.{}".format(playout_count, 'png')
-        # g.draw_graph(path)
+        return root_child
 
-    def ucb1_score(self, node, player):
-        """Returns the UCB1 score for this node and updates the value in the 
-        node."""
-        # Calculate the score for this node based on the side of the player
-        if player == self.side:
-            score = node.wins / float(node.visits)
-        else:
-            # Get score from opponent's point of view
-            score = (1.0 - node.wins) / float(node.visits)
+    def ucb1_scores(self, nodes, player, exploration):
+        """
+        Returns the UCB1 scores of a set of sibling nodes.
 
-        node.ucb1_score = (score + self.uctk *
-                math.sqrt(math.log(self.playout_count) / node.visits))
+        Args:
+            nodes (numpy.ndarray): indices of the nodes holding the statistics
+                of each child
+            player (int): the side of the player choosing between the nodes
+            exploration (float): the exploration factor for this iteration,
+                uctk * sqrt(log(playout_count))
 
-        return node.ucb1_score
+        Returns:
+            numpy.ndarray: the UCB1 score of each node
+        """
+        visits = self.tree.visits[nodes]
+        scores = self.tree.wins[nodes] / visits
+        if player != self.side:
+            # Get scores from opponent's point of view
+            scores = 1.0 - scores
+        return scores + exploration / np.sqrt(visits)
 
+    def move_scores(self, children):
+        """
+        Returns the scores by which the move is chosen from the root children,
+        before any proven values are taken into account.
 
-class UCTTreeNode(object):
-    """
-    Class representing a single node in the MCTS tree. 
+        Args:
+            children (numpy.ndarray): indices of the root children
 
-    Attributes:
-        id (int): unique number identifying the node in the tree
-        state (numpy.ndarray): two dimensional array representing the game board
-        side (int): the player side, defined in the game rules
-        parent (int): id of the parent of this node or None
-        visits (int): number of times this node has been visited
-        wins (int): number of visits to this node that have resulted in a win
-        untried_moves ([(int, int)]): list of child moves that haven't been 
-            explored yet in the form [Move], where Move is the tuple of 
-            coordinates required to reach a child board state
-        child_nodes ({(int, int):TreeNode}): dict of child nodes in the form 
-            (Move:ChildNode), where Move is the tuple of coordinates required to 
-            reach the board state corresponding to ChildNode 
-    """
-    new_id = itertools.count().next  # function that returns sequential integers
+        Returns:
+            numpy.ndarray: the ratio of wins to visits of each child, or zero
+                if it has not been visited
+        """
+        targets = self.tree.target[children]
+        return self.tree.wins[targets] / np.maximum(
+                self.tree.visits[targets], 1)
 
-    def __init__(self, board, side, parent=None):
+    def solver_scores(self, children, scores):
         """
-        Constructor.
+        Overrides the scores of root children whose values have been proven,
+        so that a proven win is always chosen and a proven loss is not chosen
+        if there is any alternative.
 
         Args:
-            board (numpy.ndarray): two dimensional array representing the game 
-                board
-            side (int): the player side, defined in the game rules
-            parent (int): id of the parent of this node or None
+            children (numpy.ndarray): indices of the root children
+            scores (numpy.ndarray): the score of each child
+
+        Returns:
+            numpy.ndarray: the scores with proven wins raised above, and proven
+                losses lowered below, every other score
+        """
+        proven = self.tree.proven[self.tree.target[children]]
+        return np.where(proven == 1, np.inf, np.where(proven == 0, -np.inf,
+                scores))
+
+    def backpropagate(self, path, boards, results):
+        """
+        Adds the results of the games played in an iteration to the nodes on
+        the path taken. The path is used rather than the parents of the nodes,
+        as nodes in a transposition graph may have several parents.
+
+        Args:
+            path ([int]): indices of the nodes visited, starting at the root
+            boards (numpy.ndarray): array of shape (games, cells) with the
+                flattened final board of each game
+            results (numpy.ndarray): the score of each game for the root
+                player, 1 for a win, 0.5 for a draw and 0 for a loss
+        """
+        self.tree.visits[path] += len(results)
+        self.tree.wins[path] += results.sum()
+
+    def expand(self, node, player, board):
+        """
+        Adds one untried child to a non-terminal leaf and plays a batch of
+        games from the new node.
+
+        Args:
+            node (int): index of the leaf reached by selection
+            player (int): the side of the player to move at the leaf
+            board (numpy.ndarray): the board at the leaf, which may be changed
+
+        Returns:
+            int: index of the child added, or NO_NODE if none was added
+            int: index of the node holding the statistics of the child, or
+                the leaf if no child was added
+            numpy.ndarray: the winner of each game
+            numpy.ndarray: the flattened final board of each game
+            numpy.ndarray: the board at the returned node
         """
-        self.id = UCTTreeNode.new_id()  # get a unique number to identify the node
-        self.state = board
-        self.side = side
-        self.parent = parent
-        self.visits = 0
-        self.wins = 0
-        self.ucb1_score = None
-        self.untried_moves = rules.empty_cells(self.state).tolist()
-        self.child_nodes = {}
-
-    def best_moves(self):
+        tree = self.tree
+        child = NO_NODE
+        if (self.__expand and tree.has_untried(node) and
+                rules.winner(board) is None and
+                not rules.board_full(board)):
+            untried_moves = tree.untried_moves(node)
+            move = untried_moves[random.randrange(len(untried_moves))]
+            board.flat[move] = player
+            child = tree.add_child(node, move, board)
+            node, board = self.__follow(child, player, board)
+            player = -player
+
+        # Terminal boards are scored by the same call, as every game in the
+        # batch has the same result
+        winners, boards = self.playouts(board, player, self.rollout_batch)
+        return child, node, winners, boards, board
+
+    def playouts(self, board, player, count=1):
         """
-        Finds and returns the moves leading to the child nodes with the highest
-        scores.
+        Plays a number of games from a position with the rollout policy, or
+        values it exactly if it has few enough empty cells for minimax.
+
+        Args:
+            board (numpy.ndarray): two dimensional array representing the board
+            player (int): the side of the player to move
+            count (int): number of games to play
 
         Returns:
-            [(int, int)]: list of tuples with the coordinates of the new move
+            numpy.ndarray: the winner of each game, or EMPTY for a draw
+            numpy.ndarray: the flattened final board of each game
         """
-        best_moves = []
-        for move in self.child_nodes:
-            if not best_moves:
-                best_moves = [move]
-            else:
-                move_score = self.child_nodes[move].score()
-                best_score = self.child_nodes[best_moves[0]].score()
-                if move_score > best_score:
-                    best_moves = [move]
-                elif move_score == best_score:
-                    best_moves.append(move)
-        return best_moves
-
-    def score(self):
-        """Returns the score for this node, the ratio of wins resulting from 
-        this node to the number of times it was visited."""
-        if self.visits != 0:
-            return float(self.wins) / float(self.visits)
+        if self._exact(board):
+            value = self.__minimax.value(board, player)
+            winners = np.full(count, player * value, dtype=int)
+            return winners, np.tile(board.ravel(), (count, 1))
+        elif self.rollout_policy is not None:
+            return self.rollout_policy.playouts(board, player, count,
+                    return_boards=True)
+        elif count == 1:
+            # A single game is played on the reusable scratch board
+            winner = self.__scratch.playout(board, player)
+            return np.asarray([winner]), self.__scratch.board
+        return rollout.random_playouts(board, player, count,
+                return_boards=True)
+
+    def refresh_best_children(self):
+        """
+        Finds the root children with the highest score by scanning all of
+        them. The best children are otherwise updated from the root child of
+        each iteration, so subclasses that change the statistics of several
+        root children at once call this when the statistics are complete.
+        """
+        tree = self.tree
+        best_children = tree.best_children(ROOT)
+        if best_children != self.__best_children:
+            self.__best_changed = True
+        self.__best_children = best_children
+        self.__best_score = (tree.score(best_children[0]) if best_children
+                else None)
+
+    def finish_search(self):
+        """Completes any iterations still pending when the search stops. Each
+        iteration is completed before the next starts here, so there is
+        nothing to do, but subclasses may defer parts of their iterations."""
+        pass
+
+    def finish(self, won):
+        self.__stop_pondering()
+        if self.book is not None and self.book.path:
+            self.book.save()
+
+    def close(self):
+        """Stops pondering and shuts down the worker processes used for
+        root-parallel search."""
+        self.__stop_pondering()
+        if self.__parallel:
+            self.__parallel.close()
+
+    def parallel_kwargs(self):
+        """Returns the constructor arguments for the agents run by the
+        root-parallel workers."""
+        return dict(time_budget=self.time_budget,
+                max_playouts=self.max_playouts,
+                convergence_limit=self.convergence_limit, uctk=self.uctk,
+                clock_interval=self.clock_interval, reuse_tree=False,
+                rollout_batch=self.rollout_batch,
+                transpositions=self.transpositions, symmetries=self.symmetries,
+                max_nodes=self.max_nodes, prune=self.prune,
+                rollout_policy=self.rollout_policy, solver=self.solver,
+                expand_all=self.expand_all, minimax_cells=self.minimax_cells,
+                confidence=self.confidence)
+
+    def __parallel_moves(self, board):
+        """Returns the best moves from independent searches run in parallel,
+        based on the statistics of the root children merged across them."""
+        start_time = time.time()
+        self.stop_reason = None
+        if self.__parallel is None:
+            self.__parallel = RootParallel(self.processes)
+        self.tree = self.__parallel.search(type(self), self.parallel_kwargs(),
+                board, self.side)
+        self.playout_count = self.__parallel.playouts
+        self.playouts_per_second = self.playout_count / max(
+                time.time() - start_time, 1e-9)
+        if self.logger:
+            self.logger.info("MCTS: {} playouts in {} processes, {:.0f} "
+                    "playouts/s".format(self.playout_count, self.processes,
+                    self.playouts_per_second))
+        return self.tree.best_moves(ROOT)
+
+    def __start_pondering(self, board, move):
+        """Starts searching below the child for a move in a background
+        thread, unless the move ends the game."""
+        child = self.tree.child(ROOT, np.ravel_multi_index(move, board.shape))
+        after = board.copy()
+        after[tuple(move)] = self.side
+        if (child == NO_NODE or rules.winner(after) is not None or
+                rules.board_full(after)):
+            return
+        self.__ponder_stop.clear()
+        self.__ponder_thread = threading.Thread(target=self.__ponder,
+                args=(board.copy(), child))
+        self.__ponder_thread.daemon = True
+        self.__ponder_thread.start()
+
+    def __ponder(self, board, child):
+        """Runs search iterations through a root child until stopped, or until
+        max_playouts have been made or the tree is full."""
+        start_count = self.playout_count
+        self.__expand = True
+        while (not self.__ponder_stop.is_set() and
+                self.playout_count - start_count < self.max_playouts):
+            if (self.solver and
+                    not np.isnan(self.tree.proven[self.tree.target[child]])):
+                break
+            if (self.max_nodes and
+                    self.tree.size + self.__headroom > self.max_nodes):
+                break
+            self.mcts(board, child)
+        self.ponder_playouts = self.playout_count - start_count
+
+    def __stop_pondering(self):
+        """Stops the background search, waiting for its iteration to finish
+        so that the tree may be used."""
+        if self.__ponder_thread is not None:
+            self.__ponder_stop.set()
+            self.__ponder_thread.join()
+            self.__ponder_thread = None
         else:
+            self.ponder_playouts = 0
+
+    def __book_nodes(self, board):
+        """Generates the nodes below the root whose positions may be stored in
+        the book, as tuples of the node, its board and the player who moved
+        to reach it, starting with the root. The children of each node are
+        read after it has been generated, so children added by the caller
+        are also visited."""
+        tree = self.tree
+        queue = [(ROOT, board, -self.side)]
+        for node, node_board, player in queue:
+            if not self.book.covers(node_board):
+                continue
+            yield node, node_board, player
+            if tree.target[node] != node:
+                continue
+            for child in tree.children(node):
+                child_board = node_board.copy()
+                child_board.flat[tree.move[child]] = -player
+                queue.append((child, child_board, -player))
+
+    def __book_stats(self, board):
+        """Returns the visits and wins of the nodes in the book's range, keyed
+        by book key, with wins counted for the player who moved to reach each
+        node."""
+        tree = self.tree
+        stats = {}
+        for node, node_board, player in self.__book_nodes(board):
+            if tree.target[node] != node:
+                continue
+            visits = tree.visits[node]
+            wins = tree.wins[node] if player == self.side else (visits -
+                    tree.wins[node])
+            entry = stats.setdefault(self.book.key(node_board),
+                    [0, 0.0, node_board])
+            entry[0] += visits
+            entry[1] += wins
+        return stats
+
+    def __seed_tree(self, board):
+        """Adds the children recorded in the book to the nodes in its range,
+        with the book statistics as their initial visits and wins."""
+        tree = self.tree
+        seeded = 0
+        for node, node_board, player in self.__book_nodes(board):
+            if tree.target[node] != node:
+                continue
+            for move in tree.untried_moves(node):
+                child_board = node_board.copy()
+                child_board.flat[move] = -player
+                prior = self.book.prior(child_board)
+                if prior is None or int(round(prior[0])) == 0:
+                    continue
+                child = tree.add_child(node, move, child_board)
+                if tree.target[child] != child:
+                    continue
+                visits = int(round(prior[0]))
+                wins = prior[1] * visits / prior[0]
+                tree.visits[child] = visits
+                tree.wins[child] = wins if -player == self.side else (visits -
+                        wins)
+                if node == ROOT:
+                    seeded += visits
+        tree.visits[ROOT] = max(tree.visits[ROOT], seeded)
+
+    def __update_book(self, board, start_stats):
+        """Adds the visits and wins made by the last search to the book."""
+        for key, (visits, wins, node_board) in self.__book_stats(
+                board).items():
+            start_visits, start_wins, _ = start_stats.get(key, (0, 0.0, None))
+            if visits > start_visits:
+                self.book.add(node_board, visits - start_visits,
+                        wins - start_wins)
+
+    def __root_tree(self, board):
+        """Returns the subtree of the previous tree reached by our last move
+        and the opponent's reply, or a new tree if it cannot be found."""
+        tree = self.tree
+        if (not self.reuse_tree or self.transpositions or tree is None or
+                tree.side != self.side or tree.board.shape != board.shape):
+            return self.new_tree(board)
+
+        # Exactly two previously empty cells should have been filled, one by
+        # each player
+        changed = np.flatnonzero(tree.board != board)
+        if (len(changed) == 2 and (tree.board.flat[changed] == rules.EMPTY)
+                .all() and board.flat[changed].sum() == 0):
+            move = changed[board.flat[changed] == self.side][0]
+            reply = changed[board.flat[changed] == -self.side][0]
+            node = tree.child(ROOT, move)
+            if node != NO_NODE:
+                node = tree.child(node, reply)
+            if node != NO_NODE:
+                return tree.subtree(node)
+        return self.new_tree(board)
+
+    def new_tree(self, board):
+        """Returns a new, empty tree for the board."""
+        return TreeStore(board, self.side, transpositions=self.transpositions,
+                symmetric=self.symmetries, capacity_limit=self.max_nodes,
+                solver=self.solver)
+
+    def __limit_tree(self):
+        """Prunes the tree when it is too full for another iteration, or stops
+        it growing if it cannot be pruned or pruning frees too little."""
+        tree = self.tree
+        if self.prune and tree.table is None:
+            tree = self.tree = tree.prune(self.max_nodes // 2)
+            self.prune_count += 1
+
+            # The root children keep their block at the start of the tree,
+            # but are removed if even they do not fit in the pruned size
+            self.__best_children = tree.best_children(ROOT)
+        self.__expand = tree.size + self.__headroom <= self.max_nodes
+
+    def _exact(self, board):
+        """Returns True if a position is to be valued by minimax."""
+        return (self.minimax_cells > 0 and np.count_nonzero(
+                board == rules.EMPTY) <= self.minimax_cells)
+
+    def __solve(self, path):
+        """Passes the proven value of the node at the end of a path up the
+        path, for as long as the values of the nodes can be proven.
+        A node is proven when the player to move has a proven winning child,
+        or when all of its moves have been tried and every child is proven, in
+        which case the player takes the best of their values."""
+        for depth in range(len(path) - 2, -1, -1):
+            if not self.__prove(path[depth], depth):
+                break
+
+    def __prove(self, node, depth):
+        """Proves the value of a node at a depth from the root from the values
+        of its children, if it can be, and returns True if it was proven."""
+        tree = self.tree
+        first = tree.first_child[node]
+        values = tree.proven[tree.target[first:first + tree.child_count[node]]]
+
+        # Values are for the root player, who moves at even depths
+        best = 1.0 if depth % 2 == 0 else 0.0
+        if (values == best).any():
+            tree.proven[node] = best
+        elif not tree.has_untried(node) and not np.isnan(values).any():
+            tree.proven[node] = values.max() if best else values.min()
+        else:
+            return False
+        return True
+
+    def __single_node(self):
+        """Returns True if each iteration adds a single node to the tree and
+        plays the rest of its games from there."""
+        return (not self.expand_all or self.rollout_batch > 1 or
+                self.rollout_policy is not None)
+
+    def __follow(self, child, player, board):
+        """Plays the move to a child on the board, returning the node holding
+        the statistics of the child and the board at that node."""
+        tree = self.tree
+        node = tree.target[child]
+        if node != child and tree.symmetric:
+            # The linked node may be a rotation or reflection of the child
+            return node, tree.node_board(node)
+        board.flat[tree.move[child]] = player
+        return node, board
+
+    def __clock_stop(self, manager, elapsed, playouts, target, limit):
+        """Returns True if the time manager stops the search, judging the
+        lead of the root child that would be played."""
+        children = self.tree.children(ROOT)
+        scores = self.move_scores(children)
+        return manager.stop(elapsed, playouts,
+                self.tree.visits[self.tree.target[children]],
+                scores.argmax() if len(scores) else None, target, limit)
+
+    def __early_stop(self, elapsed, time_left, playouts_left, playouts):
+        """
+        Checks the early stopping rules, which apply once every root move has
+        a child. Both rules are checked for the child that would be played,
+        the one with the highest score from `move_scores`.
+
+        Args:
+            elapsed (float): number of seconds since the search started
+            time_left (float): number of seconds left in the time budget
+            playouts_left (int): number of playouts left in the playout budget
+            playouts (int): number of playouts since the search started
+
+        Returns:
+            str: STOP_UNREACHABLE if the best child is the most visited and
+                cannot be overtaken in visits in the remaining budget at the
+                current playout rate, STOP_CONFIDENT if the confidence bounds
+                of the value of the best child and the others do not overlap,
+                or None to carry on
+        """
+        tree = self.tree
+        if tree.has_untried(ROOT):
             return None
+        children = tree.children(ROOT)
+        targets = tree.target[children]
+        visits = tree.visits[targets]
+        if len(visits) < 2:
+            return STOP_UNREACHABLE
+        leader = self.move_scores(children).argmax()
+
+        # The best child can only be caught in visits if the most visited of
+        # the others gets all of the remaining playouts
+        rate = playouts / max(elapsed, 1e-9)
+        lead = visits[leader] - np.delete(visits, leader).max()
+        if lead > min(playouts_left, rate * time_left):
+            return STOP_UNREACHABLE
+
+        # Results lie between 0 and 1, so their standard deviation is at most
+        # a half
+        if not visits.all():
+            return None
+        values = tree.wins[targets] / visits
+        margins = self.confidence * 0.5 / np.sqrt(visits)
+        upper = values + margins
+        upper[leader] = -np.inf
+        if values[leader] - margins[leader] > upper.max():
+            return STOP_CONFIDENT
+        return None
+
+    def __record_trace(self, start_time, start_count):
+        """Records the statistics of the root children in the trace."""
+        tree = self.tree
+        children = tree.children(ROOT)
+        targets = tree.target[children]
+        scores = self.ucb1_scores(targets, self.side, self.uctk *
+                self.__log_sqrt(self.playout_count)) if len(targets) else []
+        self.trace.record(self.playout_count - start_count,
+                time.time() - start_time, tree.move[children],
+                tree.visits[targets], tree.wins[targets], scores)
+
+    def __log_sqrt(self, count):
+        """Returns sqrt(log(count)) from a table that is extended as the
+        playout count grows."""
+        if count >= len(self.__log_table):
+            size = max(2 * len(self.__log_table), count + 1, 1024)
+            self.__log_table = np.sqrt(np.log(np.maximum(np.arange(size), 1)))
+        return self.__log_table[count]
+
+    def __update_best_children(self, child):
+        """Updates the list of root children with the highest score after a
+        playout through the given child, and returns True if it changed."""
+        if child == NO_NODE:
+            return False
+        tree = self.tree
+        best_children = self.__best_children
+        score = tree.score(child)
+        if tree.table is not None:
+            # Root children may share a node, so scan them all
+            new_best_children = tree.best_children(ROOT)
+            self.__best_score = tree.score(new_best_children[0])
+            self.__best_children = new_best_children
+            return new_best_children != best_children
+        elif child in best_children:
+            if score == self.__best_score:
+                return False
+            if score > self.__best_score and len(best_children) == 1:
+                self.__best_score = score
+                return False
 
-    def __str__(self):
-        """Returns a string representation of the board state represented by 
-        this node."""
-        return rules.board_str(self.state)
+            # The score of a best child changed so scan all the children
+            new_best_children = tree.best_children(ROOT)
+            self.__best_score = tree.score(new_best_children[0])
+            self.__best_children = new_best_children
+            return new_best_children != best_children
+        elif self.__best_score is None or score > self.__best_score:
+            self.__best_children = [child]
+            self.__best_score = score
+            return True
+        elif score == self.__best_score:
+            best_children.append(child)
+            return True
+        return False
 
 
 def generate_graph(root_node):
-    # Visualise the tree
+    # Visualise the tree, importing the graphing module here as it depends on
+    # pygraphviz
+    import graphing.mcts_graph as graphing
     print "Generating graph..."
     t = time.time()
 
@@ -279,7 +1031,7 @@ if __name__ == "__main__":
         game = TicTacToe([human, mcts_agent], shuffle=True, logger=logger)
         while True:
             game.run()
-            generate_graph(mcts_agent.root_node)
+            generate_graph(mcts_agent.tree.view())
 
     else:
         random.seed(7)
@@ -297,4 +1049,4 @@ if __name__ == "__main__":
         board = np.asarray([[-1, 1, 1], [0, -1, 1], [1, -1, 0]])
         mcts_agent.move(board)
 
-        generate_graph(mcts_agent.root_node)
+        generate_graph(mcts_agent.tree.view())
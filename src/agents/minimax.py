@@ -1,9 +1,11 @@
 """
-This module contains agents that use minimax to select optimal moves.
+This module contains agents that use minimax to select optimal moves, and a
+cached minimax search used to evaluate positions exactly.
 """
 
 from players import Player
 import rules
+import numpy as np
 
 
 class MiniMaxAgent(Player):
@@ -167,3 +169,74 @@ class MiniMaxDepthAgent(Player):
             # move = tuple(empty_cells[results_list.index(min_element)])
             # return min_element, move
             return min_element, None  # don't need the actual move
+
+
+class MiniMaxTable(object):
+    """
+    Exact game values of positions, found by minimax and cached in a
+    transposition table.
+
+    Values are from the point of view of the player to move, so the search is
+    written in negamax form, and the moves at a node are not searched further
+    once a win has been found. Every position visited is cached, so positions
+    reached again by other move orders, or in later searches, are looked up
+    rather than searched. The table is unbounded, so it is intended for
+    positions with few empty cells.
+
+    Example use:
+    >> table = MiniMaxTable()
+    >> table.value(board, rules.CROSS)
+
+    Attributes:
+        k (int): the number of cells in a row required to win, or None for the
+            length of the shortest side of the board
+        table ({(str, int): int}): map of positions and players to values
+    """
+
+    def __init__(self, k=None):
+        """
+        Constructor.
+
+        Args:
+            k (int): the number of cells in a row required to win, defaults to
+                the length of the shortest side of the board
+        """
+        self.k = k
+        self.table = {}
+
+    def value(self, board, player):
+        """
+        Returns the game value of a position for the player to move.
+
+        Args:
+            board (numpy.ndarray): two dimensional array representing the board
+            player (int): the side of the player to move
+
+        Returns:
+            int: 1 if the player to move wins, 0 for a draw or -1 for a loss
+        """
+        return self.__negamax(board.copy(), player)
+
+    def __negamax(self, board, player):
+        """Returns the value of a position for the player to move, searching
+        the moves on the board in place."""
+        key = (board.tostring(), player)
+        if key in self.table:
+            return self.table[key]
+
+        winner = rules.winner(board, self.k)
+        if winner is not None:
+            value = 1 if winner == player else -1
+        elif rules.board_full(board):
+            value = 0
+        else:
+            value = -1
+            for cell in np.flatnonzero(board.ravel() == rules.EMPTY):
+                board.flat[cell] = player
+                value = max(value, -self.__negamax(board, -player))
+                board.flat[cell] = rules.EMPTY
+                if value == 1:
+                    break
+
+        self.table[key] = value
+        return value
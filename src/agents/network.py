@@ -0,0 +1,230 @@
+"""
+This module contains a small multilayer perceptron, written in NumPy, that
+predicts move probabilities and the value of a position. It is used by the
+PUCT agent through `evaluators.NetworkEvaluator` for boards too large for
+tables, and trained on self-play games by the `self_play` module.
+
+Boards are encoded as three planes for the cells of the player to move, the
+cells of the opponent and the empty cells, so the network sees each position
+from the point of view of the player to move. The input is shared by a hidden
+layer of rectified linear units, which feeds a policy head with a softmax over
+the empty cells and a value head with a sigmoid output.
+
+Example use:
+>> network = MLPNetwork((3, 3), hidden=64)
+>> network.train(boards, players, policies, values)
+>> network.save('network.npz')
+"""
+
+import numpy as np
+import rules
+
+
+class MLPNetwork(object):
+    """
+    Policy and value network with a single hidden layer, trained with Adam.
+
+    Attributes:
+        shape ((int, int)): the shape of the boards evaluated
+        hidden (int): number of hidden units
+        learning_rate (float): step size for training
+        params ({str: numpy.ndarray}): the weights and biases of the layers
+    """
+
+    # Names of the parameter arrays, in the order they are saved
+    PARAMS = ('w_hidden', 'b_hidden', 'w_policy', 'b_policy', 'w_value',
+            'b_value')
+
+    def __init__(self, shape, hidden=64, learning_rate=0.01, seed=None):
+        """
+        Constructor.
+
+        Args:
+            shape ((int, int)): the shape of the boards evaluated
+            hidden (int): number of hidden units
+            learning_rate (float): step size for training
+            seed (int): optional seed for the initial weights
+        """
+        self.shape = tuple(shape)
+        self.hidden = hidden
+        self.learning_rate = learning_rate
+        cells = self.shape[0] * self.shape[1]
+        generator = np.random.RandomState(seed)
+        self.params = {
+            'w_hidden': generator.normal(0, np.sqrt(2.0 / (3 * cells)),
+                    (3 * cells, hidden)),
+            'b_hidden': np.zeros(hidden),
+            'w_policy': generator.normal(0, np.sqrt(1.0 / hidden),
+                    (hidden, cells)),
+            'b_policy': np.zeros(cells),
+            'w_value': generator.normal(0, np.sqrt(1.0 / hidden),
+                    (hidden, 1)),
+            'b_value': np.zeros(1),
+        }
+        self.__moments = None
+        self.__steps = 0
+
+    def planes(self, boards, players):
+        """
+        Encodes boards as the input of the network.
+
+        Args:
+            boards (numpy.ndarray): array of shape (count, cells) with the
+                flattened boards
+            players (numpy.ndarray): the side of the player to move on each
+                board
+
+        Returns:
+            numpy.ndarray: array of shape (count, 3 * cells) with the cells of
+                the player to move, the cells of the opponent and the empty
+                cells of each board
+        """
+        boards = boards * np.asarray(players).reshape(-1, 1)
+        return np.hstack((boards == 1, boards == -1, boards == 0)).astype(
+                np.float64)
+
+    def predict(self, boards, players):
+        """
+        Evaluates a batch of positions.
+
+        Args:
+            boards (numpy.ndarray): array of shape (count, cells) with the
+                flattened boards
+            players (numpy.ndarray): the side of the player to move on each
+                board
+
+        Returns:
+            numpy.ndarray: array of shape (count, cells) with the probability
+                of each move, which is zero for occupied cells
+            numpy.ndarray: the value of each position for the player to move,
+                between 0 for a loss and 1 for a win
+        """
+        _, priors, values = self.__forward(boards, players)
+        return priors, values
+
+    def train(self, boards, players, policies, values, epochs=1,
+            batch_size=64, seed=None):
+        """
+        Trains the network on a set of positions by minimising the cross
+        entropy of the predicted and target policies plus the squared error of
+        the predicted values.
+
+        Args:
+            boards (numpy.ndarray): array of shape (count, cells) with the
+                flattened boards
+            players (numpy.ndarray): the side of the player to move on each
+                board
+            policies (numpy.ndarray): array of shape (count, cells) with the
+                target probability of each move
+            values (numpy.ndarray): the target value of each position for the
+                player to move
+            epochs (int): number of passes over the positions
+            batch_size (int): number of positions in each training step
+            seed (int): optional seed for shuffling the positions
+
+        Returns:
+            float: the mean loss over the last epoch
+        """
+        boards, players = np.asarray(boards), np.asarray(players)
+        policies, values = np.asarray(policies), np.asarray(values)
+        generator = np.random.RandomState(seed)
+        loss = 0.0
+        for _ in range(epochs):
+            order = generator.permutation(len(boards))
+            loss = 0.0
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                loss += self.__step(boards[batch], players[batch],
+                        policies[batch], values[batch]) * len(batch)
+            loss /= max(len(order), 1)
+        return loss
+
+    def save(self, path):
+        """
+        Saves the network to a file that may be read by `load`.
+
+        Args:
+            path (string): the path to the output file
+        """
+        with open(path, 'wb') as network_file:
+            np.savez_compressed(network_file, shape=self.shape,
+                    **self.params)
+
+    def __forward(self, boards, players):
+        """Returns the inputs, the hidden activations, the move
+        probabilities and the values of a batch of positions."""
+        params = self.params
+        inputs = self.planes(boards, players)
+        hidden = np.maximum(inputs.dot(params['w_hidden']) +
+                params['b_hidden'], 0)
+
+        # Softmax over the empty cells only
+        logits = hidden.dot(params['w_policy']) + params['b_policy']
+        logits = np.where(boards == rules.EMPTY, logits, -1e9)
+        logits -= logits.max(axis=1, keepdims=True)
+        priors = np.exp(logits)
+        priors /= priors.sum(axis=1, keepdims=True)
+
+        values = 1.0 / (1.0 + np.exp(-(hidden.dot(params['w_value']) +
+                params['b_value'])[:, 0]))
+        return (inputs, hidden), priors, values
+
+    def __step(self, boards, players, policies, values):
+        """Makes a single training step on a batch of positions, returning
+        the loss before the step."""
+        params = self.params
+        (inputs, hidden), priors, predicted = self.__forward(boards, players)
+        count = float(len(boards))
+        loss = (-(policies * np.log(np.maximum(priors, 1e-12))).sum() +
+                ((predicted - values) ** 2).sum()) / count
+
+        # Gradients of the loss, where the softmax gradient is the difference
+        # between the predicted and target policies
+        d_logits = (priors - policies) / count
+        d_values = (2 * (predicted - values) * predicted *
+                (1 - predicted) / count)[:, np.newaxis]
+        d_hidden = (d_logits.dot(params['w_policy'].T) +
+                d_values.dot(params['w_value'].T)) * (hidden > 0)
+        gradients = {
+            'w_hidden': inputs.T.dot(d_hidden),
+            'b_hidden': d_hidden.sum(axis=0),
+            'w_policy': hidden.T.dot(d_logits),
+            'b_policy': d_logits.sum(axis=0),
+            'w_value': hidden.T.dot(d_values),
+            'b_value': d_values.sum(axis=0),
+        }
+
+        # Adam update
+        if self.__moments is None:
+            self.__moments = dict((name, (np.zeros_like(value),
+                    np.zeros_like(value))) for name, value in params.items())
+        self.__steps += 1
+        beta1, beta2 = 0.9, 0.999
+        scale = (self.learning_rate * np.sqrt(1 - beta2 ** self.__steps) /
+                (1 - beta1 ** self.__steps))
+        for name, gradient in gradients.items():
+            mean, variance = self.__moments[name]
+            mean *= beta1
+            mean += (1 - beta1) * gradient
+            variance *= beta2
+            variance += (1 - beta2) * gradient ** 2
+            params[name] -= scale * mean / (np.sqrt(variance) + 1e-8)
+        return loss
+
+
+def load(path, learning_rate=0.01):
+    """
+    Loads a network saved by `MLPNetwork.save`.
+
+    Args:
+        path (string): the path to the network file
+        learning_rate (float): step size for further training
+
+    Returns:
+        MLPNetwork: the loaded network
+    """
+    data = np.load(path)
+    network = MLPNetwork(data['shape'], data['b_hidden'].size, learning_rate)
+    for name in MLPNetwork.PARAMS:
+        network.params[name] = data[name]
+    return network
@@ -0,0 +1,172 @@
+"""
+This module contains a persistent store of MCTS statistics for opening
+positions, which lets agents carry what they learn about the opening from one
+game to the next and across restarts.
+
+Positions are identified by their canonical form under rotation and
+reflection, as the value of a position does not change when the board is
+turned, and positions are only stored up to a maximum number of tokens on the
+board. Statistics are recorded from the point of view of the player who made
+the last move, so they do not depend on which side the agent plays.
+
+Books are saved in numpy's `.npz` format, holding the canonical boards as an
+array of bytes with the visit and win counts alongside.
+
+Example use:
+>> book = opening_book.load('openings.npz', depth=4)
+>> agent = MCTSAgentUCB1(book=book)
+>> ... play games ...
+>> book.save()
+"""
+
+import os
+import numpy as np
+import rules
+
+
+class OpeningBook(object):
+    """
+    Class storing the visit and win counts of opening positions.
+
+    Attributes:
+        depth (int): the maximum number of tokens on the board for positions
+            to be stored
+        prior_limit (int): the maximum number of visits given to a node when
+            its statistics are used as a prior, so that a well studied opening
+            does not stop the search from exploring
+        path (string): the path the book is saved to by default, or None
+        entries ({str: [float, float]}): map of canonical position keys to the
+            visits and wins of each position, where wins are counted for the
+            player who made the last move
+    """
+
+    def __init__(self, depth=4, prior_limit=100, path=None):
+        """
+        Constructor.
+
+        Args:
+            depth (int): the maximum number of tokens on the board for
+                positions to be stored
+            prior_limit (int): the maximum number of visits given to a node
+                when its statistics are used as a prior
+            path (string): optional default path for `save`
+        """
+        self.depth = depth
+        self.prior_limit = prior_limit
+        self.path = path
+        self.entries = {}
+        self.__shape = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def key(self, board):
+        """Returns the key of a board, which is the same for all symmetries of
+        the board and does not depend on its data type."""
+        return rules.canonical(board.astype(np.int8))
+
+    def covers(self, board):
+        """Returns True if a board has few enough tokens to be stored."""
+        return np.count_nonzero(board) <= self.depth
+
+    def stats(self, board):
+        """
+        Returns the statistics recorded for a position.
+
+        Args:
+            board (numpy.ndarray): two dimensional array representing the board
+
+        Returns:
+            (float, float): the number of visits and the number of wins for
+                the player who made the last move, or None if the position has
+                not been recorded
+        """
+        entry = self.entries.get(self.key(board))
+        return tuple(entry) if entry else None
+
+    def prior(self, board):
+        """
+        Returns the statistics of a position scaled down to at most
+        `prior_limit` visits, for use as the initial statistics of a node.
+
+        Args:
+            board (numpy.ndarray): two dimensional array representing the board
+
+        Returns:
+            (float, float): the number of visits and the number of wins for
+                the player who made the last move, or None if the position has
+                not been recorded
+        """
+        stats = self.stats(board)
+        if not stats or not stats[0]:
+            return None
+        visits, wins = stats
+        scale = min(1.0, self.prior_limit / float(visits))
+        return visits * scale, wins * scale
+
+    def add(self, board, visits, wins):
+        """
+        Adds visits and wins to the statistics of a position.
+
+        Args:
+            board (numpy.ndarray): two dimensional array representing the board
+            visits (float): the number of visits to add
+            wins (float): the number of wins to add, for the player who made
+                the last move
+        """
+        if self.__shape is None:
+            self.__shape = board.shape
+        elif board.shape != self.__shape:
+            raise ValueError("Board shape {0} does not match the book."
+                    .format(board.shape))
+        entry = self.entries.setdefault(self.key(board), [0.0, 0.0])
+        entry[0] += visits
+        entry[1] += wins
+
+    def save(self, path=None):
+        """
+        Saves the book to a file that may be read by `load`.
+
+        Args:
+            path (string): the path to the output file, defaults to the path
+                of the book
+        """
+        path = path or self.path
+        if path is None:
+            raise ValueError("No path given to save the book.")
+        shape = self.__shape or (0, 0)
+        keys = sorted(self.entries)
+        boards = np.frombuffer(b''.join(keys), dtype=np.int8).reshape(
+                (len(keys),) + shape)
+        stats = np.asarray([self.entries[key] for key in keys],
+                dtype=np.float64).reshape(-1, 2)
+        with open(path, 'wb') as book_file:
+            np.savez_compressed(book_file, boards=boards, visits=stats[:, 0],
+                    wins=stats[:, 1], depth=self.depth)
+
+
+def load(path, depth=4, prior_limit=100):
+    """
+    Loads a book saved by `OpeningBook.save`, or creates an empty book if the
+    file does not exist yet, so that the same call may be used on the first
+    run and after restarts.
+
+    Args:
+        path (string): the path to the book file, which becomes the default
+            path for saving the book
+        depth (int): the maximum number of tokens on the board for positions
+            to be stored, used if the file does not exist
+        prior_limit (int): the maximum number of visits given to a node when
+            its statistics are used as a prior
+
+    Returns:
+        OpeningBook: the loaded book
+    """
+    if not os.path.exists(path):
+        return OpeningBook(depth, prior_limit, path)
+    data = np.load(path)
+    book = OpeningBook(int(data['depth']), prior_limit, path)
+    for board, visits, wins in zip(data['boards'], data['visits'],
+            data['wins']):
+        book.add(board, visits, wins)
+    return book
@@ -0,0 +1,262 @@
+"""
+This module contains agents that use proof-number search to solve positions.
+"""
+
+from players import Player
+import rules
+import time
+
+# Proof and disproof numbers at this value represent an infinite cost
+INFINITY = 10 ** 9
+
+
+class ProofNumberAgent(Player):
+    """
+    Agent that uses depth-first proof-number search (df-pn) to solve the game.
+
+    Unlike minimax, proof-number search expands the most-proving node first, so
+    it can prove the value of m,n,k variants such as 4x4 k=3 or 5x5 k=4 without
+    exhausting the move tree. Proof-number search answers binary questions, so
+    the game value is found with up to two searches: one attempting to prove a
+    win for the player to move, and if that fails, one attempting to prove a
+    win for the opponent. If neither succeeds the position is a draw.
+
+    Search results are stored in a transposition table of (phi, delta, work)
+    entries keyed by position, where phi and delta are the proof and disproof
+    numbers from the point of view of the player to move and work is the number
+    of nodes searched below the position. When the table exceeds its maximum
+    size the entries with the least work are discarded.
+
+    Attributes:
+        k (int): the number of cells in a row required to win, or None for a
+            full row of the board
+        max_entries (int): maximum number of transposition table entries
+        max_nodes (int): maximum number of nodes to search for each proof, or
+            None for no limit
+        progress_interval (int): number of nodes between progress reports
+        epsilon (float): threshold growth factor, used to reduce thrashing
+            between sibling nodes (the 1 + epsilon trick)
+        table ({(str, int): (int, int, int)}): the transposition table
+        nodes (int): number of nodes searched in the current proof
+    """
+    WIN = 1
+    DRAW = 0
+    LOSS = -1
+
+    def __init__(self, k=None, max_entries=1000000, max_nodes=None,
+            progress_interval=100000, epsilon=0.25, side=None, logger=None):
+        """
+        Constructor.
+
+        Args:
+            k (int): the number of cells in a row required to win, or None for
+                a full row of the board
+            max_entries (int): maximum number of transposition table entries
+            max_nodes (int): maximum number of nodes to search for each proof,
+                or None for no limit
+            progress_interval (int): number of nodes between progress reports
+            epsilon (float): threshold growth factor for child searches
+            side (int): the player side, defined in the game rules
+            logger (RootLogger): optional logger for output
+        """
+        super(ProofNumberAgent, self).__init__(side, logger)
+        self.k = k
+        self.max_entries = max_entries
+        self.max_nodes = max_nodes
+        self.progress_interval = progress_interval
+        self.epsilon = epsilon
+        self.table = {}
+        self.nodes = 0
+        self.__attacker = None
+        self.__root_values = (1, 1)
+        self.__start_time = None
+
+    def move(self, board):
+        _, move = self.solve(board, self.side)
+        return move
+
+    def solve(self, board, player):
+        """
+        Solves the position for the player to move.
+
+        Args:
+            board (numpy.ndarray): two dimensional array representing the board
+            player (int): the side of the player to move
+
+        Returns:
+            result (int): WIN, DRAW or LOSS for the player to move, or None if
+                the position could not be solved within the node limit
+            move ((int, int)): a winning move for a win, a drawing move for a
+                draw, otherwise the most promising move found
+        """
+        board = board.copy()
+
+        # Try to prove a win for the player to move
+        if self.prove(board, player, player):
+            return self.WIN, self.__best_move(board, player)
+        move = self.__best_move(board, player)
+        if self.__root_values[1] != 0:
+            # Search was stopped before the root was disproven
+            return None, move
+
+        # Try to prove a win for the opponent, disproving it means a draw
+        proven = self.prove(board, player, -player)
+        if proven:
+            return self.LOSS, self.__best_move(board, player)
+        if self.__root_values[0] == 0:
+            return self.DRAW, self.__best_move(board, player)
+        return None, move
+
+    def prove(self, board, player, attacker):
+        """
+        Runs a single df-pn search to prove whether the attacker can force a
+        win from the given position.
+
+        Args:
+            board (numpy.ndarray): two dimensional array representing the board
+            player (int): the side of the player to move
+            attacker (int): the side attempting to force a win
+
+        Returns:
+            bool: True if a win for the attacker was proven, False if it was
+                disproven or the search was stopped
+        """
+        self.table = {}
+        self.nodes = 0
+        self.__attacker = attacker
+        self.__start_time = time.time()
+
+        value = self.__terminal_value(board, player)
+        if value is not None:
+            self.__root_values = value
+        else:
+            self.__root_values = self.__mid(board, player, INFINITY, INFINITY,
+                    True)
+
+        self.__report("Proof finished")
+
+        # Convert phi and delta to the proof number of the attacker
+        pn = self.__root_values[0 if player == attacker else 1]
+        return pn == 0
+
+    def __mid(self, board, player, phi_threshold, delta_threshold, root=False):
+        """Multiple iterative deepening search of a non-terminal node, which
+        returns once phi or delta reaches its threshold."""
+        self.nodes += 1
+        if self.nodes % self.progress_interval == 0:
+            self.__report("Proof progress")
+        nodes_start = self.nodes
+        key = (board.tostring(), player)
+
+        # Generate the children, evaluating terminal positions immediately so
+        # that one move wins are found without further search
+        children = []
+        empty_cells = rules.empty_cells(board)
+        for move in empty_cells:
+            move = tuple(move)
+            board[move] = player
+            child_key = (board.tostring(), -player)
+            if child_key not in self.table:
+                # Only the lines through the new move need to be checked
+                if rules.completes_line(board, move, self.k):
+                    self.table[child_key] = self.__result_value(player,
+                            -player) + (INFINITY,)
+                elif len(empty_cells) == 1:
+                    self.table[child_key] = self.__result_value(None,
+                            -player) + (INFINITY,)
+            board[move] = rules.EMPTY
+            children.append((move, child_key))
+
+        while True:
+            # The phi of a node is the minimum delta of its children, and delta
+            # is the sum of the children's phi values
+            phi = INFINITY
+            delta = 0
+            second_delta = INFINITY
+            best_move = None
+            best_phi = 0
+            for move, child_key in children:
+                child_phi, child_delta, _ = self.table.get(child_key, (1, 1, 0))
+                delta = min(delta + child_phi, INFINITY)
+                if child_delta < phi:
+                    second_delta = phi
+                    phi = child_delta
+                    best_move = move
+                    best_phi = child_phi
+                elif child_delta < second_delta:
+                    second_delta = child_delta
+
+            if root:
+                self.__root_values = (phi, delta)
+            if (phi >= phi_threshold or delta >= delta_threshold or
+                    self.__stopped()):
+                break
+
+            # Search the most proving child until it exceeds its thresholds
+            child_phi_threshold = delta_threshold - delta + best_phi
+            child_delta_threshold = min(phi_threshold,
+                    int(second_delta * (1 + self.epsilon)) + 1)
+            board[best_move] = player
+            self.__mid(board, -player, child_phi_threshold,
+                    child_delta_threshold)
+            board[best_move] = rules.EMPTY
+
+        self.table[key] = (phi, delta, self.nodes - nodes_start)
+        if len(self.table) > self.max_entries:
+            self.__collect_garbage()
+        return phi, delta
+
+    def __terminal_value(self, board, player):
+        """Returns (phi, delta) for a terminal position with the given player
+        to move, or None if the game has not finished. Draws count as a
+        failure for the attacker."""
+        winner = rules.winner(board, self.k)
+        if winner is None and not rules.board_full(board):
+            return None
+        return self.__result_value(winner, player)
+
+    def __result_value(self, winner, player):
+        """Returns (phi, delta) for a finished game with the given winner and
+        player to move."""
+        if (winner == self.__attacker) == (player == self.__attacker):
+            return 0, INFINITY
+        else:
+            return INFINITY, 0
+
+    def __best_move(self, board, player):
+        """Returns the move leading to the child with the lowest delta, which
+        is the proving move when the root is proven."""
+        best_move = None
+        best_delta = None
+        for move in rules.empty_cells(board):
+            move = tuple(move)
+            board[move] = player
+            _, delta, _ = self.table.get((board.tostring(), -player), (1, 1, 0))
+            board[move] = rules.EMPTY
+            if best_delta is None or delta < best_delta:
+                best_move = move
+                best_delta = delta
+        return best_move
+
+    def __collect_garbage(self):
+        """Discards the half of the transposition table entries with the least
+        work, keeping terminal positions."""
+        entries = sorted((item for item in self.table.items()
+                if item[1][2] < INFINITY), key=lambda item: item[1][2])
+        for key, _ in entries[:len(self.table) // 2]:
+            del self.table[key]
+
+    def __stopped(self):
+        """Returns True if the node limit has been reached."""
+        return self.max_nodes is not None and self.nodes >= self.max_nodes
+
+    def __report(self, message):
+        """Logs the progress of the current proof."""
+        if not self.logger:
+            return
+        elapsed = max(time.time() - self.__start_time, 1e-9)
+        phi, delta = self.__root_values
+        self.logger.info("{}: attacker {}, {} nodes, {} entries, {:.0f} "
+                "nodes/s, root phi {} delta {}".format(message,
+                rules.side_name(self.__attacker), self.nodes, len(self.table),
+                self.nodes / elapsed, phi, delta))
@@ -0,0 +1,358 @@
+"""
+This module contains rollout policies, used by Monte Carlo tree search agents
+to play simulated games to the end from positions in the tree.
+
+Uniformly random games are played by `random_playouts`, which fills the boards
+of a whole batch of games in one step. Heavier policies, which look at the
+position before each move, are subclasses of `RolloutPolicy`: they still play
+a batch of games at once, but a move at a time, and find the cells that win or
+must be blocked from the line sums of every board in the batch rather than by
+trying each move in turn.
+
+Example use:
+>> policy = WinBlockRollout()
+>> winners = policy.playouts(board, rules.CROSS, 64)
+"""
+
+import random
+import numpy as np
+import rules
+import tablebase
+
+# Cache of the line cells for each board shape and k
+_lines = {}
+
+
+def random_playouts(board, player, count, k=None, return_boards=False):
+    """
+    Plays a batch of random games to the end from the same position at once.
+
+    Rather than stepping through each game a move at a time, every game is
+    given a random order in which the empty cells are filled, and the boards
+    of all the games are filled in a single vectorised step. A line is then
+    completed at the time its last cell is filled, provided every cell belongs
+    to the same side, and the winner of each game is the owner of the line
+    completed first. Games with no complete line are draws.
+
+    Args:
+        board (numpy.ndarray): two dimensional array representing the board
+        player (int): the side of the player to move
+        count (int): number of games to play
+        k (int): the number of cells in a row required to win, defaults to the
+            length of the shortest side of the board
+        return_boards (bool): when true the final boards are also returned
+
+    Returns:
+        numpy.ndarray: array with the winning side of each game, or EMPTY for
+            a draw
+        numpy.ndarray: if return_boards is true, an array of shape (count,
+            cells) with the flattened final board of each game
+    """
+    lines = _line_cells(board.shape, k)
+    cells = board.ravel()
+    empty = np.flatnonzero(cells == rules.EMPTY)
+
+    # Number the moves in each game, with -1 for cells filled before the
+    # playouts started, and fill each cell with the side making that move
+    times = np.full((count, cells.size), -1, dtype=np.int32)
+    times[:, empty] = np.random.random((count, len(empty))).argsort(axis=1)
+    boards = np.tile(cells, (count, 1))
+    boards[:, empty] = np.where(times[:, empty] % 2 == 0, player, -player)
+
+    # Find the time at which each line is completed, if it ever is
+    line_cells = boards[:, lines]
+    complete = np.abs(line_cells.sum(axis=2)) == lines.shape[1]
+    never = cells.size
+    completed = np.where(complete, times[:, lines].max(axis=2), never)
+
+    # The first line completed decides the game
+    games = np.arange(count)
+    first = completed.argmin(axis=1)
+    end = completed[games, first]
+    winners = np.where(end < never, line_cells[games, first, 0], rules.EMPTY)
+    if not return_boards:
+        return winners
+
+    # Clear the cells that would have been filled after the game ended
+    boards[times > end[:, np.newaxis]] = rules.EMPTY
+    return winners, boards
+
+
+class ScratchPlayout(object):
+    """
+    Plays single random games on a scratch board that is allocated once and
+    reset for each game, so that no board copies or move lists are created as
+    the game is played.
+
+    The sums of the lines through each cell are updated as each move is made,
+    so a win is found by checking only the lines through the cell played. The
+    board of the last game is left in `board`, where it is overwritten by the
+    next game.
+
+    Attributes:
+        board (numpy.ndarray): array of shape (1, cells) holding the flattened
+            final board of the last game
+    """
+
+    def __init__(self, shape, k=None):
+        """
+        Constructor.
+
+        Args:
+            shape ((int, int)): the number of rows and columns on the board
+            k (int): the number of cells in a row required to win, defaults to
+                the length of the shortest side of the board
+        """
+        self.board = np.zeros((1, shape[0] * shape[1]), dtype=int)
+        self.__lines = _line_cells(shape, k)
+        self.__k = self.__lines.shape[1]
+        self.__cell_lines = [np.flatnonzero((self.__lines == cell).any(
+                axis=1)).tolist() for cell in range(self.board.size)]
+        self.__line_cells = np.zeros(self.__lines.shape, dtype=int)
+        self.__sums = np.zeros(len(self.__lines), dtype=int)
+
+    def playout(self, board, player):
+        """
+        Plays a random game to the end on the scratch board.
+
+        Args:
+            board (numpy.ndarray): two dimensional array representing the board
+            player (int): the side of the player to move
+
+        Returns:
+            int: the winning side, or EMPTY for a draw
+        """
+        cells = self.board[0]
+        cells[:] = board.ravel()
+        sums = self.__sums
+        np.take(cells, self.__lines, out=self.__line_cells).sum(axis=1,
+                out=sums)
+        k = self.__k
+        finished = np.flatnonzero(np.abs(sums) == k)
+        if len(finished):
+            return int(np.sign(sums[finished[0]]))
+
+        sums = sums.tolist()
+        empty = np.flatnonzero(cells == rules.EMPTY).tolist()
+        random.shuffle(empty)
+        cell_lines = self.__cell_lines
+        for cell in empty:
+            cells[cell] = player
+            for line in cell_lines[cell]:
+                sums[line] += player
+                if sums[line] == player * k:
+                    return player
+            player = -player
+        return rules.EMPTY
+
+
+def threat_cells(boards, lines, sums, side):
+    """
+    Finds the cells that would complete a line for a side on each board in a
+    batch, i.e. the empty cell of every line holding k - 1 of the side's tokens
+    and no others.
+
+    Args:
+        boards (numpy.ndarray): array of shape (games, cells) with the
+            flattened board of each game
+        lines (numpy.ndarray): array of shape (lines, k) with the cells in
+            each line, as returned by `rules.lines`
+        sums (numpy.ndarray): array of shape (games, lines) with the sum of
+            each line on each board
+        side (int): the side to find winning cells for
+
+    Returns:
+        numpy.ndarray: boolean array of shape (games, cells) marking the
+            winning cells
+    """
+    k = lines.shape[1]
+    games, threats = np.nonzero(sums == side * (k - 1))
+    cells = lines[threats]
+    empty = boards[games[:, np.newaxis], cells] == rules.EMPTY
+    found = np.zeros(boards.shape, dtype=bool)
+    found[np.repeat(games, k)[empty.ravel()], cells[empty]] = True
+    return found
+
+
+def tablebase_values(table):
+    """
+    Converts a tablebase into a value table for `EpsilonGreedyRollout`.
+
+    Args:
+        table (Tablebase): the solved table
+
+    Returns:
+        numpy.ndarray: array indexed by position rank with the value of each
+            position for the player who made the last move, 1 for a win, 0.5
+            for a draw or unknown position and 0 for a loss
+    """
+    size = 3 ** (table.rows * table.cols)
+    shifts = np.arange(4, dtype=np.uint8) * 2
+    values = ((np.asarray(table.data)[:, np.newaxis] >> shifts) & 3).ravel()
+    scores = np.full(4, 0.5)
+    scores[tablebase.WIN] = 0.0
+    scores[tablebase.LOSS] = 1.0
+    return scores[values[:size]]
+
+
+class RolloutPolicy(object):
+    """
+    Base class for rollout policies that choose each move from the position.
+
+    All the games in a batch are played at the same time, a move at a time,
+    so the same player is to move in every unfinished game. Subclasses
+    implement `choose` to pick the next move of each game.
+    """
+
+    def playouts(self, board, player, count, k=None, return_boards=False):
+        """
+        Plays a batch of games to the end from the same position.
+
+        Args:
+            board (numpy.ndarray): two dimensional array representing the board
+            player (int): the side of the player to move
+            count (int): number of games to play
+            k (int): the number of cells in a row required to win, defaults to
+                the length of the shortest side of the board
+            return_boards (bool): when true the final boards are also returned
+
+        Returns:
+            numpy.ndarray: array with the winning side of each game, or EMPTY
+                for a draw
+            numpy.ndarray: if return_boards is true, an array of shape (count,
+                cells) with the flattened final board of each game
+        """
+        lines = _line_cells(board.shape, k)
+        boards = np.tile(board.ravel(), (count, 1))
+        winner = rules.winner(board, k)
+        winners = np.full(count, winner or rules.EMPTY, dtype=boards.dtype)
+        active = np.arange(count)
+        if winner is not None or rules.board_full(board):
+            active = active[:0]
+
+        while len(active):
+            current = boards[active]
+            sums = current[:, lines].sum(axis=2)
+            wins = threat_cells(current, lines, sums, player)
+            moves = self.choose(current, lines, sums, wins, player)
+            games = np.arange(len(active))
+            boards[active, moves] = player
+
+            # Games end when a winning cell is played or the board fills
+            won = wins[games, moves]
+            winners[active[won]] = player
+            full = (current != rules.EMPTY).sum(axis=1) + 1 == current.shape[1]
+            active = active[~(won | full)]
+            player = -player
+
+        if return_boards:
+            return winners, boards
+        return winners
+
+    def choose(self, boards, lines, sums, wins, player):
+        """
+        Chooses the next move in each game.
+
+        Args:
+            boards (numpy.ndarray): array of shape (games, cells) with the
+                flattened board of each unfinished game
+            lines (numpy.ndarray): array of shape (lines, k) with the cells in
+                each line
+            sums (numpy.ndarray): array of shape (games, lines) with the sum of
+                each line on each board
+            wins (numpy.ndarray): boolean array of shape (games, cells) marking
+                the cells that win the game for the player to move
+            player (int): the side of the player to move
+
+        Returns:
+            numpy.ndarray: the flat index of the cell played in each game
+        """
+        raise NotImplementedError
+
+
+class RandomRollout(RolloutPolicy):
+    """Policy playing uniformly random moves, using `random_playouts`."""
+
+    def playouts(self, board, player, count, k=None, return_boards=False):
+        return random_playouts(board, player, count, k, return_boards)
+
+    def choose(self, boards, lines, sums, wins, player):
+        return _random_cells(boards == rules.EMPTY)
+
+
+class WinFirstRollout(RolloutPolicy):
+    """Policy playing a winning move when there is one, otherwise a random
+    move."""
+
+    def choose(self, boards, lines, sums, wins, player):
+        return _random_cells(np.where(wins.any(axis=1)[:, np.newaxis], wins,
+                boards == rules.EMPTY))
+
+
+class WinBlockRollout(RolloutPolicy):
+    """Policy playing a winning move when there is one, otherwise blocking a
+    winning move for the opponent, otherwise a random move."""
+
+    def choose(self, boards, lines, sums, wins, player):
+        blocks = threat_cells(boards, lines, sums, -player)
+        cells = np.where(blocks.any(axis=1)[:, np.newaxis], blocks,
+                boards == rules.EMPTY)
+        return _random_cells(np.where(wins.any(axis=1)[:, np.newaxis], wins,
+                cells))
+
+
+class EpsilonGreedyRollout(RolloutPolicy):
+    """
+    Policy playing the move to the position with the highest value in a value
+    table, or a random move with a small probability.
+
+    Positions are looked up by rank, the base 3 number formed by the cells of
+    the board as used by `tablebase`, so tables are only practical for small
+    boards. Ties between moves of equal value are broken at random.
+
+    Attributes:
+        values (numpy.ndarray): array indexed by position rank with the value
+            of each position for the player who made the last move
+        epsilon (float): probability of playing a random move
+    """
+
+    def __init__(self, values, epsilon=0.1):
+        """
+        Constructor.
+
+        Args:
+            values (numpy.ndarray): array indexed by position rank with the
+                value of each position for the player who made the last move,
+                such as the array returned by `tablebase_values`
+            epsilon (float): probability of playing a random move
+        """
+        self.values = values
+        self.epsilon = epsilon
+
+    def choose(self, boards, lines, sums, wins, player):
+        empty = boards == rules.EMPTY
+        powers = 3 ** np.arange(boards.shape[1], dtype=np.int64)
+
+        # Noughts map to 1 and crosses (-1) to 2 under modulo 3, and each move
+        # adds the player's digit to the rank of the board
+        ranks = np.dot(np.mod(boards, 3), powers)
+        children = ranks[:, np.newaxis] + (player % 3) * powers
+        values = np.where(empty, self.values[np.where(empty, children, 0)],
+                -1.0)
+        best = values == values.max(axis=1)[:, np.newaxis]
+        explore = np.random.random(len(boards)) < self.epsilon
+        return _random_cells(np.where(explore[:, np.newaxis], empty, best))
+
+
+def _line_cells(shape, k):
+    """Returns the cached cells in every line for a board shape and k."""
+    key = (shape, k)
+    if key not in _lines:
+        _lines[key] = rules.lines(shape, k)
+    return _lines[key]
+
+
+def _random_cells(cells):
+    """Returns a cell chosen uniformly at random from those marked on each row
+    of a boolean array."""
+    return np.where(cells, np.random.random(cells.shape), -1.0).argmax(axis=1)
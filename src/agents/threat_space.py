@@ -0,0 +1,469 @@
+"""
+This module contains agents that use threat-space search to select moves on
+large m,n,k boards such as 15x15 gomoku (k=5).
+"""
+
+from players import Player, RandomCellAgent
+import rules
+import numpy as np
+import random
+import time
+
+# Pattern types counted for each line
+FOUR = 0  # k - 1 stones in a window of k cells
+THREE = 1  # k - 2 stones in a window of k cells
+OPEN_FOUR = 2  # k - 1 stones in a window of k + 1 cells with empty ends
+OPEN_THREE = 3  # k - 2 stones in a window of k + 1 cells with empty ends
+OPEN_TWO = 4  # k - 3 stones in an open window, used to generate threes
+
+
+class ThreatBoard(object):
+    """
+    Board that keeps incremental counts of threat patterns as moves are made.
+
+    Patterns are counted in windows, the segments of k or k + 1 consecutive
+    cells along each row, column and diagonal. A window holding stones of only
+    one side contains a pattern for that side: k - 1 stones in a window of k
+    cells is a four (k-1 pattern), which wins at its empty cell, and k - 2
+    stones is a three (k-2 pattern). A pattern is open when it lies inside a
+    window of k + 1 cells whose end cells are both empty, so it can be extended
+    at either end; patterns in k cell windows that are not open are closed.
+
+    Only the windows through a cell are updated when a move is made or undone,
+    so updating the counts costs O(k) rather than O(board size).
+
+    Attributes:
+        rows (int): number of rows on the board
+        cols (int): number of columns on the board
+        k (int): the number of cells in a row required to win
+        cells ([int]): flattened list of cell values
+        hash (int): Zobrist hash of the current position
+        line_counts ({int: [[int]]}): pattern counts for each side, indexed
+            by [line][pattern] where pattern is one of FOUR, THREE, OPEN_FOUR
+            or OPEN_THREE
+    """
+
+    def __init__(self, board, k=None):
+        """
+        Constructor.
+
+        Args:
+            board (numpy.ndarray): two dimensional array representing the board
+            k (int): the number of cells in a row required to win, defaults to
+                the length of the shortest side of the board
+        """
+        self.rows, self.cols = board.shape
+        self.k = min(self.rows, self.cols) if k is None else k
+        self.cells = [rules.EMPTY] * (self.rows * self.cols)
+        self.hash = 0
+
+        self.__build_windows()
+        self.__keys = dict((side, [random.getrandbits(64) for _ in self.cells])
+                for side in rules.sides)
+        self.__stones = dict((side, [0] * len(self.__windows))
+                for side in rules.sides)
+        self.__ends = [0] * len(self.__windows)
+
+        # Pattern types indexed by [long window][open][number of stones]
+        k = self.k
+        short = [{k - 1: FOUR, k - 2: THREE}.get(n) for n in range(k + 2)]
+        self.__patterns = [[short, short], [[None] * (k + 2),
+                [{k - 1: OPEN_FOUR, k - 2: OPEN_THREE, k - 3: OPEN_TWO}.get(n)
+                for n in range(k + 2)]]]
+        self.__window_long = [int(len(cells) > k) for cells in self.__windows]
+        self.line_counts = dict((side, [[0] * 4 for _ in
+                range(self.__line_count)]) for side in rules.sides)
+        self.__pattern_windows = dict((side, [set() for _ in range(5)])
+                for side in rules.sides)
+
+        # Record the windows holding no stones
+        for window in range(len(self.__windows)):
+            for side in rules.sides:
+                self.__set_pattern(window, side, None, self.__pattern(window,
+                        side))
+
+        for cell in np.flatnonzero(board):
+            self.place(int(cell), board.flat[cell])
+
+    def __build_windows(self):
+        """Lists the cells in every window of k and k + 1 cells, the line each
+        window lies on and the windows containing each cell."""
+        self.__windows = []
+        self.__window_lines = []
+        self.__cell_windows = [[] for _ in self.cells]
+        lines = {}
+        for direction, (dx, dy) in enumerate(((0, 1), (1, 0), (1, 1), (1, -1))):
+            for length in (self.k, self.k + 1):
+                for x in range(self.rows):
+                    for y in range(self.cols):
+                        end_x = x + dx * (length - 1)
+                        end_y = y + dy * (length - 1)
+                        if not (0 <= end_x < self.rows and
+                                0 <= end_y < self.cols):
+                            continue
+
+                        line_key = self.__line_key(direction, x, y)
+                        line = lines.setdefault(line_key, len(lines))
+
+                        window = len(self.__windows)
+                        cells = [(x + dx * i) * self.cols + y + dy * i
+                                for i in range(length)]
+                        self.__windows.append(cells)
+                        self.__window_lines.append(line)
+                        for i, cell in enumerate(cells):
+                            is_end = length > self.k and i in (0, length - 1)
+                            self.__cell_windows[cell].append((window, is_end))
+        self.__line_count = len(lines)
+
+    def __line_key(self, direction, x, y):
+        """Returns a key identifying the line through a cell in a
+        direction."""
+        if direction == 0:
+            return direction, x
+        elif direction == 1:
+            return direction, y
+        elif direction == 2:
+            return direction, y - x
+        else:
+            return direction, x + y
+
+    @property
+    def board(self):
+        """numpy.ndarray: two dimensional array representing the board"""
+        return np.asarray(self.cells).reshape(self.rows, self.cols)
+
+    def place(self, cell, side):
+        """
+        Places a stone, updating the pattern counts.
+
+        Args:
+            cell (int): index of the cell in the flattened board
+            side (int): the side of the stone
+        """
+        self.cells[cell] = side
+        self.hash ^= self.__keys[side][cell]
+        self.__update(cell, side, 1)
+
+    def remove(self, cell):
+        """
+        Removes a stone, updating the pattern counts.
+
+        Args:
+            cell (int): index of the cell in the flattened board
+        """
+        side = self.cells[cell]
+        self.cells[cell] = rules.EMPTY
+        self.hash ^= self.__keys[side][cell]
+        self.__update(cell, side, -1)
+
+    def winning_cells(self, side):
+        """Returns the set of cells that complete a line for the side."""
+        return self.__empty_cells(self.__pattern_windows[side][FOUR])
+
+    def four_moves(self, side):
+        """Returns the set of cells that create a four for the side."""
+        return self.__empty_cells(self.__pattern_windows[side][THREE])
+
+    def open_three_moves(self, side):
+        """Returns the set of cells that create an open three for the side,
+        excluding the end cells of the open window."""
+        moves = set()
+        for window in self.__pattern_windows[side][OPEN_TWO]:
+            moves.update(cell for cell in self.__windows[window][1:-1]
+                    if self.cells[cell] == rules.EMPTY)
+        return moves
+
+    def open_three_defences(self, side):
+        """Returns the set of empty cells in the open threes of the side,
+        which are the cells where the opponent may block them."""
+        return self.__empty_cells(self.__pattern_windows[side][OPEN_THREE])
+
+    def pattern_counts(self, side):
+        """
+        Returns the total number of each pattern for a side.
+
+        Args:
+            side (int): the side of the player
+
+        Returns:
+            numpy.ndarray: array of counts indexed by pattern type
+        """
+        return np.asarray(self.line_counts[side]).sum(axis=0)
+
+    def __empty_cells(self, windows):
+        """Returns the set of empty cells in a collection of windows."""
+        return set(cell for window in windows for cell in self.__windows[window]
+                if self.cells[cell] == rules.EMPTY)
+
+    def __update(self, cell, side, delta):
+        """Updates the stone counts of each window through the cell and moves
+        the windows between pattern types as required."""
+        own = self.__stones[side]
+        other = self.__stones[-side]
+        ends = self.__ends
+        patterns = self.__patterns
+        for window, is_end in self.__cell_windows[cell]:
+            # Look up the patterns by window length, whether the window is
+            # open and the number of stones
+            table = patterns[self.__window_long[window]]
+            before_own = own[window]
+            before_open = ends[window] == 0
+            own[window] += delta
+            if is_end:
+                ends[window] += delta
+            after_open = ends[window] == 0
+
+            # The window only holds a pattern for a side without opponent
+            # stones in it
+            if not other[window]:
+                self.__set_pattern(window, side,
+                        table[before_open][before_own],
+                        table[after_open][own[window]])
+            if not before_own or not own[window] or before_open != after_open:
+                self.__set_pattern(window, -side,
+                        None if before_own else
+                        table[before_open][other[window]],
+                        None if own[window] else
+                        table[after_open][other[window]])
+
+    def __pattern(self, window, side):
+        """Returns the pattern type the window holds for the side, or None."""
+        if self.__stones[-side][window]:
+            return None
+        table = self.__patterns[self.__window_long[window]]
+        return table[self.__ends[window] == 0][self.__stones[side][window]]
+
+    def __set_pattern(self, window, side, before, after):
+        """Moves a window from one pattern type to another."""
+        if before == after:
+            return
+        line_counts = self.line_counts[side]
+        line = self.__window_lines[window]
+        if before is not None:
+            self.__pattern_windows[side][before].discard(window)
+            if before != OPEN_TWO:
+                line_counts[line][before] -= 1
+        if after is not None:
+            self.__pattern_windows[side][after].add(window)
+            if after != OPEN_TWO:
+                line_counts[line][after] += 1
+
+
+class ThreatSpaceAgent(Player):
+    """
+    Agent that uses threat-space search to find forced wins on large boards.
+
+    The search considers only forcing moves: the attacker may play a four or
+    an open three, and the defender may only block the threat (or, against an
+    open three, counter with a four of its own). This reduces the branching
+    factor from hundreds of moves to a handful, so winning threat sequences
+    can be found on boards where full-width search and uniform random rollouts
+    are hopeless. The search uses iterative deepening on the number of
+    attacking moves within the time budget.
+
+    Each turn the agent completes its own lines, blocks the opponent's fours,
+    plays the first move of a winning threat sequence if it finds one, and
+    otherwise looks for a move that refutes the opponent's threat sequence.
+    If none of these apply the move is chosen by the fallback agent.
+
+    Attributes:
+        k (int): the number of cells in a row required to win, or None for a
+            full row of the board
+        time_budget (float): number of seconds to search for each move
+        max_depth (int): maximum number of attacking moves in a sequence
+        fallback (Player): agent used when there is no forcing move
+        nodes (int): number of nodes searched for the last move
+    """
+
+    def __init__(self, k=None, time_budget=1.0, max_depth=10, fallback=None,
+            side=None, logger=None):
+        """
+        Constructor.
+
+        Args:
+            k (int): the number of cells in a row required to win, or None for
+                a full row of the board
+            time_budget (float): number of seconds to search for each move
+            max_depth (int): maximum number of attacking moves in a sequence
+            fallback (Player): agent used when there is no forcing move,
+                defaults to a random agent
+            side (int): the player side, defined in the game rules
+            logger (RootLogger): optional logger for output
+        """
+        super(ThreatSpaceAgent, self).__init__(side, logger)
+        self.k = k
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.fallback = fallback if fallback else RandomCellAgent()
+        self.nodes = 0
+        self.__deadline = None
+        self.__table = {}
+
+    def move(self, board):
+        self.__deadline = time.time() + self.time_budget
+        self.nodes = 0
+        threats = ThreatBoard(board, self.k)
+        cols = threats.cols
+
+        # Complete a line, or block the opponent from completing one
+        for side in (self.side, -self.side):
+            cells = threats.winning_cells(side)
+            if cells:
+                return divmod(min(cells), cols)
+
+        # Play a winning threat sequence if there is one
+        move, _ = self.search(threats, self.side)
+        if move is not None:
+            if self.logger:
+                self.logger.debug("Threat sequence found ({} nodes)".format(
+                        self.nodes))
+            return divmod(move, cols)
+
+        # Refute the opponent's threat sequence if there is one
+        move = self.refute(threats)
+        if move is not None:
+            return divmod(move, cols)
+
+        self.fallback.side = self.side
+        return self.fallback.move(board)
+
+    def search(self, threats, attacker):
+        """
+        Searches for a winning threat sequence for the attacker, who is to
+        move.
+
+        Args:
+            threats (ThreatBoard): the current position
+            attacker (int): the side of the attacking player
+
+        Returns:
+            move (int): the first move of a winning sequence as an index into
+                the flattened board, or None if none was found
+            complete (bool): False if the search ran out of time before every
+                sequence up to the maximum depth was tried
+        """
+        self.__table = {}
+        try:
+            for depth in range(1, self.max_depth + 1):
+                move = self.__attack(threats, attacker, depth)
+                if move is not None:
+                    return move, True
+        except _Timeout:
+            return None, False
+        return None, True
+
+    def refute(self, threats):
+        """
+        Finds a move that refutes the opponent's winning threat sequence.
+
+        Args:
+            threats (ThreatBoard): the current position
+
+        Returns:
+            int: a refuting move as an index into the flattened board, or None
+                if the opponent has no threat sequence or no refutation was
+                found within the time budget
+        """
+        opponent = -self.side
+        threat_move, _ = self.search(threats, opponent)
+        if threat_move is None:
+            return None
+
+        # Candidate defences are the opponent's first move and the cells of
+        # its potential fours and threes
+        candidates = [threat_move] + sorted((threats.four_moves(opponent) |
+                threats.open_three_moves(opponent) |
+                threats.open_three_defences(opponent)) - set([threat_move]))
+        for cell in candidates:
+            threats.place(cell, self.side)
+            try:
+                move, complete = self.search(threats, opponent)
+            finally:
+                threats.remove(cell)
+            if move is None and complete:
+                return cell
+            if not complete:
+                break
+        return None
+
+    def __attack(self, threats, attacker, depth):
+        """Returns a winning move for the attacker (to move) using at most
+        depth threats, or None."""
+        self.__count_node()
+        wins = threats.winning_cells(attacker)
+        if wins:
+            return min(wins)
+
+        # The attacker must block if the defender has a four
+        blocks = threats.winning_cells(-attacker)
+        if len(blocks) > 1 or depth == 0:
+            return None
+
+        key = (threats.hash, attacker, depth)
+        if key in self.__table:
+            return self.__table[key]
+
+        if blocks:
+            candidates = sorted(blocks)
+        else:
+            fours = threats.four_moves(attacker)
+            candidates = sorted(fours) + sorted(
+                    threats.open_three_moves(attacker) - fours)
+
+        result = None
+        for move in candidates:
+            threats.place(move, attacker)
+            try:
+                won = self.__defend(threats, attacker, depth - 1)
+            finally:
+                threats.remove(move)
+            if won:
+                result = move
+                break
+
+        self.__table[key] = result
+        return result
+
+    def __defend(self, threats, attacker, depth):
+        """Returns True if the attacker wins against every defence to its
+        threats, where the defender is to move."""
+        self.__count_node()
+        defender = -attacker
+        if threats.winning_cells(defender):
+            return False
+
+        wins = threats.winning_cells(attacker)
+        if len(wins) > 1:
+            return True
+        if wins:
+            # A four must be blocked at its empty cell
+            replies = wins
+        else:
+            # An open three may be blocked in the window or answered with a
+            # four; without a threat the defender is free to play anywhere
+            replies = threats.open_three_defences(attacker)
+            if not replies:
+                return False
+            replies |= threats.four_moves(defender)
+
+        for reply in sorted(replies):
+            threats.place(reply, defender)
+            try:
+                won = self.__attack(threats, attacker, depth) is not None
+            finally:
+                threats.remove(reply)
+            if not won:
+                return False
+        return True
+
+    def __count_node(self):
+        """Counts a searched node, stopping the search when the time budget
+        has been used."""
+        self.nodes += 1
+        if self.nodes % 256 == 0 and time.time() > self.__deadline:
+            raise _Timeout()
+
+
+class _Timeout(Exception):
+    """Raised to stop the search when the time budget has been used."""
+    pass
@@ -0,0 +1,164 @@
+"""
+This module contains a time manager that spends a clock for a whole game
+across the moves of an MCTS agent, rather than giving every move the same
+budget.
+
+Each search is given a target time, which is the remaining clock shared
+between the moves the agent has left to play, and a limit, which is a multiple
+of the target. A search stops before its target once the best move at the root
+cannot be overtaken in the time left, and carries on past it towards the limit
+while the best move has little lead over the next best. Time saved on easy
+moves is therefore spent on the moves where more search may change the
+result. Forced moves are played without a search.
+
+Example use:
+>> manager = TimeManager(game_time=5.0)
+>> agent = MCTSAgentUCB1(time_manager=manager)
+"""
+
+import math
+import numpy as np
+import rules
+
+
+class TimeManager(object):
+    """
+    Class dividing a game clock between the moves of an agent.
+
+    Attributes:
+        game_time (float): number of seconds for all the agent's moves in a
+            game
+        remaining (float): number of seconds left on the clock for the
+            current game
+        max_factor (float): the limit of a search as a multiple of its target
+        settled_share (float): share of the root visits above which the best
+            move is considered settled once the target has been reached
+        min_lead (float): lead of the best move over the next best, as a share
+            of the root visits, above which it is considered settled once the
+            target has been reached
+        reserve (float): share of the remaining clock that a single search may
+            not use, kept for the following moves
+        min_time (float): number of seconds given to a search once the clock
+            has run out
+    """
+
+    def __init__(self, game_time, max_factor=3.0, settled_share=0.5,
+            min_lead=0.1, reserve=0.2, min_time=0.01):
+        """
+        Constructor.
+
+        Args:
+            game_time (float): number of seconds for all the agent's moves in
+                a game
+            max_factor (float): the limit of a search as a multiple of its
+                target
+            settled_share (float): share of the root visits above which the
+                best move is settled
+            min_lead (float): lead of the best move as a share of the root
+                visits above which it is settled
+            reserve (float): share of the remaining clock kept for the
+                following moves
+            min_time (float): number of seconds given to a search once the
+                clock has run out
+        """
+        self.game_time = game_time
+        self.max_factor = max_factor
+        self.settled_share = settled_share
+        self.min_lead = min_lead
+        self.reserve = reserve
+        self.min_time = min_time
+        self.remaining = game_time
+
+    def start(self):
+        """Resets the clock for a new game."""
+        self.remaining = self.game_time
+
+    def forced_move(self, board, player):
+        """
+        Finds a move that needs no search: the only empty cell, a move that
+        wins at once, or the only cell that stops the opponent winning on the
+        next move.
+
+        Args:
+            board (numpy.ndarray): two dimensional array representing the board
+            player (int): the side of the player to move
+
+        Returns:
+            (int, int): the coordinates of the forced move, or None if the
+                move is not forced
+        """
+        cells = rules.empty_cells(board)
+        if len(cells) == 1:
+            return tuple(cells[0])
+        board = board.copy()
+        for side in (player, -player):
+            threats = []
+            for cell in cells:
+                cell = tuple(cell)
+                board[cell] = side
+                if rules.completes_line(board, cell):
+                    threats.append(cell)
+                board[cell] = rules.EMPTY
+            if side == player and threats:
+                return threats[0]
+            if side != player and len(threats) == 1:
+                return threats[0]
+        return None
+
+    def budget(self, board):
+        """
+        Returns the target and the limit of the search for a move.
+
+        Args:
+            board (numpy.ndarray): two dimensional array representing the board
+
+        Returns:
+            float: the number of seconds after which the search stops unless
+                the best move is still unsettled
+            float: the number of seconds after which the search always stops
+        """
+        empty = np.count_nonzero(board == rules.EMPTY)
+        moves_left = max(int(math.ceil(empty / 2.0)), 1)
+        target = max(self.remaining, 0.0) / moves_left
+        limit = max(min(target * self.max_factor,
+                max(self.remaining, 0.0) * (1 - self.reserve)), self.min_time)
+        return min(max(target, self.min_time), limit), limit
+
+    def stop(self, elapsed, playouts, visits, best, target, limit):
+        """
+        Decides whether a search should stop, from the lead in visits of the
+        root child that would be played.
+
+        Args:
+            elapsed (float): number of seconds since the search started
+            playouts (int): number of playouts since the search started
+            visits (numpy.ndarray): the visits of each root child
+            best (int): the index into visits of the child that would be
+                played, or None if the root has no children
+            target (float): the target of the search returned by `budget`
+            limit (float): the limit of the search returned by `budget`
+
+        Returns:
+            bool: True if the search should stop
+        """
+        if elapsed >= limit:
+            return True
+        total = visits.sum()
+        if len(visits) < 2 or not total or not playouts:
+            return elapsed >= target
+        lead = visits[best] - np.delete(visits, best).max()
+        if elapsed < target:
+            # Stop early if the best move cannot be overtaken in the time
+            # left at the current playout rate
+            return lead > playouts / elapsed * (target - elapsed)
+        return (visits[best] >= self.settled_share * total or
+                lead >= self.min_lead * total)
+
+    def update(self, elapsed):
+        """
+        Takes the time spent on a move off the clock.
+
+        Args:
+            elapsed (float): number of seconds spent on the move
+        """
+        self.remaining -= elapsed
@@ -108,11 +108,12 @@ def main():
     agent.bias = 0
     results += batch_run(game, 1000)
 
-    # Use optimal minimax agent
+    # Use optimal rules agent, which plays perfectly at the cost of a random
+    # agent so many more games can be run than against minimax
     agent.bias = 0
-    trainer = MiniMaxAgent(logger=logger)
+    trainer = OptimalRulesAgent(logger=logger)
     game.set_players([agent, trainer])
-    results += batch_run(game, 10)
+    results += batch_run(game, 1000)
 
     # Write results to file
     timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
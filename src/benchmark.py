@@ -0,0 +1,142 @@
+"""
+This module contains a benchmark that measures the strength of agents at a
+fixed number of playouts, by comparing the moves they choose against the
+optimal moves recorded in a tablebase.
+
+Test positions are sampled by random play from the empty board, keeping only
+positions where some moves are not optimal. An agent's accuracy is the fraction
+of test positions in which it chooses an optimal move, so agents can be
+compared at equal playout counts without the noise of playing whole games.
+
+The benchmark may be run from the command line as follows:
+
+    > python benchmark.py --agents ucb1 rave --playouts 100 300 1000
+
+Root policies for fixed playout budgets may be compared in the same way:
+
+    > python benchmark.py --agents ucb1 halving --playouts 30 100 300
+
+Rollout policies may be compared in the same way, for example:
+
+    > python benchmark.py --agents ucb1 --rollouts random winblock
+"""
+
+import argparse
+import random
+import time
+import numpy as np
+import rules
+import tablebase
+from agents.mcts_ucb1 import MCTSAgentUCB1
+from agents.mcts_rave import MCTSAgentRAVE
+from agents.mcts_puct import MCTSAgentPUCT
+from agents.mcts_halving import MCTSAgentHalving
+from agents import rollout
+
+# Agent classes that may be selected by name from the command line
+AGENTS = {
+    'ucb1': MCTSAgentUCB1,
+    'rave': MCTSAgentRAVE,
+    'puct': MCTSAgentPUCT,
+    'halving': MCTSAgentHalving,
+}
+
+# Rollout policies that may be selected by name, where None plays a random
+# rollout on a scratch board, expanding the whole playout only when the agent
+# has expand_all=True
+ROLLOUTS = {
+    'random': None,
+    'win': rollout.WinFirstRollout,
+    'winblock': rollout.WinBlockRollout,
+}
+
+
+def positions(table, count, seed=None):
+    """
+    Samples test positions by random play from the empty board.
+
+    Args:
+        table (Tablebase): the solved table for the board
+        count (int): number of positions to return
+        seed (int): optional seed for the random number generator
+
+    Returns:
+        [numpy.ndarray]: list of distinct non-terminal boards in which some
+            moves are not optimal
+    """
+    generator = random.Random(seed)
+    found = {}
+    while len(found) < count:
+        board = np.zeros((table.rows, table.cols), dtype=int)
+        for _ in range(generator.randrange(table.rows * table.cols - 1)):
+            player = tablebase.to_move(board)
+            board[tuple(generator.choice(rules.empty_cells(board)))] = player
+            if rules.winner(board, table.k) is not None:
+                break
+        if rules.winner(board, table.k) is not None:
+            continue
+        values = set(value for _, value in table.move_values(board))
+        if len(values) > 1:
+            found[board.tostring()] = board
+    return sorted(found.values(), key=lambda board: board.tostring())
+
+
+def accuracy(agent, boards, table):
+    """
+    Measures the fraction of positions in which an agent chooses an optimal
+    move.
+
+    Args:
+        agent (Player): the agent, which is given the side to move in each
+            position
+        boards ([numpy.ndarray]): the test positions
+        table (Tablebase): the solved table for the board
+
+    Returns:
+        float: the fraction of positions in which an optimal move was chosen
+    """
+    correct = 0
+    for board in boards:
+        agent.side = tablebase.to_move(board)
+        move = tuple(agent.move(board.copy()))
+        correct += move in table.best_moves(board)
+    return correct / float(len(boards))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares the accuracy of "
+            "MCTS agents at equal playout counts.")
+    parser.add_argument('--agents', nargs='+', default=sorted(AGENTS),
+            choices=sorted(AGENTS), help="agents to compare")
+    parser.add_argument('--rollouts', nargs='+', default=['random'],
+            choices=sorted(ROLLOUTS), help="rollout policies to compare")
+    parser.add_argument('--playouts', nargs='+', type=int,
+            default=[100, 300, 1000], help="playout counts")
+    parser.add_argument('--positions', type=int, default=200,
+            help="number of test positions")
+    parser.add_argument('--seed', type=int, default=1, help="random seed")
+    args = parser.parse_args()
+
+    table = tablebase.build(3)
+    boards = positions(table, args.positions, args.seed)
+    print "{0:>8} {1:>9} {2:>8} {3:>9} {4:>9}".format("agent", "rollout",
+            "playouts", "accuracy", "time (s)")
+    for playouts in args.playouts:
+        for name in args.agents:
+            for rollout_name in args.rollouts:
+                random.seed(args.seed)
+                np.random.seed(args.seed)
+                policy = ROLLOUTS[rollout_name]
+                agent = AGENTS[name](time_budget=float('inf'),
+                        max_playouts=playouts, convergence_limit=playouts,
+                        reuse_tree=False,
+                        rollout_policy=policy() if policy else None)
+                start_time = time.time()
+                result = accuracy(agent, boards, table)
+                print "{0:>8} {1:>9} {2:>8} {3:>9.3f} {4:>9.1f}".format(name,
+                        rollout_name, playouts, result,
+                        time.time() - start_time)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,9 +12,12 @@ class MCTSGraph(object):
     in a number of formats.
     
     Example use:
-    >> g = graphing.MCTSGraph(root_node=tree.root_node)
+    >> g = graphing.MCTSGraph(root_node=agent.tree.view())
     >> g.draw_graph('output.png')
 
+    Trees held in an `agents.mcts_tree.TreeStore` are rendered through the
+    `NodeView` adapter returned by `TreeStore.view`.
+
     Attributes:
         root_node (TreeNode): the root node of the tree
         layout (string): graph layout to use when drawing, e.g. dot, neato,
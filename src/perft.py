@@ -0,0 +1,203 @@
+"""
+This module contains a perft-style tool that walks the complete game tree of an
+m,n,k game, counting the nodes at each depth, the unique legal states, the
+terminal states by result and the states that are unique under symmetry.
+
+For the standard 3x3 board the counts are well known (5478 legal states, 765
+unique under symmetry and 255168 possible games), so the tool serves as a
+correctness check for the rules module, and the node rate serves as a benchmark
+of its throughput. The tree is split into subtrees at a fixed depth which are
+walked in parallel by a pool of worker processes.
+
+The tool may be run from the command line as follows:
+
+    > python perft.py 3 --k 3 --processes 4
+"""
+
+import numpy as np
+import argparse
+import importlib
+import multiprocessing
+import time
+import rules
+
+
+class PerftResult(object):
+    """
+    Class holding the counts produced by a perft run.
+
+    Attributes:
+        nodes ([int]): number of nodes in the game tree at each depth
+        states ({str: bool}): the unique states visited, mapped to whether
+            each state is terminal
+        terminal_nodes ({int: int}): number of terminal nodes (complete games)
+            for each winning side, with None for draws
+        terminal_states ({int: int}): number of unique terminal states for
+            each winning side, with None for draws
+        symmetry_classes (int): number of unique states under rotation and
+            reflection
+        elapsed (float): number of seconds taken by the run
+    """
+
+    def __init__(self, max_depth):
+        self.nodes = [0] * (max_depth + 1)
+        self.states = {}
+        self.terminal_nodes = dict((result, 0) for result in
+                rules.sides + [None])
+        self.terminal_states = dict(self.terminal_nodes)
+        self.symmetry_classes = None
+        self.elapsed = None
+
+    def add(self, other):
+        """Merges the counts from another result into this one."""
+        for depth, count in enumerate(other.nodes):
+            self.nodes[depth] += count
+        for result, count in other.terminal_nodes.items():
+            self.terminal_nodes[result] += count
+        for key, winner in other.states.items():
+            if key not in self.states:
+                self.states[key] = winner
+                if winner is not False:
+                    self.terminal_states[winner] += 1
+
+    def visit(self, board, depth, winner, terminal):
+        """Records a visit to a node of the game tree."""
+        self.nodes[depth] += 1
+        if terminal:
+            self.terminal_nodes[winner] += 1
+        key = board.tostring()
+        if key not in self.states:
+            # Terminal states are mapped to the winner, others to False
+            self.states[key] = winner if terminal else False
+            if terminal:
+                self.terminal_states[winner] += 1
+
+    def count_symmetry_classes(self, shape, dtype):
+        """Counts the states that are unique under rotation and reflection."""
+        self.symmetry_classes = len(set(rules.canonical(np.frombuffer(key,
+                dtype=dtype).reshape(shape)) for key in self.states))
+
+    def total_nodes(self):
+        """Returns the total number of nodes visited."""
+        return sum(self.nodes)
+
+    def nodes_per_second(self):
+        """Returns the number of nodes visited per second."""
+        return self.total_nodes() / max(self.elapsed, 1e-9)
+
+    def __str__(self):
+        lines = ["Depth {0:>2}: {1} nodes".format(depth, count)
+                for depth, count in enumerate(self.nodes)]
+        lines.append("Total nodes: {0}".format(self.total_nodes()))
+        lines.append("Unique states: {0}".format(len(self.states)))
+        lines.append("Unique states under symmetry: {0}".format(
+                self.symmetry_classes))
+        for result in rules.sides + [None]:
+            name = (rules.side_name(result) + " win" if result is not None
+                    else "Draw")
+            lines.append("{0}: {1} games, {2} unique states".format(name,
+                    self.terminal_nodes[result], self.terminal_states[result]))
+        lines.append("Time: {0:.3f} seconds ({1:.0f} nodes/s)".format(
+                self.elapsed, self.nodes_per_second()))
+        return '\n'.join(lines)
+
+
+def perft(rows, cols=None, k=None, max_depth=None, processes=None,
+        split_depth=2, backend='rules'):
+    """
+    Walks the game tree from the empty board, with crosses moving first.
+
+    Args:
+        rows (int): number of rows on the board
+        cols (int): number of columns on the board, defaults to rows
+        k (int): the number of cells in a row required to win, defaults to the
+            length of the shortest side of the board
+        max_depth (int): depth at which to stop the walk, defaults to the
+            number of cells
+        processes (int): number of worker processes, defaults to the number of
+            CPUs; one runs the walk in this process
+        split_depth (int): depth at which the tree is split into subtrees for
+            the workers
+        backend (string): name of the module providing the game rules
+
+    Returns:
+        PerftResult: the counts for the game tree
+    """
+    cols = rows if cols is None else cols
+    max_depth = rows * cols if max_depth is None else max_depth
+    split_depth = min(split_depth, max_depth)
+    start_time = time.time()
+
+    # Walk the top of the tree here, collecting the subtrees for the workers
+    board = np.zeros((rows, cols), dtype=np.int8)
+    result = PerftResult(max_depth)
+    tasks = []
+    _walk(importlib.import_module(backend), board, rules.CROSS, 0, split_depth,
+            max_depth, k, result, tasks)
+
+    if processes == 1:
+        subtrees = map(_walk_subtree, tasks)
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            subtrees = pool.map(_walk_subtree, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    for subtree in subtrees:
+        result.add(subtree)
+
+    result.count_symmetry_classes(board.shape, board.dtype)
+    result.elapsed = time.time() - start_time
+    return result
+
+
+def _walk_subtree(task):
+    """Walks the subtree of a single task, used by the worker processes."""
+    backend, board, player, depth, max_depth, k = task
+    result = PerftResult(max_depth)
+    _walk(importlib.import_module(backend), board, player, depth, None,
+            max_depth, k, result, None)
+    return result
+
+
+def _walk(backend, board, player, depth, split_depth, max_depth, k, result,
+        tasks):
+    """Recursively visits every node below the board, adding subtrees at the
+    split depth to the list of tasks rather than walking them."""
+    if depth == split_depth:
+        tasks.append((backend.__name__, board.copy(), player, depth, max_depth,
+                k))
+        return
+
+    winner = backend.winner(board, k)
+    terminal = winner is not None or backend.board_full(board)
+    result.visit(board, depth, winner, terminal)
+    if terminal or depth == max_depth:
+        return
+
+    for cell in backend.empty_cells(board):
+        cell = tuple(cell)
+        board[cell] = player
+        _walk(backend, board, -player, depth + 1, split_depth, max_depth, k,
+                result, tasks)
+        board[cell] = backend.EMPTY
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Counts the nodes and "
+            "states of the game tree of an m,n,k game.")
+    parser.add_argument('rows', type=int, help="number of rows")
+    parser.add_argument('cols', type=int, nargs='?', help="number of columns")
+    parser.add_argument('--k', type=int, help="cells in a row to win")
+    parser.add_argument('--depth', type=int, help="maximum depth")
+    parser.add_argument('--processes', type=int, help="worker processes")
+    parser.add_argument('--backend', default='rules', help="rules module")
+    args = parser.parse_args()
+
+    print perft(args.rows, args.cols, args.k, args.depth, args.processes,
+            backend=args.backend)
+
+
+if __name__ == "__main__":
+    main()
@@ -64,60 +64,192 @@ def valid_move(board, move):
     return list(move) in rules.empty_cells(board).tolist()
 
 
-def winner(board):
+def line_sums(board, k=None):
+    """
+    Returns the sums of every line of k consecutive cells on a board.
+
+    Lines are identified by the cell at which they start, so element [x, y] of
+    the horizontal sums is the sum of cells (x, y) to (x, y + k - 1), and so on
+    for the other directions. Anti-diagonal lines start at their top right
+    cell, but are indexed by the leftmost column they cover.
+
+    A stack of boards may also be passed, in which case the sums are calculated
+    for each board in the stack.
+
+    Args:
+        board (numpy.ndarray): two dimensional array representing the board, or
+            an array of boards where the last two dimensions are the board
+        k (int): the number of cells in a line, defaults to the length of the
+            shortest side of the board
+
+    Returns:
+        [numpy.ndarray]: arrays of line sums for the horizontal, vertical,
+            diagonal and anti-diagonal directions
+    """
+    rows, cols = board.shape[-2:]
+    if k is None:
+        k = min(rows, cols)
+
+    # Add shifted views of the board so that each element accumulates the k
+    # cells of the line starting at that element
+    horizontal = sum(board[..., i:cols - k + 1 + i] for i in range(k))
+    vertical = sum(board[..., i:rows - k + 1 + i, :] for i in range(k))
+    diagonal = sum(board[..., i:rows - k + 1 + i, i:cols - k + 1 + i]
+            for i in range(k))
+    anti_diagonal = sum(board[..., i:rows - k + 1 + i, k - 1 - i:cols - i]
+            for i in range(k))
+
+    return [horizontal, vertical, diagonal, anti_diagonal]
+
+
+def lines(shape, k=None):
+    """
+    Returns the cells in every line of k consecutive cells on a board.
+
+    Lines are returned in the same order as the elements of the flattened and
+    concatenated arrays returned by `line_sums`.
+
+    Args:
+        shape ((int, int)): the number of rows and columns on the board
+        k (int): the number of cells in a line, defaults to the length of the
+            shortest side of the board
+
+    Returns:
+        numpy.ndarray: array of shape (lines, k) with the flat indices of the
+            cells in each line
+    """
+    rows, cols = shape
+    if k is None:
+        k = min(rows, cols)
+
+    # Stack the same shifted views used by line_sums on an array of indices
+    index = np.arange(rows * cols).reshape(rows, cols)
+    directions = [
+        [index[:, i:cols - k + 1 + i] for i in range(k)],
+        [index[i:rows - k + 1 + i, :] for i in range(k)],
+        [index[i:rows - k + 1 + i, i:cols - k + 1 + i] for i in range(k)],
+        [index[i:rows - k + 1 + i, k - 1 - i:cols - i] for i in range(k)]]
+    return np.concatenate([np.stack(cells, axis=-1).reshape(-1, k)
+            for cells in directions])
+
+
+def winner(board, k=None):
     """
     Checks whether the given state represents a win for either player.
 
-    Calculates the absolute sum for each row, column and diagonal and compares 
-    against the expected value for a full line (n if the sides are 1 and -1).
+    Calculates the sum of each line of k cells in the rows, columns and 
+    diagonals and compares the absolute value against the expected value for a
+    full line (k if the sides are 1 and -1). When a line spans a square board
+    only the whole rows, columns and diagonals are summed.
 
     Args:
         board (numpy.ndarray): two dimensional array representing the board
             after the move
+        k (int): the number of cells in a row required to win, defaults to the
+            length of the shortest side of the board
 
     Returns:
         int: the side of winning player or None
     """
     n = board.shape[0]
-
-    # Rows
-    for x in range(0, n):
-        if abs(board[x].sum()) == n:
-            winning_side = board[x, 0]
-            return winning_side
-
-    # Columns
-    for y in range(0, n):
-        if abs(board[:, y].sum()) == n:
-            winning_side = board[0, y]
-            return winning_side
-
-    # Diagonal
-    if abs(board.diagonal().sum()) == n:
-        winning_side = board[0, 0]
-        return winning_side
-
-    # Anti-diagonal
-    if abs(np.fliplr(board).diagonal().sum()) == n:
-        winning_side = board[0, n-1]
+    if k is None or k == n:
+        if board.shape[1] == n:
+            # A line spans the board, so check each whole row, column and
+            # diagonal, which is faster than the sums of every window
+
+            # Rows
+            for x in range(0, n):
+                if abs(board[x].sum()) == n:
+                    winning_side = board[x, 0]
+                    return winning_side
+
+            # Columns
+            for y in range(0, n):
+                if abs(board[:, y].sum()) == n:
+                    winning_side = board[0, y]
+                    return winning_side
+
+            # Diagonal
+            if abs(board.diagonal().sum()) == n:
+                winning_side = board[0, 0]
+                return winning_side
+
+            # Anti-diagonal
+            if abs(np.fliplr(board).diagonal().sum()) == n:
+                winning_side = board[0, n-1]
+                return winning_side
+
+            # No winner
+            return None
+        if k is None:
+            k = min(board.shape)
+
+    # Check the rows, columns, diagonals and anti-diagonals of every window
+    # of k cells in a single pass
+    sums = np.concatenate([s.ravel() for s in line_sums(board, k)])
+    full_lines = np.flatnonzero(abs(sums) == k)
+    if full_lines.size:
+        winning_side = rules.NOUGHT if sums[full_lines[0]] > 0 else rules.CROSS
         return winning_side
 
     # No winner
     return None
 
 
-def winning_move(board):
+def winning_move(board, k=None):
     """
     Checks whether the given state represents a win for either player.
 
     Args:
         board (numpy.ndarray): two dimensional array representing the board
             after the move
+        k (int): the number of cells in a row required to win, defaults to the
+            length of the shortest side of the board
 
     Returns:
         bool: True if the board represents a win, False otherwise
     """
-    return winner(board) is not None
+    return winner(board, k) is not None
+
+
+def completes_line(board, move, k=None):
+    """
+    Checks whether the token at the given cell is part of a line of k tokens.
+
+    Only the lines through the cell are inspected, so this is much cheaper than
+    a full call to `winner` when checking whether the last move won the game.
+
+    Args:
+        board (numpy.ndarray): two dimensional array representing the board
+            after the move
+        move ((int, int)): tuple with the coordinates of the move (x, y)
+        k (int): the number of cells in a row required to win, defaults to the
+            length of the shortest side of the board
+
+    Returns:
+        bool: True if the move completes a line, False otherwise
+    """
+    rows, cols = board.shape
+    if k is None:
+        k = min(rows, cols)
+    x, y = move
+    side = board[x, y]
+    if side == rules.EMPTY:
+        return False
+
+    # Count matching tokens in both directions along each line through the move
+    for dx, dy in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        count = 1
+        for step in (1, -1):
+            i, j = x + dx * step, y + dy * step
+            while 0 <= i < rows and 0 <= j < cols and board[i, j] == side:
+                count += 1
+                i += dx * step
+                j += dy * step
+        if count >= k:
+            return True
+
+    return False
 
 
 def board_full(board):
@@ -134,6 +266,44 @@ def board_full(board):
     return EMPTY not in board
 
 
+def symmetries(board):
+    """
+    Returns the boards that are equivalent to a board under rotation and
+    reflection.
+
+    Square boards have eight symmetries (four rotations, each optionally
+    reflected), while rectangular boards have four (the identity, both
+    reflections and a half turn).
+
+    Args:
+        board (numpy.ndarray): two dimensional array representing the board
+
+    Returns:
+        [numpy.ndarray]: list of equivalent boards, starting with the board
+            itself
+    """
+    if board.shape[0] == board.shape[1]:
+        rotations = [np.rot90(board, i) for i in range(4)]
+        return rotations + [np.fliplr(rotation) for rotation in rotations]
+    else:
+        return [board, np.flipud(board), np.fliplr(board), np.rot90(board, 2)]
+
+
+def canonical(board):
+    """
+    Returns a key that is identical for all boards that are equivalent under
+    rotation and reflection.
+
+    Args:
+        board (numpy.ndarray): two dimensional array representing the board
+
+    Returns:
+        str: the smallest of the raw byte strings of the equivalent boards
+    """
+    return min(np.ascontiguousarray(symmetry).tostring()
+            for symmetry in symmetries(board))
+
+
 def board_str(board):
     """
     Formats a board as a string replacing cell values with enum names.
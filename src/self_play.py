@@ -0,0 +1,160 @@
+"""
+This module trains the policy and value network in `agents.network` on games
+the PUCT agent plays against itself, in the style of AlphaZero.
+
+Each iteration plays a number of games with the current network as the
+evaluator of both players, recording the root visit distribution of every
+search as the target policy of its position and the result of the game as the
+target value. The first moves of each game are sampled from the visit
+distribution so that the games differ. The network is then trained on the
+positions of the iteration, and the positions are appended to the data file.
+
+The training may be run from the command line as follows:
+
+    > python self_play.py --iterations 10 --games 50 --network network.npz
+
+Training data files hold the arrays returned by `play`, and may be used to
+train another network with `train`.
+"""
+
+import argparse
+import os
+import random
+import numpy as np
+import rules
+from tictactoe import TicTacToe
+from agents import network as mlp
+from agents.evaluators import NetworkEvaluator
+from agents.mcts_puct import MCTSAgentPUCT
+
+# Names of the arrays in a training data file
+FIELDS = ('boards', 'players', 'policies', 'values')
+
+
+def play(network, games, n=3, playouts=100, eval_batch=8, sample_moves=2):
+    """
+    Plays games between two PUCT agents using a network as their evaluator.
+
+    Args:
+        network (MLPNetwork): the network, built for n by n boards
+        games (int): number of games to play
+        n (int): number of rows and columns of the board
+        playouts (int): number of playouts for each move
+        eval_batch (int): number of leaves evaluated together
+        sample_moves (int): number of tokens on the board below which moves
+            are sampled from the root visits
+
+    Returns:
+        {str: numpy.ndarray}: the flattened board, the side to move, the
+            target policy and the target value for the side to move of every
+            position searched, keyed by the names in FIELDS
+    """
+    evaluator = NetworkEvaluator(network)
+    agents = [MCTSAgentPUCT(time_budget=float('inf'), max_playouts=playouts,
+            convergence_limit=playouts, reuse_tree=False, evaluator=evaluator,
+            value_weight=1.0, eval_batch=eval_batch,
+            sample_moves=sample_moves) for _ in rules.sides]
+    game = TicTacToe(agents, n=n)
+    samples = dict((field, []) for field in FIELDS)
+    for _ in range(games):
+        winner = game.run()
+        for agent in agents:
+            for board, side, policy in agent.search_history:
+                samples['boards'].append(board)
+                samples['players'].append(side)
+                samples['policies'].append(policy)
+                samples['values'].append(0.5 if winner is None else
+                        float(winner == side))
+    return dict((field, np.asarray(values))
+            for field, values in samples.items())
+
+
+def train(network, samples, epochs=10, seed=None):
+    """
+    Trains a network on the positions from self-play games.
+
+    Args:
+        network (MLPNetwork): the network
+        samples ({str: numpy.ndarray}): the positions, as returned by `play`
+        epochs (int): number of passes over the positions
+        seed (int): optional seed for shuffling the positions
+
+    Returns:
+        float: the mean loss over the last epoch
+    """
+    return network.train(samples['boards'], samples['players'],
+            samples['policies'], samples['values'], epochs=epochs, seed=seed)
+
+
+def save(path, samples):
+    """
+    Appends positions to a training data file, creating it if required.
+
+    Args:
+        path (string): the path to the data file
+        samples ({str: numpy.ndarray}): the positions, as returned by `play`
+    """
+    if os.path.exists(path):
+        saved = load(path)
+        samples = dict((field, np.concatenate((saved[field],
+                samples[field]))) for field in FIELDS)
+    with open(path, 'wb') as data_file:
+        np.savez_compressed(data_file, **samples)
+
+
+def load(path):
+    """
+    Loads the positions saved in a training data file.
+
+    Args:
+        path (string): the path to the data file
+
+    Returns:
+        {str: numpy.ndarray}: the positions, keyed by the names in FIELDS
+    """
+    data = np.load(path)
+    return dict((field, data[field]) for field in FIELDS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trains a network for the "
+            "PUCT agent by self-play.")
+    parser.add_argument('--size', type=int, default=3, help="board size")
+    parser.add_argument('--iterations', type=int, default=10,
+            help="number of rounds of play and training")
+    parser.add_argument('--games', type=int, default=50,
+            help="number of games in each iteration")
+    parser.add_argument('--playouts', type=int, default=100,
+            help="number of playouts for each move")
+    parser.add_argument('--eval-batch', type=int, default=8,
+            help="number of leaves evaluated together")
+    parser.add_argument('--epochs', type=int, default=10,
+            help="number of training passes in each iteration")
+    parser.add_argument('--hidden', type=int, default=64,
+            help="number of hidden units of a new network")
+    parser.add_argument('--network', default='network.npz',
+            help="network file, which is created if it does not exist")
+    parser.add_argument('--data', default='self_play.npz',
+            help="training data file that positions are appended to")
+    parser.add_argument('--seed', type=int, default=1, help="random seed")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+    if os.path.exists(args.network):
+        network = mlp.load(args.network)
+    else:
+        network = mlp.MLPNetwork((args.size, args.size), args.hidden,
+                seed=args.seed)
+    for iteration in range(args.iterations):
+        samples = play(network, args.games, args.size, args.playouts,
+                args.eval_batch)
+        loss = train(network, samples, args.epochs)
+        save(args.data, samples)
+        network.save(args.network)
+        print "Iteration {0}: {1} positions, loss {2:.3f}".format(
+                iteration + 1, len(samples['values']), loss)
+
+
+if __name__ == "__main__":
+    main()
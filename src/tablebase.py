@@ -0,0 +1,301 @@
+"""
+This module contains tools to build and query endgame tablebases, which record
+the exact game value of every legal position on a small m,n,k board.
+
+Positions are identified by their rank, the base 3 number formed by the cells
+of the board (0 for empty, 1 for noughts and 2 for crosses, with the first cell
+as the least significant digit). Each value is stored in two bits, so a table
+holds four positions per byte and any position can be looked up in constant
+time. Tables are saved in a simple binary format that may be memory-mapped, so
+large tables are paged in on demand rather than loaded into memory.
+
+Crosses are assumed to move first, so the player to move is determined by the
+number of tokens on the board.
+
+Example use:
+>> table = tablebase.build(4, 4, 3)
+>> table.save('4x4k3.tb')
+>> table = tablebase.load('4x4k3.tb')
+>> table.value(board)
+"""
+
+import numpy as np
+import rules
+
+# Game values from the point of view of the player to move
+UNKNOWN = 0  # illegal or unreachable positions
+WIN = 1
+DRAW = 2
+LOSS = 3
+
+_magic = b'TTTB'
+_header_size = 16
+
+
+class Tablebase(object):
+    """
+    Class representing a tablebase for a single board size and k.
+
+    Attributes:
+        rows (int): number of rows on the board
+        cols (int): number of columns on the board
+        k (int): the number of cells in a row required to win
+        data (numpy.ndarray): array of packed values, four per byte
+    """
+
+    def __init__(self, rows, cols, k, data=None):
+        """
+        Constructor.
+
+        Args:
+            rows (int): number of rows on the board
+            cols (int): number of columns on the board
+            k (int): the number of cells in a row required to win
+            data (numpy.ndarray): array of packed values, or None to create an
+                empty table
+        """
+        self.rows = rows
+        self.cols = cols
+        self.k = k
+        self.__powers = 3 ** np.arange(rows * cols, dtype=np.int64)
+        size = (3 ** (rows * cols) + 3) // 4
+        if data is None:
+            data = np.zeros(size, dtype=np.uint8)
+        elif len(data) != size:
+            raise ValueError("Expected {0} bytes of table data, found {1}."
+                    .format(size, len(data)))
+        self.data = data
+
+    def rank(self, board):
+        """
+        Returns the rank of a board, i.e. its index in the table.
+
+        Args:
+            board (numpy.ndarray): two dimensional array representing the board
+
+        Returns:
+            int: the rank of the board
+        """
+        # Noughts map to 1 and crosses (-1) to 2 under modulo 3
+        return int(np.dot(np.mod(board.ravel(), 3), self.__powers))
+
+    def value(self, board):
+        """
+        Returns the game value of a board for the player to move.
+
+        Args:
+            board (numpy.ndarray): two dimensional array representing the board
+
+        Returns:
+            int: WIN, DRAW or LOSS, or UNKNOWN if the position is not legal
+        """
+        if board.shape != (self.rows, self.cols):
+            raise ValueError("Board shape {0} does not match the table."
+                    .format(board.shape))
+        index = self.rank(board)
+        return (int(self.data[index >> 2]) >> ((index & 3) * 2)) & 3
+
+    def move_values(self, board):
+        """
+        Returns the game value of each move for the player to move.
+
+        Args:
+            board (numpy.ndarray): two dimensional array representing the board
+
+        Returns:
+            [((int, int), int)]: list of moves with the WIN, DRAW or LOSS value
+                of each move for the player making it
+        """
+        player = to_move(board)
+        board = board.copy()
+        results = []
+        for cell in rules.empty_cells(board):
+            cell = tuple(cell)
+            board[cell] = player
+            # The value of the new board is for the opponent so reverse it
+            results.append((cell, {WIN: LOSS, LOSS: WIN}.get(
+                    self.value(board), DRAW)))
+            board[cell] = rules.EMPTY
+        return results
+
+    def best_moves(self, board):
+        """
+        Returns the optimal moves for the player to move.
+
+        Args:
+            board (numpy.ndarray): two dimensional array representing the board
+
+        Returns:
+            [(int, int)]: list of tuples with the coordinates of optimal moves
+        """
+        move_values = self.move_values(board)
+        best_value = min(value for _, value in move_values)
+        return [move for move, value in move_values if value == best_value]
+
+    def save(self, path):
+        """
+        Saves the table to a file that may be memory-mapped by `load`.
+
+        Args:
+            path (string): the path to the output file
+        """
+        header = np.zeros(_header_size, dtype=np.uint8)
+        header[:4] = np.frombuffer(_magic, dtype=np.uint8)
+        header[4:7] = (self.rows, self.cols, self.k)
+        with open(path, 'wb') as table_file:
+            header.tofile(table_file)
+            np.asarray(self.data).tofile(table_file)
+
+
+def to_move(board):
+    """
+    Returns the side of the player to move, assuming crosses move first.
+
+    Args:
+        board (numpy.ndarray): two dimensional array representing the board
+
+    Returns:
+        int: the side of the player to move
+    """
+    crosses = np.count_nonzero(board == rules.CROSS)
+    noughts = np.count_nonzero(board == rules.NOUGHT)
+    return rules.CROSS if crosses == noughts else rules.NOUGHT
+
+
+def load(path, mmap=True):
+    """
+    Loads a table saved by `Tablebase.save`.
+
+    Args:
+        path (string): the path to the table file
+        mmap (bool): when true the file is memory-mapped rather than read into
+            memory
+
+    Returns:
+        Tablebase: the loaded table
+    """
+    header = np.fromfile(path, dtype=np.uint8, count=_header_size)
+    if header[:4].tostring() != _magic:
+        raise ValueError("Not a tablebase file: {0}".format(path))
+    rows, cols, k = [int(x) for x in header[4:7]]
+    if mmap:
+        data = np.memmap(path, dtype=np.uint8, mode='r', offset=_header_size)
+    else:
+        with open(path, 'rb') as table_file:
+            table_file.seek(_header_size)
+            data = np.fromfile(table_file, dtype=np.uint8)
+    return Tablebase(rows, cols, k, data)
+
+
+def build(rows, cols=None, k=None, logger=None):
+    """
+    Builds a tablebase by retrograde analysis.
+
+    Every legal position is first generated level by level, where a level holds
+    the positions with a given number of tokens. Positions are solved from the
+    last level back to the first: terminal positions are valued directly, and
+    other positions take the best value of their children on the next level.
+    Each level is processed as a whole using numpy arrays of ranks.
+
+    Args:
+        rows (int): number of rows on the board
+        cols (int): number of columns on the board, defaults to rows
+        k (int): the number of cells in a row required to win, defaults to the
+            length of the shortest side of the board
+        logger (logging.Logger): optional logger for progress output
+
+    Returns:
+        Tablebase: the solved table
+    """
+    cols = rows if cols is None else cols
+    k = min(rows, cols) if k is None else k
+    cells = rows * cols
+    table = Tablebase(rows, cols, k)
+    powers = 3 ** np.arange(cells, dtype=np.int64)
+
+    # Generate the positions on each level from the non-terminal positions on
+    # the previous level
+    levels = [np.zeros(1, dtype=np.int64)]
+    terminal = []
+    for level in range(cells + 1):
+        ranks = levels[level]
+        boards = _boards(ranks, rows, cols, powers)
+        won, finished = _finished(boards, k)
+        terminal.append((won, finished))
+        if logger:
+            logger.info("Level {0}: {1} positions, {2} terminal".format(
+                    level, len(ranks), np.count_nonzero(finished)))
+        if level == cells:
+            break
+        digit = 2 if level % 2 == 0 else 1  # crosses move first
+        children, _ = _children(ranks[~finished], boards[~finished], digit,
+                powers)
+        levels.append(np.unique(children[children >= 0]))
+
+    # Solve each level from the last to the first
+    next_ranks = next_values = None
+    for level in range(cells, -1, -1):
+        ranks = levels[level]
+        values = np.empty(len(ranks), dtype=np.uint8)
+
+        # Terminal positions are lost if there is a winner (the previous
+        # player completed a line), otherwise drawn
+        won, finished = terminal[level]
+        values[finished] = np.where(won[finished], LOSS, DRAW)
+
+        # Other positions are won if any move leaves the opponent in a lost
+        # position, lost if every move leaves the opponent in a won position
+        if level < cells and (~finished).any():
+            digit = 2 if level % 2 == 0 else 1
+            boards = _boards(ranks[~finished], rows, cols, powers)
+            children, valid = _children(ranks[~finished], boards, digit,
+                    powers)
+            child_values = np.full(children.shape, WIN, dtype=np.uint8)
+            child_values[valid] = next_values[np.searchsorted(next_ranks,
+                    children[valid])]
+            values[~finished] = np.where((child_values == LOSS).any(axis=1),
+                    WIN, np.where((child_values == WIN).all(axis=1), LOSS,
+                    DRAW))
+
+        _store(table.data, ranks, values)
+        next_ranks, next_values = ranks, values
+
+    return table
+
+
+def _boards(ranks, rows, cols, powers):
+    """Returns the stack of boards represented by an array of ranks."""
+    digits = ((ranks[:, np.newaxis] // powers) % 3).astype(np.int8)
+    digits[digits == 2] = rules.CROSS
+    return digits.reshape(len(ranks), rows, cols)
+
+
+def _won(boards, k):
+    """Returns a boolean array indicating which boards in a stack have a
+    complete line."""
+    won = np.zeros(len(boards), dtype=bool)
+    for sums in rules.line_sums(boards, k):
+        won |= (np.abs(sums) == k).any(axis=(1, 2))
+    return won
+
+
+def _finished(boards, k):
+    """Returns boolean arrays indicating which boards in a stack have a
+    complete line and which are terminal."""
+    won = _won(boards, k)
+    full = (boards != rules.EMPTY).all(axis=(1, 2))
+    return won, won | full
+
+
+def _children(ranks, boards, digit, powers):
+    """Returns a matrix of the child ranks of each position, with -1 for
+    occupied cells, and a mask of the valid entries."""
+    valid = boards.reshape(len(boards), len(powers)) == rules.EMPTY
+    children = np.where(valid, ranks[:, np.newaxis] + digit * powers, -1)
+    return children, valid
+
+
+def _store(data, ranks, values):
+    """Packs values into the table data at the given ranks."""
+    np.bitwise_or.at(data, ranks >> 2,
+            (values << ((ranks & 3) * 2)).astype(np.uint8))
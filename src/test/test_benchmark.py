@@ -0,0 +1,21 @@
+"""
+This module contains tests for the agent benchmark in the `benchmark` module.
+"""
+
+from unittest import TestCase
+import rules
+import tablebase
+import benchmark
+
+
+class TestBenchmark(TestCase):
+    def test_positions(self):
+        table = tablebase.build(3)
+        boards = benchmark.positions(table, 20, seed=3)
+        self.assertEqual(len(boards), 20)
+        self.assertEqual(len(set(board.tostring() for board in boards)), 20)
+        for board in boards:
+            self.assertIsNone(rules.winner(board))
+            self.assertFalse(rules.board_full(board))
+            self.assertLess(len(table.best_moves(board)),
+                    len(rules.empty_cells(board)))
@@ -0,0 +1,52 @@
+"""
+This module contains tests for the position evaluators in the `evaluators`
+module.
+"""
+
+from unittest import TestCase
+import numpy as np
+import rules
+import tablebase
+from agents import evaluators, rollout
+from agents.reinforcement import ReinforcementAgent1
+
+
+class TestEvaluators(TestCase):
+    def setUp(self):
+        self.board = np.asarray([[-1, -1, 0], [1, 1, 0], [0, 0, 0]])
+
+    def test_uniform(self):
+        priors, value = evaluators.Evaluator().evaluate(self.board,
+                rules.CROSS)
+        self.assertTrue(np.allclose(priors[self.board.ravel() == 0], 0.2))
+        self.assertEqual(priors.sum(), 1)
+        self.assertIsNone(value)
+
+    def test_rank_values(self):
+        """Tests that tablebase values favour the winning move, and value the
+        position for the player to move."""
+        values = rollout.tablebase_values(tablebase.build(3))
+        evaluator = evaluators.RankValueEvaluator(values)
+        board = self.board.copy()
+        priors, value = evaluator.evaluate(board, rules.CROSS)
+        self.assertEqual(priors.argmax(), 2)
+        self.assertAlmostEqual(priors.sum(), 1)
+        self.assertEqual(value, 1)
+        self.assertTrue((board == self.board).all())
+
+    def test_reinforcement(self):
+        """Tests the adapter for the value tables of the RL agents, which only
+        value positions reached by the agent's own moves."""
+        agent = ReinforcementAgent1(side=rules.NOUGHT)
+        board = self.board.copy()
+        board[1, 2] = rules.NOUGHT
+        agent.set_value(board, 1.0)
+        evaluator = evaluators.ReinforcementEvaluator(agent)
+        priors, value = evaluator.evaluate(self.board, rules.NOUGHT)
+        self.assertEqual(priors.argmax(), 5)
+        self.assertIsNone(value)
+
+        # Positions reached by the agent are valued for the opponent to move
+        priors, value = evaluator.evaluate(board, rules.CROSS)
+        self.assertTrue(np.allclose(priors[board.ravel() == 0], 0.25))
+        self.assertEqual(value, 0)
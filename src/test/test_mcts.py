@@ -1,17 +1,505 @@
 """
-This module contains tests for the minimax agent.
+This module contains tests for the MCTS agents and the tree store they use.
 """
 
 from unittest import TestCase
 from tictactoe import TicTacToe
+import random
+import time
 import numpy as np
 import rules
-from players import WinBlockRandomCellAgent
+import tablebase
+from players import RandomCellAgent, WinBlockRandomCellAgent
+from agents.mcts_tree import TreeStore, ROOT, NO_NODE
+from agents.mcts_ucb1 import MCTSAgentUCB1
+from agents import mcts_ucb1
+from agents.mcts_random import MCTSAgentRandom
+from agents.mcts_rave import MCTSAgentRAVE
+from agents.mcts_puct import MCTSAgentPUCT
+from agents.mcts_halving import MCTSAgentHalving
+from agents.evaluators import RankValueEvaluator
+from agents import rollout
+
+
+class TestTreeStore(TestCase):
+    def setUp(self):
+        self.board = np.asarray([[-1, 0, 0], [0, 1, 0], [0, 0, 0]])
+        self.tree = TreeStore(self.board, rules.CROSS, capacity=2)
+
+    def test_add_child(self):
+        tree = self.tree
+        self.assertEqual(tree.untried_count(ROOT), 7)
+        board = self.board.copy()
+        board[0, 1] = rules.CROSS
+        child = tree.add_child(ROOT, 1, board)
+        self.assertEqual(tree.parent[child], ROOT)
+        self.assertEqual(tree.child(ROOT, 1), child)
+        self.assertEqual(tree.child(ROOT, 2), NO_NODE)
+        self.assertEqual(tree.untried_count(ROOT), 6)
+        self.assertNotIn(1, tree.untried_moves(ROOT))
+        self.assertEqual(tree.untried_count(child), 6)
+
+        # Children share a reserved block, and the arrays grow as required
+        sibling = tree.add_child(ROOT, 8, board)
+        self.assertEqual(sibling, child + 1)
+        self.assertGreaterEqual(tree.capacity, tree.size)
+        self.assertEqual(list(tree.children(ROOT)), [child, sibling])
+
+    def test_node_board(self):
+        tree = self.tree
+        board = self.board.copy()
+        board[0, 2] = rules.CROSS
+        child = tree.add_child(ROOT, 2, board)
+        board[2, 0] = rules.NOUGHT
+        grandchild = tree.add_child(child, 6, board)
+        self.assertEqual(tree.path(grandchild), [2, 6])
+        self.assertTrue((tree.node_board(grandchild) == board).all())
+        self.assertTrue((tree.node_board(ROOT) == self.board).all())
+
+    def test_best_moves(self):
+        tree = self.tree
+        for move, wins in ((1, 1.0), (2, 3.0), (3, 3.0)):
+            child = tree.add_child(ROOT, move, self.board)
+            tree.visits[child] = 4
+            tree.wins[child] = wins
+        self.assertEqual(tree.best_moves(ROOT), [(0, 2), (1, 0)])
+
+    def test_subtree(self):
+        tree = self.tree
+        board = self.board.copy()
+        board[0, 2] = rules.CROSS
+        child = tree.add_child(ROOT, 2, board)
+        tree.add_child(ROOT, 3, self.board)
+        board[2, 0] = rules.NOUGHT
+        grandchild = tree.add_child(child, 6, board)
+        tree.visits[[ROOT, child, grandchild]] = (5, 3, 2)
+        tree.wins[[ROOT, child, grandchild]] = (4, 2, 0.5)
+
+        # The scores are reversed as noughts are to move at the new root
+        subtree = tree.subtree(child)
+        self.assertEqual(subtree.side, rules.NOUGHT)
+        self.assertTrue((subtree.board == tree.node_board(child)).all())
+        self.assertEqual(subtree.visits[ROOT], 3)
+        self.assertEqual(subtree.wins[ROOT], 1)
+        new_grandchild = subtree.child(ROOT, 6)
+        self.assertEqual(subtree.parent[new_grandchild], ROOT)
+        self.assertEqual(subtree.wins[new_grandchild], 1.5)
+        self.assertEqual(subtree.untried_count(ROOT), 5)
+        self.assertEqual(subtree.parent[ROOT], NO_NODE)
+
+    def test_transpositions(self):
+        """Tests that positions reached by different move orders share a
+        node."""
+        empty = np.zeros((3, 3), dtype=int)
+        tree = TreeStore(empty, rules.CROSS, transpositions=True)
+        nodes = []
+        for moves in ((0, 4, 8), (8, 4, 0)):
+            node = ROOT
+            board = empty.copy()
+            for move, side in zip(moves, (rules.CROSS, rules.NOUGHT,
+                    rules.CROSS)):
+                board.flat[move] = side
+                node = tree.target[tree.add_child(node, move, board)]
+            nodes.append(node)
+        self.assertEqual(nodes[0], nodes[1])
+        self.assertEqual(len(tree.table), 6)
+
+        # Corners are equivalent under symmetry, so the second is a link
+        tree = TreeStore(empty, rules.CROSS, transpositions=True,
+                symmetric=True)
+        corners = []
+        for move in (0, 8):
+            board = empty.copy()
+            board.flat[move] = rules.CROSS
+            corners.append(tree.add_child(ROOT, move, board))
+        self.assertEqual(tree.target[corners[1]], corners[0])
+        self.assertEqual(tree.untried_count(corners[1]), 0)
+        tree.visits[corners[0]] = 2
+        tree.wins[corners[0]] = 1
+        self.assertEqual(tree.score(corners[1]), 0.5)
+        self.assertEqual(sorted(tree.best_moves(ROOT)), [(0, 0), (2, 2)])
+        self.assertRaises(ValueError, tree.subtree, corners[0])
+
+    def test_view(self):
+        tree = self.tree
+        child = tree.add_child(ROOT, 2, self.board)
+        tree.visits[child] = 2
+        tree.wins[child] = 1.5
+        root = tree.view()
+        view = root.child_nodes[(0, 2)]
+        self.assertIs(view.parent, root)
+        self.assertEqual(view.id, child)
+        self.assertEqual(view.score(), 0.75)
+        self.assertEqual(str(root), rules.board_str(self.board))
 
 
 class TestMCTS(TestCase):
     def setUp(self):
-        pass
+        random.seed(1)
+
+    def test_win_single_move(self):
+        """Tests that the agents choose the correct single move to win."""
+        board = np.asarray([[-1, -1, 0], [1, 1, 0], [0, 0, 0]])
+        for agent in (MCTSAgentUCB1(max_playouts=500),
+                MCTSAgentRandom(max_playouts=500)):
+            agent.side = rules.CROSS
+            self.assertEqual(agent.move(board), (0, 2))
+
+    def test_rollout_batch(self):
+        """Tests that batched rollouts count every game in the batch."""
+        board = np.asarray([[-1, -1, 0], [1, 1, 0], [0, 0, 0]])
+        agent = MCTSAgentUCB1(max_playouts=640, rollout_batch=32,
+                convergence_limit=10 ** 6, side=rules.NOUGHT)
+        self.assertEqual(agent.move(board), (1, 2))
+        self.assertEqual(agent.playout_count, 640)
+        self.assertEqual(agent.tree.visits[ROOT], 640)
+
+    def test_expansion(self):
+        """Tests that one node is added for each playout unless every move of
+        each playout is expanded."""
+        board = np.asarray([[-1, 0, 0], [0, 1, 0], [0, 0, 0]])
+        nodes = {}
+        for expand_all in (False, True):
+            agent = MCTSAgentUCB1(time_budget=30, max_playouts=300,
+                    convergence_limit=10 ** 6, expand_all=expand_all,
+                    side=rules.CROSS)
+            agent.move(board)
+            self.assertEqual(agent.playout_count, 300)
+            nodes[expand_all] = np.count_nonzero(agent.tree.visits)
+        self.assertLessEqual(nodes[False], 301)
+        self.assertGreater(nodes[True], 2 * nodes[False])
+
+    def test_rollout_policy(self):
+        """Tests that a rollout policy adds one node for each playout."""
+        board = np.asarray([[-1, -1, 0], [0, 1, 0], [0, 0, 0]])
+        agent = MCTSAgentUCB1(max_playouts=200, side=rules.NOUGHT,
+                rollout_policy=rollout.WinBlockRollout())
+        self.assertEqual(agent.move(board), (0, 2))
+        self.assertEqual(agent.playout_count, 200)
+        self.assertLessEqual(np.count_nonzero(agent.tree.visits), 200)
+
+    def test_solver(self):
+        """Tests that proven values reach the root and stop the search."""
+        board = np.asarray([[-1, -1, 0], [1, 1, 0], [0, 0, 0]])
+        agent = MCTSAgentUCB1(max_playouts=1000, solver=True,
+                side=rules.CROSS)
+        self.assertEqual(agent.move(board), (0, 2))
+        self.assertEqual(agent.tree.proven[ROOT], 1)
+        self.assertLess(agent.playout_count, 10)
+
+        # Noughts cannot stop both lines, so the loss is proven
+        board = np.asarray([[-1, 0, -1], [0, 1, 0], [-1, 0, 1]])
+        for rollout_batch in (1, 8):
+            agent = MCTSAgentUCB1(time_budget=30, max_playouts=10 ** 5,
+                    convergence_limit=10 ** 6, solver=True,
+                    rollout_batch=rollout_batch, side=rules.NOUGHT)
+            agent.move(board)
+            self.assertEqual(agent.tree.proven[ROOT], 0)
+            self.assertLess(agent.playout_count, 10 ** 5)
+
+        # The subtree for the next move keeps the proven values of its nodes
+        subtree = agent.tree.subtree(agent.tree.children(ROOT)[0])
+        self.assertEqual(subtree.proven[ROOT], 1)
+
+    def test_minimax_leaves(self):
+        """Tests that leaves near the end of the game are valued exactly, so
+        that the win for crosses is proven."""
+        board = np.asarray([[-1, 1, 0], [0, 0, 0], [0, 0, 0]])
+        agent = MCTSAgentUCB1(max_playouts=3000, minimax_cells=5, solver=True,
+                side=rules.CROSS)
+        move = agent.move(board)
+        self.assertEqual(agent.tree.proven[ROOT], 1)
+        self.assertLess(agent.playout_count, 3000)
+        self.assertIn(move, tablebase.build(3).best_moves(board))
+
+    def test_minimax_games(self):
+        """Tests that games are played to the end when leaves valued exactly
+        become the root of a reused tree."""
+        for agent in (MCTSAgentUCB1(max_playouts=200, solver=True,
+                    minimax_cells=5),
+                MCTSAgentUCB1(max_playouts=200, solver=True, minimax_cells=5,
+                    expand_all=True),
+                MCTSAgentPUCT(max_playouts=200, solver=True, minimax_cells=5),
+                MCTSAgentPUCT(max_playouts=200, minimax_cells=5,
+                    eval_batch=4)):
+            game = TicTacToe([agent, RandomCellAgent()], shuffle=True)
+            for _ in range(15):
+                game.run()
+                self.assertTrue(rules.board_full(game.board) or
+                        rules.winner(game.board) is not None)
+
+    def test_max_nodes(self):
+        """Tests that the tree stays within the node budget, both when it is
+        pruned and when it stops growing."""
+        board = np.asarray([[-1, 0, 0], [0, 1, 0], [0, 0, 0]])
+        for prune in (True, False):
+            for rollout_batch in (1, 8):
+                agent = MCTSAgentUCB1(time_budget=30, max_playouts=1600,
+                        max_nodes=300, prune=prune, convergence_limit=10 ** 6,
+                        rollout_batch=rollout_batch, side=rules.CROSS)
+                agent.move(board)
+                self.assertLessEqual(agent.tree.capacity, 300)
+                self.assertEqual(agent.playout_count, 1600)
+                self.assertEqual(agent.prune_count > 0, prune)
+
+    def test_transpositions(self):
+        """Tests the agent in transposition and symmetry modes."""
+        board = np.asarray([[-1, -1, 0], [0, 1, 0], [0, 0, 0]])
+        for symmetries in (False, True):
+            for rollout_batch in (1, 8):
+                agent = MCTSAgentUCB1(max_playouts=2000, side=rules.NOUGHT,
+                        transpositions=True, symmetries=symmetries,
+                        rollout_batch=rollout_batch)
+                self.assertEqual(agent.move(board), (0, 2))
+                tree = agent.tree
+                self.assertEqual(tree.visits[ROOT], agent.playout_count)
+                self.assertLess(len(tree.table), tree.size)
+
+    def test_rave(self):
+        """Tests that the RAVE agent records AMAF statistics and finds the
+        winning move."""
+        board = np.asarray([[-1, -1, 0], [1, 1, 0], [0, 0, 0]])
+        for rollout_batch in (1, 8):
+            agent = MCTSAgentRAVE(max_playouts=400, side=rules.CROSS,
+                    rollout_batch=rollout_batch)
+            self.assertEqual(agent.move(board), (0, 2))
+            tree = agent.tree
+            children = tree.children(ROOT)
+            self.assertTrue((tree.amaf_visits[children] >=
+                    tree.visits[children]).all())
+            self.assertEqual(tree.visits[children].sum(), 400)
+        self.assertRaises(ValueError, MCTSAgentRAVE, symmetries=True)
+
+    def test_puct(self):
+        """Tests that the PUCT agent expands whole nodes with priors, and that
+        good priors focus the search on the best moves."""
+        board = np.asarray([[-1, -1, 0], [1, 1, 0], [0, 0, 0]])
+        for rollout_batch in (1, 8):
+            agent = MCTSAgentPUCT(max_playouts=400, side=rules.CROSS,
+                    rollout_batch=rollout_batch)
+            self.assertEqual(agent.move(board), (0, 2))
+            tree = agent.tree
+            children = tree.children(ROOT)
+            self.assertEqual(len(children), 5)
+            self.assertTrue(np.allclose(tree.prior[children], 0.2))
+            self.assertEqual(tree.visits[ROOT], 400)
+
+        # With tablebase priors and values the search is mostly spent on the
+        # optimal moves
+        table = tablebase.build(3)
+        evaluator = RankValueEvaluator(rollout.tablebase_values(table))
+        board = np.asarray([[-1, 0, 0], [0, 1, 0], [0, 0, -1]])
+        agent = MCTSAgentPUCT(max_playouts=300, convergence_limit=10 ** 6,
+                evaluator=evaluator, side=rules.NOUGHT)
+        move = agent.move(board)
+        self.assertIn(move, table.best_moves(board))
+        tree = agent.tree
+        children = tree.children(ROOT)
+        best = np.asarray([tree.cell(tree.move[child]) in
+                table.best_moves(board) for child in children])
+        self.assertGreater(tree.visits[children[best]].sum(), 200)
+        self.assertRaises(ValueError, MCTSAgentPUCT, transpositions=True)
+
+    def test_puct_batch(self):
+        """Tests that leaves evaluated in batches are all counted, with the
+        virtual losses removed."""
+        board = np.asarray([[-1, -1, 0], [1, 1, 0], [0, 0, 0]])
+        for value_weight in (0.5, 1.0):
+            agent = MCTSAgentPUCT(max_playouts=400, convergence_limit=10 ** 6,
+                    eval_batch=16, value_weight=value_weight,
+                    side=rules.NOUGHT)
+            self.assertEqual(agent.move(board), (1, 2))
+            tree = agent.tree
+            children = tree.children(ROOT)
+            self.assertEqual(tree.visits[ROOT], agent.playout_count)
+            self.assertEqual(tree.visits[children].sum() + 1,
+                    agent.playout_count)
+            self.assertTrue((tree.wins <= tree.visits).all())
+        self.assertRaises(ValueError, MCTSAgentPUCT, eval_batch=8,
+                solver=True)
+
+        # The best children are found once the virtual losses are removed
+        refreshes = []
+
+        def refresh_best_children():
+            tree = agent.tree
+            refreshes.append(tree.visits[tree.children(ROOT)].sum() + 1 ==
+                    tree.visits[ROOT])
+            MCTSAgentPUCT.refresh_best_children(agent)
+
+        agent = MCTSAgentPUCT(max_playouts=400, convergence_limit=10 ** 6,
+                eval_batch=16, side=rules.NOUGHT)
+        agent.refresh_best_children = refresh_best_children
+        agent.move(board)
+        self.assertGreater(len(refreshes), 1)
+        self.assertTrue(all(refreshes))
+
+    def test_early_stop(self):
+        """Tests that clear decisions stop early, and that the reason for
+        stopping is reported."""
+        board = np.asarray([[-1, -1, 0], [1, 1, 0], [0, 0, 0]])
+        agent = MCTSAgentUCB1(time_budget=30, max_playouts=10 ** 5,
+                convergence_limit=10 ** 6, confidence=2.0, side=rules.CROSS)
+        self.assertEqual(agent.move(board), (0, 2))
+        self.assertEqual(agent.stop_reason, mcts_ucb1.STOP_CONFIDENT)
+        self.assertLess(agent.playout_count, 1000)
+
+        # A leader that cannot be caught with the playouts left, where the
+        # bounds are too wide to separate the moves
+        agent = MCTSAgentUCB1(time_budget=30, max_playouts=300,
+                convergence_limit=10 ** 6, confidence=10.0, side=rules.CROSS)
+        move = agent.move(board)
+        self.assertEqual(agent.stop_reason, mcts_ucb1.STOP_UNREACHABLE)
+        self.assertLess(agent.playout_count, 300)
+        tree = agent.tree
+        children = tree.children(ROOT)
+        self.assertEqual(move,
+                tree.cell(tree.move[children[tree.visits[children].argmax()]]))
+
+        # A lead in visits does not stop the search when the move played is
+        # another child with a better value. The tree is reused from the
+        # position two moves earlier
+        previous = np.asarray([[-1, 0, 0], [1, 0, 0], [0, 0, 0]])
+        agent = MCTSAgentUCB1(time_budget=30, max_playouts=100,
+                convergence_limit=10 ** 6, confidence=100.0, side=rules.CROSS)
+        tree = agent.tree = agent.new_tree(previous)
+        node = tree.add_child(ROOT, 1,
+                np.asarray([[-1, -1, 0], [1, 0, 0], [0, 0, 0]]))
+        node = tree.add_child(node, 4, board)
+        for move, visits, wins in ((2, 60, 60.0), (5, 20, 5.0),
+                (6, 200, 40.0), (7, 20, 5.0), (8, 20, 5.0)):
+            child_board = board.copy()
+            child_board.flat[move] = rules.CROSS
+            child = tree.add_child(node, move, child_board)
+            tree.visits[child] = visits
+            tree.wins[child] = wins
+        tree.visits[node] = 320
+        tree.wins[node] = 115.0
+        self.assertEqual(agent.move(board), (0, 2))
+        self.assertEqual(agent.stop_reason, mcts_ucb1.STOP_PLAYOUTS)
+
+        # Other criteria
+        board = np.asarray([[-1, 0, 0], [0, 1, 0], [0, 0, 0]])
+        agent = MCTSAgentUCB1(max_playouts=100, convergence_limit=10 ** 6,
+                side=rules.CROSS)
+        agent.move(board)
+        self.assertEqual(agent.stop_reason, mcts_ucb1.STOP_PLAYOUTS)
+        agent = MCTSAgentUCB1(max_playouts=10 ** 6, convergence_limit=10,
+                side=rules.CROSS)
+        agent.move(board)
+        self.assertEqual(agent.stop_reason, mcts_ucb1.STOP_CONVERGED)
+        agent = MCTSAgentUCB1(time_budget=0.05, max_playouts=10 ** 7,
+                convergence_limit=10 ** 7, side=rules.CROSS)
+        agent.move(np.zeros((3, 3)))
+        self.assertEqual(agent.stop_reason, mcts_ucb1.STOP_TIME)
+
+    def test_halving(self):
+        """Tests that Sequential Halving spreads the playouts across the root
+        moves, and halves them each round."""
+        board = np.asarray([[-1, -1, 0], [1, 1, 0], [0, 0, 0]])
+        agent = MCTSAgentHalving(max_playouts=605, convergence_limit=10 ** 6,
+                reuse_tree=False, side=rules.CROSS)
+        self.assertEqual(agent.move(board), (0, 2))
+        tree = agent.tree
+        visits = np.sort(tree.visits[tree.children(ROOT)])
+
+        # After one playout to expand each of the five moves, the other 600
+        # are split between three rounds: the worst two moves are dropped
+        # after 40 playouts each, the next after a further 66, and the last
+        # two share the rest
+        self.assertEqual(list(visits), [41, 41, 107, 208, 208])
+
+        # Iterations may be run before the first search, as when pondering
+        agent = MCTSAgentHalving(max_playouts=100, rollout_batch=2,
+                side=rules.CROSS)
+        agent.tree = agent.new_tree(board)
+        agent.mcts(board)
+        self.assertEqual(agent.playout_count, 2)
+
+    def test_block(self):
+        """Tests that the UCB1 agent blocks an immediate threat."""
+        agent = MCTSAgentUCB1(max_playouts=2000, side=rules.NOUGHT)
+        board = np.asarray([[-1, -1, 0], [0, 1, 0], [0, 0, 0]])
+        self.assertEqual(agent.move(board), (0, 2))
+        self.assertEqual(agent.tree.visits[ROOT], agent.playout_count)
+
+    def test_best_moves(self):
+        """Tests that the incrementally tracked best moves match the tree."""
+        agent = MCTSAgentUCB1(max_playouts=300, convergence_limit=10 ** 6,
+                side=rules.CROSS)
+        moves = agent.moves(np.zeros((3, 3), dtype=int))
+        self.assertEqual(sorted(moves), sorted(agent.tree.best_moves(ROOT)))
+        self.assertEqual(agent.playout_count, 300)
+        self.assertGreater(agent.playouts_per_second, 0)
+
+    def test_reuse_tree(self):
+        """Tests that the subtree reached by the last two moves is kept."""
+        agent = MCTSAgentUCB1(max_playouts=500, side=rules.CROSS)
+        board = np.zeros((3, 3), dtype=int)
+        move = agent.move(board)
+        board[move] = rules.CROSS
+        reply = tuple(rules.empty_cells(board)[0])
+        node = agent.tree.child(ROOT, move[0] * 3 + move[1])
+        node = agent.tree.child(node, reply[0] * 3 + reply[1])
+        visits = agent.tree.visits[node]
+        board[reply] = rules.NOUGHT
+
+        agent.max_playouts = 10
+        agent.convergence_limit = 10 ** 6
+        agent.move(board)
+        self.assertEqual(agent.tree.visits[ROOT], visits + 10)
+        self.assertTrue((agent.tree.board == board).all())
+
+        # A board that cannot be reached from the tree starts a new tree
+        agent.move(np.zeros((3, 3), dtype=int))
+        self.assertEqual(agent.tree.visits[ROOT], 10)
+
+    def test_ponder(self):
+        """Tests that the search continues below the chosen move until the
+        next move, and that the subtree under the reply is reused."""
+        board = np.asarray([[-1, 0, 0], [0, 1, 0], [0, 0, 0]])
+        agent = MCTSAgentUCB1(max_playouts=200, ponder=True,
+                side=rules.CROSS)
+        move = agent.move(board)
+        self.assertEqual(agent.tree.visits[ROOT], 200)
+        time.sleep(0.5)
+        board[move] = rules.CROSS
+        board[tuple(rules.empty_cells(board)[0])] = rules.NOUGHT
+        agent.move(board)
+        self.assertGreater(agent.ponder_playouts, 0)
+        self.assertGreater(agent.tree.visits[ROOT], 200)
+        agent.close()
+        self.assertRaises(ValueError, MCTSAgentUCB1, ponder=True,
+                reuse_tree=False)
+
+    def test_root_parallel(self):
+        """Tests that root statistics are merged from parallel searches."""
+        board = np.asarray([[-1, -1, 0], [1, 1, 0], [0, 0, 0]])
+        agent = MCTSAgentUCB1(max_playouts=200, convergence_limit=10 ** 6,
+                processes=2, side=rules.CROSS)
+        try:
+            self.assertEqual(agent.move(board), (0, 2))
+            self.assertEqual(agent.playout_count, 400)
+            children = agent.tree.children(ROOT)
+            self.assertEqual(agent.tree.visits[children].sum(), 400)
+        finally:
+            agent.close()
+
+        # Root moves that link to a transposition report its statistics
+        agent = MCTSAgentUCB1(max_playouts=200, convergence_limit=10 ** 6,
+                processes=2, transpositions=True, symmetries=True,
+                side=rules.CROSS)
+        try:
+            agent.move(np.zeros((3, 3), dtype=int))
+            children = agent.tree.children(ROOT)
+            self.assertEqual(len(children), 9)
+            self.assertTrue((agent.tree.visits[children] > 0).all())
+        finally:
+            agent.close()
 
-    def test_mcts(self):
-        pass
\ No newline at end of file
+    def test_vs_simple_agent(self):
+        """Tests that the UCB1 agent does not lose to a simple agent."""
+        mcts = MCTSAgentUCB1(time_budget=10, max_playouts=2000)
+        game = TicTacToe([mcts, WinBlockRandomCellAgent()], shuffle=True)
+        for _ in range(3):
+            self.assertNotEqual(game.run(), -mcts.side)
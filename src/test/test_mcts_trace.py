@@ -0,0 +1,80 @@
+"""
+This module contains tests for the search trace recorder in the `mcts_trace`
+module.
+"""
+
+from unittest import TestCase
+import csv
+import os
+import random
+import shutil
+import tempfile
+import numpy as np
+import rules
+from agents.mcts_trace import TraceRecorder
+from agents.mcts_tree import ROOT
+from agents.mcts_ucb1 import MCTSAgentUCB1
+
+
+class TestTraceRecorder(TestCase):
+    def setUp(self):
+        random.seed(1)
+        self.board = np.asarray([[-1, 0, 0], [0, 1, 0], [0, 0, 0]])
+
+    def test_agent(self):
+        """Tests that the root statistics are sampled every interval and at
+        the end of each search."""
+        trace = TraceRecorder(interval=50)
+        agent = MCTSAgentUCB1(max_playouts=500, convergence_limit=10 ** 6,
+                reuse_tree=False, trace=trace, side=rules.CROSS)
+        agent.move(self.board)
+        samples = trace.samples()
+        self.assertEqual(list(samples['playouts']),
+                [1] + list(range(51, 501, 50)) + [500])
+        self.assertTrue((np.diff(samples['elapsed']) >= 0).all())
+        self.assertTrue(np.isnan(samples['visits'][:, [0, 4]]).all())
+
+        # The last sample matches the tree
+        tree = agent.tree
+        children = tree.children(ROOT)
+        self.assertTrue((samples['visits'][-1, tree.move[children]] ==
+                tree.visits[children]).all())
+        self.assertEqual(np.nansum(samples['visits'][-1]), 500)
+
+        agent.move(self.board)
+        self.assertEqual(list(trace.samples()['search'][-1:]), [2])
+
+    def test_ring_buffer(self):
+        """Tests that the oldest samples are overwritten."""
+        trace = TraceRecorder(capacity=3)
+        trace.begin(self.board)
+        for playouts in range(5):
+            trace.record(playouts, 0.0, [1, 2], [playouts, 1], [0, 1],
+                    [0.5, 0.5])
+        self.assertEqual(len(trace), 3)
+        self.assertEqual(list(trace.samples()['playouts']), [2, 3, 4])
+        self.assertEqual(list(trace.samples()['visits'][:, 1]), [2, 3, 4])
+
+    def test_save(self):
+        trace = TraceRecorder(interval=100)
+        agent = MCTSAgentUCB1(max_playouts=300, trace=trace,
+                side=rules.CROSS)
+        agent.move(self.board)
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'trace.npz')
+            trace.save(path)
+            data = np.load(path)
+            self.assertTrue(np.allclose(data['wins'], trace.samples()['wins'],
+                    equal_nan=True))
+
+            path = os.path.join(directory, 'trace.csv')
+            trace.save(path)
+            with open(path) as trace_file:
+                rows = list(csv.reader(trace_file))
+            self.assertEqual(rows[0][:4], ['search', 'playouts', 'elapsed',
+                    'cell'])
+            children = (~np.isnan(trace.samples()['visits'])).sum()
+            self.assertEqual(len(rows) - 1, children)
+        finally:
+            shutil.rmtree(directory)
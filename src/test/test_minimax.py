@@ -5,8 +5,11 @@ This module contains tests for the minimax agent.
 from unittest import TestCase
 from tictactoe import TicTacToe
 import numpy as np
+import rules
+import tablebase
+import benchmark
 from players import WinBlockRandomCellAgent
-from agents.minimax import MiniMaxAgent
+from agents.minimax import MiniMaxAgent, MiniMaxTable
 
 
 class TestMinimax(TestCase):
@@ -46,6 +49,24 @@ class TestMinimax(TestCase):
         minimax2 = MiniMaxAgent()
         self.win_multiple_moves(minimax1, minimax2)
 
+    def test_minimax_table(self):
+        """Tests that the cached values match the tablebase."""
+        table = tablebase.build(3)
+        minimax = MiniMaxTable()
+        values = {tablebase.WIN: 1, tablebase.DRAW: 0, tablebase.LOSS: -1}
+        for board in benchmark.positions(table, 50, seed=2):
+            board_copy = board.copy()
+            self.assertEqual(minimax.value(board, tablebase.to_move(board)),
+                    values[table.value(board)])
+            self.assertTrue((board == board_copy).all())
+
+        # Positions are looked up once cached
+        board = np.asarray([[-1, 1, -1], [0, 1, 0], [0, 0, 0]])
+        self.assertEqual(minimax.value(board, rules.CROSS), 0)
+        entries = len(minimax.table)
+        self.assertEqual(minimax.value(board, rules.CROSS), 0)
+        self.assertEqual(len(minimax.table), entries)
+
     def win_multiple_moves(self, agent1, agent2):
         """Tests that the agent chooses the correct series of moves to win."""
         # Play first, single move to create a fork
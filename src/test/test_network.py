@@ -0,0 +1,72 @@
+"""
+This module contains tests for the policy and value network in the `network`
+module.
+"""
+
+from unittest import TestCase
+import os
+import shutil
+import tempfile
+import numpy as np
+import rules
+from agents import network
+from agents.evaluators import NetworkEvaluator
+
+
+class TestNetwork(TestCase):
+    def setUp(self):
+        self.network = network.MLPNetwork((3, 3), hidden=16, seed=1)
+        self.boards = np.asarray([[-1, -1, 0, 1, 1, 0, 0, 0, 0],
+                [-1, 0, 0, 0, 1, 0, 0, 0, 0]])
+        self.players = np.asarray([rules.CROSS, rules.CROSS])
+
+    def test_predict(self):
+        priors, values = self.network.predict(self.boards, self.players)
+        self.assertEqual(priors.shape, (2, 9))
+        self.assertTrue(np.allclose(priors.sum(axis=1), 1))
+        self.assertTrue((priors[self.boards != rules.EMPTY] == 0).all())
+        self.assertTrue(((values > 0) & (values < 1)).all())
+
+        # Boards are seen from the point of view of the player to move
+        priors, values = self.network.predict(-self.boards, -self.players)
+        self.assertTrue(np.allclose(self.network.predict(self.boards,
+                self.players)[1], values))
+
+    def test_train(self):
+        """Tests that training fits the targets of a few positions."""
+        policies = np.zeros((2, 9))
+        policies[0, 2] = policies[1, 8] = 1
+        values = np.asarray([1.0, 0.5])
+        first = self.network.train(self.boards, self.players, policies,
+                values, seed=1)
+        last = self.network.train(self.boards, self.players, policies, values,
+                epochs=200, seed=1)
+        self.assertLess(last, first / 10)
+        priors, predicted = self.network.predict(self.boards, self.players)
+        self.assertEqual(list(priors.argmax(axis=1)), [2, 8])
+        self.assertTrue(np.allclose(predicted, values, atol=0.1))
+
+    def test_save_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'network.npz')
+            self.network.save(path)
+            loaded = network.load(path)
+            self.assertEqual(loaded.shape, (3, 3))
+            self.assertEqual(loaded.hidden, 16)
+            for expected, actual in zip(self.network.predict(self.boards,
+                    self.players), loaded.predict(self.boards, self.players)):
+                self.assertTrue(np.allclose(expected, actual))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_evaluator(self):
+        """Tests that the evaluator gives the same results for single
+        positions and batches."""
+        evaluator = NetworkEvaluator(self.network)
+        priors, values = evaluator.evaluate_batch(
+                self.boards.reshape(2, 3, 3), self.players)
+        prior, value = evaluator.evaluate(self.boards[1].reshape(3, 3),
+                rules.CROSS)
+        self.assertTrue(np.allclose(priors[1], prior))
+        self.assertAlmostEqual(values[1], value)
@@ -0,0 +1,83 @@
+"""
+This module contains tests for the opening book in the `opening_book` module.
+"""
+
+from unittest import TestCase
+import os
+import random
+import shutil
+import tempfile
+import numpy as np
+import rules
+from agents import opening_book
+from agents.mcts_tree import ROOT
+from agents.mcts_ucb1 import MCTSAgentUCB1
+
+
+class TestOpeningBook(TestCase):
+    def setUp(self):
+        random.seed(1)
+        self.board = np.zeros((3, 3), dtype=int)
+
+    def test_add(self):
+        """Tests that symmetric positions share their statistics."""
+        book = opening_book.OpeningBook(depth=2, prior_limit=10)
+        board = self.board.copy()
+        board[0, 0] = rules.CROSS
+        book.add(board, 40, 30)
+        board = np.zeros((3, 3), dtype=np.int8)
+        board[2, 2] = rules.CROSS
+        book.add(board, 40, 10)
+        self.assertEqual(book.stats(board), (80, 40))
+        self.assertEqual(book.prior(board), (10, 5))
+        self.assertIsNone(book.stats(self.board))
+        self.assertTrue(book.covers(board))
+        board[1, 1] = board[0, 1] = rules.NOUGHT
+        self.assertFalse(book.covers(board))
+        self.assertRaises(ValueError, book.add, np.zeros((4, 4)), 1, 1)
+
+    def test_agent(self):
+        """Tests that searches add their playouts to the book, and that new
+        trees are seeded from it."""
+        book = opening_book.OpeningBook(depth=2, prior_limit=50)
+        agent = MCTSAgentUCB1(max_playouts=300, convergence_limit=10 ** 6,
+                book=book, side=rules.CROSS)
+        agent.move(self.board)
+        self.assertEqual(book.stats(self.board)[0], 300)
+        visits = sum(book.stats(board)[0] for board in self.children())
+        self.assertEqual(visits, 300)
+
+        # A new agent starts with the book statistics as priors
+        agent = MCTSAgentUCB1(max_playouts=1, book=book, side=rules.CROSS)
+        agent.move(self.board)
+        tree = agent.tree
+        self.assertEqual(tree.child_count[ROOT], 9)
+        self.assertGreater(tree.visits[tree.children(ROOT)].min(), 1)
+        self.assertLessEqual(tree.visits[tree.children(ROOT)].max(), 51)
+        self.assertEqual(book.stats(self.board)[0], 301)
+
+    def test_save_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'book.npz')
+            book = opening_book.load(path, depth=3)
+            self.assertEqual(len(book), 0)
+            agent = MCTSAgentUCB1(max_playouts=200, book=book,
+                    side=rules.CROSS)
+            agent.move(self.board)
+            agent.finish(None)
+            loaded = opening_book.load(path)
+            self.assertEqual(loaded.depth, 3)
+            self.assertEqual(loaded.entries, book.entries)
+        finally:
+            shutil.rmtree(directory)
+
+    def children(self):
+        """Returns a board for each first move that is distinct up to
+        symmetry."""
+        boards = []
+        for cell in ((0, 0), (0, 1), (1, 1)):
+            board = self.board.copy()
+            board[cell] = rules.CROSS
+            boards.append(board)
+        return boards
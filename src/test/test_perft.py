@@ -0,0 +1,35 @@
+"""
+This module contains tests for the game tree enumeration in the `perft` module.
+"""
+
+from unittest import TestCase
+import numpy as np
+import perft
+import rules
+
+
+class TestPerft(TestCase):
+    def test_full_tree(self):
+        """Tests the well known counts for the 3x3 game tree."""
+        result = perft.perft(3, processes=2)
+        self.assertEqual(result.nodes, [1, 9, 72, 504, 3024, 15120, 54720,
+                148176, 200448, 127872])
+        self.assertEqual(len(result.states), 5478)
+        self.assertEqual(result.symmetry_classes, 765)
+        self.assertEqual(result.terminal_nodes,
+                {rules.CROSS: 131184, rules.NOUGHT: 77904, None: 46080})
+        self.assertEqual(result.terminal_states,
+                {rules.CROSS: 626, rules.NOUGHT: 316, None: 16})
+
+    def test_max_depth(self):
+        """Tests that a depth limited walk matches the permutation counts."""
+        result = perft.perft(3, 4, k=3, max_depth=4, processes=1)
+        self.assertEqual(result.nodes, [1, 12, 132, 1320, 11880])
+        self.assertEqual(sum(result.terminal_nodes.values()), 0)
+
+    def test_split_depth(self):
+        """Tests that the counts do not depend on where the tree is split."""
+        counts = [perft.perft(4, k=3, max_depth=4, processes=1,
+                split_depth=split_depth).nodes for split_depth in (0, 1, 3, 6)]
+        for nodes in counts[1:]:
+            self.assertEqual(nodes, counts[0])
@@ -0,0 +1,77 @@
+"""
+This module contains tests for the simple agents in the `players` module.
+"""
+
+from unittest import TestCase
+from tictactoe import TicTacToe
+import numpy as np
+import rules
+from players import OptimalRulesAgent, RandomCellAgent
+from agents.minimax import MiniMaxAgent
+
+
+class TestOptimalRulesAgent(TestCase):
+    def setUp(self):
+        self.agent = OptimalRulesAgent()
+
+    def test_never_loses(self):
+        """Tests that the agent does not lose against any sequence of opponent
+        moves, for every move the agent may choose, playing either side."""
+        for side in rules.sides:
+            self.agent.side = side
+            self.never_loses(np.zeros((3, 3), dtype=int), rules.CROSS)
+
+    def never_loses(self, board, player):
+        """Recursively plays every opponent move and every agent move."""
+        winner = rules.winner(board)
+        if winner is not None or rules.board_full(board):
+            self.assertNotEqual(winner, -self.agent.side, rules.board_str(board))
+            return
+
+        if player == self.agent.side:
+            moves = self.agent.moves(board)
+        else:
+            moves = [tuple(cell) for cell in rules.empty_cells(board)]
+
+        for move in moves:
+            board[move] = player
+            self.never_loses(board, -player)
+            board[move] = rules.EMPTY
+
+    def test_rules(self):
+        self.agent.side = rules.CROSS
+
+        # Win rather than block
+        board = np.asarray([[-1, -1, 0], [1, 1, 0], [0, 0, 0]])
+        self.assertEqual(self.agent.moves(board), [(0, 2)])
+
+        # Block
+        board = np.asarray([[-1, 0, 0], [1, 1, 0], [-1, 0, 0]])
+        self.assertEqual(self.agent.moves(board), [(1, 2)])
+
+        # Fork
+        board = np.asarray([[-1, 0, 1], [1, 0, 0], [-1, 0, 0]])
+        self.assertEqual(self.agent.moves(board), [(2, 2)])
+
+        # Block a double fork by forcing the opponent with a side move
+        self.agent.side = rules.NOUGHT
+        board = np.asarray([[-1, 0, 0], [0, 1, 0], [0, 0, -1]])
+        self.assertEqual(sorted(self.agent.moves(board)),
+                [(0, 1), (1, 0), (1, 2), (2, 1)])
+
+        # Centre, then opposite corner
+        board = np.asarray([[-1, 0, 0], [0, 0, 0], [0, 0, 0]])
+        self.assertEqual(self.agent.moves(board), [(1, 1)])
+        self.agent.side = rules.CROSS
+        board = np.asarray([[1, 0, 0], [0, -1, 0], [0, 0, 0]])
+        self.assertEqual(self.agent.moves(board), [(2, 2)])
+
+    def test_vs_agents(self):
+        """Tests that the agent draws against minimax and never loses to a
+        random agent."""
+        game = TicTacToe([self.agent, MiniMaxAgent()], shuffle=False)
+        self.assertEqual(game.run(), None)
+
+        game = TicTacToe([self.agent, RandomCellAgent()], shuffle=True)
+        for _ in range(20):
+            self.assertNotEqual(game.run(), -self.agent.side)
@@ -0,0 +1,58 @@
+"""
+This module contains tests for the proof-number search agent.
+"""
+
+from unittest import TestCase
+from tictactoe import TicTacToe
+import numpy as np
+import rules
+from players import WinBlockRandomCellAgent
+from agents.proof_number import ProofNumberAgent
+
+
+class TestProofNumber(TestCase):
+    def setUp(self):
+        pass
+
+    def test_solve_3x3(self):
+        """Tests that the empty 3x3 board is proven to be a draw."""
+        agent = ProofNumberAgent()
+        board = np.zeros((3, 3), dtype=int)
+        result, move = agent.solve(board, rules.CROSS)
+        self.assertEqual(result, ProofNumberAgent.DRAW)
+        self.assertTrue(rules.valid_move(board, move))
+
+    def test_solve_4x4_k3(self):
+        """Tests that the empty 4x4 board with k=3 is proven to be a win for
+        the first player."""
+        agent = ProofNumberAgent(k=3)
+        board = np.zeros((4, 4), dtype=int)
+        result, move = agent.solve(board, rules.CROSS)
+        self.assertEqual(result, ProofNumberAgent.WIN)
+        self.assertTrue(rules.valid_move(board, move))
+
+    def test_solve_single_move(self):
+        """Tests that wins and losses are proven with the correct move."""
+        agent = ProofNumberAgent()
+        board = np.asarray([[-1, -1, 0], [1, 1, 0], [0, 0, 0]])
+        self.assertEqual(agent.solve(board, rules.CROSS),
+                (ProofNumberAgent.WIN, (0, 2)))
+
+        board = np.asarray([[-1, -1, 0], [1, 0, 0], [1, 0, 0]])
+        result, _ = agent.solve(board, rules.NOUGHT)
+        self.assertEqual(result, ProofNumberAgent.LOSS)
+
+    def test_node_limit(self):
+        """Tests that an unresolved search returns no result."""
+        agent = ProofNumberAgent(k=4, max_nodes=50)
+        board = np.zeros((4, 4), dtype=int)
+        result, move = agent.solve(board, rules.CROSS)
+        self.assertEqual(result, None)
+        self.assertTrue(rules.valid_move(board, move))
+
+    def test_win_vs_simple_agent(self):
+        """Tests that the agent wins the 4x4 k=3 game when playing first."""
+        agent = ProofNumberAgent(k=3)
+        simple_agent = WinBlockRandomCellAgent()
+        game = TicTacToe([agent, simple_agent], n=4, k=3, shuffle=False)
+        self.assertEqual(game.run(), agent.side)
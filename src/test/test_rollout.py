@@ -0,0 +1,134 @@
+"""
+This module contains tests for the rollout policies in the `rollout` module.
+"""
+
+from unittest import TestCase
+import random
+import numpy as np
+import rules
+import tablebase
+from agents import rollout
+
+
+class TestRollout(TestCase):
+    def setUp(self):
+        np.random.seed(1)
+
+    def test_random_playouts(self):
+        """Tests the result frequencies of random games from the empty board,
+        which are known to be 58.5% crosses, 28.8% noughts and 12.7% draws."""
+        board = np.zeros((3, 3), dtype=int)
+        winners = rollout.random_playouts(board, rules.CROSS, 20000)
+        self.assertAlmostEqual((winners == rules.CROSS).mean(), 0.585,
+                delta=0.02)
+        self.assertAlmostEqual((winners == rules.NOUGHT).mean(), 0.288,
+                delta=0.02)
+
+    def test_terminal_boards(self):
+        board = np.asarray([[1, 1, 1], [-1, -1, 0], [-1, 0, 0]])
+        winners = rollout.random_playouts(board, rules.CROSS, 10)
+        self.assertTrue((winners == rules.NOUGHT).all())
+
+        board = np.asarray([[-1, 1, -1], [-1, 1, 1], [1, -1, -1]])
+        winners = rollout.random_playouts(board, rules.NOUGHT, 10)
+        self.assertTrue((winners == rules.EMPTY).all())
+
+    def test_forced_result(self):
+        """Tests that a game with a single cell left is finished correctly."""
+        board = np.asarray([[-1, 1, -1], [-1, 1, 1], [0, -1, 1]])
+        winners = rollout.random_playouts(board, rules.CROSS, 5)
+        self.assertTrue((winners == rules.CROSS).all())
+
+    def test_return_boards(self):
+        board = np.asarray([[-1, 0, 0], [0, 1, 0], [0, 0, 0]])
+        winners, boards = rollout.random_playouts(board, rules.CROSS, 100,
+                return_boards=True)
+        for winner, final in zip(winners, boards):
+            final = final.reshape(3, 3)
+            self.assertEqual(rules.winner(final) or rules.EMPTY, winner)
+            self.assertTrue(winner != rules.EMPTY or rules.board_full(final))
+            self.assertTrue((final[board != 0] == board[board != 0]).all())
+            crosses = np.count_nonzero(final == rules.CROSS)
+            self.assertIn(crosses - np.count_nonzero(final == rules.NOUGHT),
+                    (0, 1))
+
+    def test_scratch_playout(self):
+        """Tests that single games on the scratch board have the result
+        frequencies of random games and leave a correct final board."""
+        random.seed(1)
+        board = np.zeros((3, 3), dtype=int)
+        scratch = rollout.ScratchPlayout(board.shape)
+        winners = np.asarray([scratch.playout(board, rules.CROSS)
+                for _ in range(20000)])
+        self.assertAlmostEqual((winners == rules.CROSS).mean(), 0.585,
+                delta=0.02)
+        self.assertAlmostEqual((winners == rules.NOUGHT).mean(), 0.288,
+                delta=0.02)
+
+        board = np.asarray([[-1, 0, 0], [0, 1, 0], [0, 0, 0]])
+        for _ in range(100):
+            winner = scratch.playout(board, rules.CROSS)
+            final = scratch.board.reshape(3, 3)
+            self.assertEqual(rules.winner(final) or rules.EMPTY, winner)
+            self.assertTrue(winner != rules.EMPTY or rules.board_full(final))
+            self.assertTrue((final[board != 0] == board[board != 0]).all())
+
+        # Terminal boards are scored without playing
+        board = np.asarray([[1, 1, 1], [-1, -1, 0], [-1, 0, 0]])
+        self.assertEqual(scratch.playout(board, rules.CROSS), rules.NOUGHT)
+
+    def test_threat_cells(self):
+        board = np.asarray([[-1, -1, 0], [1, 1, 0], [-1, 0, 1]])
+        boards = board.reshape(1, -1)
+        lines = rules.lines(board.shape)
+        sums = boards[:, lines].sum(axis=2)
+        self.assertEqual(list(np.flatnonzero(rollout.threat_cells(boards,
+                lines, sums, rules.CROSS)[0])), [2])
+        self.assertEqual(list(np.flatnonzero(rollout.threat_cells(boards,
+                lines, sums, rules.NOUGHT)[0])), [5])
+
+    def test_policies(self):
+        """Tests that each policy plays legal games to a correct result."""
+        board = np.asarray([[-1, 0, 0], [0, 1, 0], [0, 0, 0]])
+        values = rollout.tablebase_values(tablebase.build(3))
+        policies = [rollout.RandomRollout(), rollout.WinFirstRollout(),
+                rollout.WinBlockRollout(),
+                rollout.EpsilonGreedyRollout(values)]
+        for policy in policies:
+            winners, boards = policy.playouts(board, rules.CROSS, 100,
+                    return_boards=True)
+            for winner, final in zip(winners, boards):
+                final = final.reshape(3, 3)
+                self.assertEqual(rules.winner(final) or rules.EMPTY, winner)
+                self.assertTrue(winner != rules.EMPTY or
+                        rules.board_full(final))
+                self.assertTrue((final[board != 0] == board[board != 0]).all())
+                crosses = np.count_nonzero(final == rules.CROSS)
+                self.assertIn(crosses - np.count_nonzero(
+                        final == rules.NOUGHT), (0, 1))
+
+        # Terminal boards are scored without playing
+        board = np.asarray([[1, 1, 1], [-1, -1, 0], [-1, 0, 0]])
+        winners = rollout.WinBlockRollout().playouts(board, rules.CROSS, 10)
+        self.assertTrue((winners == rules.NOUGHT).all())
+
+    def test_win_block(self):
+        """Tests that heavy policies take wins and block the opponent."""
+        board = np.asarray([[-1, -1, 0], [1, 1, 0], [0, 0, 0]])
+        winners = rollout.WinFirstRollout().playouts(board, rules.CROSS, 50)
+        self.assertTrue((winners == rules.CROSS).all())
+
+        # Noughts must block, after which crosses must block in turn
+        board = np.asarray([[-1, -1, 0], [0, 1, 0], [0, 0, 0]])
+        winners, boards = rollout.WinBlockRollout().playouts(board,
+                rules.NOUGHT, 50, return_boards=True)
+        self.assertTrue((boards[:, 2] == rules.NOUGHT).all())
+        self.assertTrue((boards[:, 6] == rules.CROSS).all())
+
+    def test_epsilon_greedy(self):
+        """Tests that greedy play over a perfect value table always draws."""
+        board = np.zeros((3, 3), dtype=int)
+        values = rollout.tablebase_values(tablebase.build(3))
+        policy = rollout.EpsilonGreedyRollout(values, epsilon=0.0)
+        winners = policy.playouts(board, rules.CROSS, 100)
+        self.assertTrue((winners == rules.EMPTY).all())
@@ -112,3 +112,55 @@ class TestRules(TestCase):
         expected = [[1, 0], [1, 1], [1, 2]]
         empty_cells = rules.empty_cells(board)
         np.testing.assert_array_equal(empty_cells, expected)
+
+    def test_winner_k(self):
+        # Lines shorter than the board
+        board = np.zeros((4, 4), dtype=int)
+        self.assertEqual(rules.winner(board, 3), None)
+        board[1, 1:4] = 1
+        self.assertEqual(rules.winner(board, 3), 1)
+        self.assertEqual(rules.winner(board), None)
+
+        board = np.zeros((4, 4), dtype=int)
+        board[1, 0] = board[2, 1] = board[3, 2] = -1
+        self.assertEqual(rules.winner(board, 3), -1)
+
+        board = np.zeros((4, 4), dtype=int)
+        board[0, 3] = board[1, 2] = board[2, 1] = -1
+        self.assertEqual(rules.winner(board, 3), -1)
+        board[2, 1] = 1
+        self.assertEqual(rules.winner(board, 3), None)
+
+        # Rectangular board
+        board = np.zeros((3, 5), dtype=int)
+        board[:, 4] = 1
+        self.assertEqual(rules.winner(board), 1)
+
+    def test_completes_line(self):
+        board = np.asarray([[1, 1, 1], [0, -1, 0], [-1, 0, 0]])
+        self.assertTrue(rules.completes_line(board, (0, 1)))
+        self.assertFalse(rules.completes_line(board, (1, 1)))
+        self.assertFalse(rules.completes_line(board, (1, 0)))
+        self.assertTrue(rules.completes_line(board, (1, 1), 2))
+
+        board = np.zeros((5, 5), dtype=int)
+        board[1, 4] = board[2, 3] = board[3, 2] = board[4, 1] = -1
+        self.assertTrue(rules.completes_line(board, (2, 3), 4))
+        self.assertFalse(rules.completes_line(board, (2, 3), 5))
+
+    def test_canonical(self):
+        board = np.asarray([[-1, 0, 0], [0, 1, 0], [0, 0, 0]])
+        corners = [np.rot90(board, i) for i in range(4)]
+        keys = set(rules.canonical(corner) for corner in corners)
+        self.assertEqual(len(keys), 1)
+        self.assertEqual(len(rules.symmetries(board)), 8)
+        self.assertEqual(len(rules.symmetries(np.zeros((3, 4)))), 4)
+        self.assertNotEqual(rules.canonical(board),
+                rules.canonical(np.asarray([[0, -1, 0], [0, 1, 0], [0, 0, 0]])))
+
+    def test_lines(self):
+        board = np.arange(12).reshape(3, 4) % 3 - 1
+        sums = np.concatenate([s.ravel() for s in rules.line_sums(board, 3)])
+        lines = rules.lines(board.shape, 3)
+        self.assertEqual(lines.shape, (14, 3))
+        self.assertTrue((board.ravel()[lines].sum(axis=1) == sums).all())
@@ -0,0 +1,43 @@
+"""
+This module contains tests for the self-play training in the `self_play`
+module.
+"""
+
+from unittest import TestCase
+import os
+import random
+import shutil
+import tempfile
+import numpy as np
+import self_play
+from agents.network import MLPNetwork
+
+
+class TestSelfPlay(TestCase):
+    def setUp(self):
+        random.seed(1)
+        np.random.seed(1)
+
+    def test_play(self):
+        """Tests that every searched position is recorded with a policy over
+        its empty cells and the result of the game."""
+        network = MLPNetwork((3, 3), hidden=16, seed=1)
+        samples = self_play.play(network, 2, playouts=20, eval_batch=4)
+        boards = samples['boards']
+        self.assertGreaterEqual(len(boards), 10)
+        self.assertEqual(samples['policies'].shape, boards.shape)
+        self.assertTrue(np.allclose(samples['policies'].sum(axis=1), 1))
+        self.assertTrue((samples['policies'][boards != 0] == 0).all())
+        self.assertTrue(set(samples['values']) <= set([0.0, 0.5, 1.0]))
+
+        # Positions are appended to the data file
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'data.npz')
+            self_play.save(path, samples)
+            self_play.save(path, samples)
+            self.assertEqual(len(self_play.load(path)['values']),
+                    2 * len(boards))
+        finally:
+            shutil.rmtree(directory)
+        self.assertGreater(self_play.train(network, samples, epochs=2), 0)
@@ -0,0 +1,66 @@
+"""
+This module contains tests for the tablebases defined in the `tablebase` module.
+"""
+
+from unittest import TestCase
+import os
+import shutil
+import tempfile
+import numpy as np
+import rules
+import tablebase
+
+
+class TestTablebase(TestCase):
+    def setUp(self):
+        self.table = tablebase.build(3)
+
+    def test_legal_positions(self):
+        """Tests that every legal 3x3 position is stored."""
+        values = np.unpackbits(self.table.data).reshape(-1, 4, 2)
+        known = np.count_nonzero(values.any(axis=2))
+        self.assertEqual(known, 5478)
+
+    def test_value(self):
+        board = np.zeros((3, 3), dtype=int)
+        self.assertEqual(self.table.value(board), tablebase.DRAW)
+
+        # Crosses to move and win
+        board = np.asarray([[-1, -1, 0], [1, 1, 0], [0, 0, 0]])
+        self.assertEqual(self.table.value(board), tablebase.WIN)
+        self.assertEqual(self.table.best_moves(board), [(0, 2)])
+
+        # Noughts to move but crosses have a fork
+        board = np.asarray([[-1, -1, 0], [1, 0, 0], [1, 0, -1]])
+        self.assertEqual(self.table.value(board), tablebase.LOSS)
+
+        # Crosses have already won
+        board = np.asarray([[-1, -1, -1], [1, 1, 0], [0, 0, 0]])
+        self.assertEqual(self.table.value(board), tablebase.LOSS)
+
+        # Illegal position
+        board = np.asarray([[1, 1, 0], [0, 0, 0], [0, 0, 0]])
+        self.assertEqual(self.table.value(board), tablebase.UNKNOWN)
+
+    def test_k(self):
+        """Tests that the 3x4 board with k=3 is a win for the first player."""
+        table = tablebase.build(3, 4, 3)
+        board = np.zeros((3, 4), dtype=int)
+        self.assertEqual(table.value(board), tablebase.WIN)
+        for move in table.best_moves(board):
+            board[move] = rules.CROSS
+            self.assertEqual(table.value(board), tablebase.LOSS)
+            board[move] = rules.EMPTY
+
+    def test_save_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, '3x3.tb')
+            self.table.save(path)
+            for mmap in (True, False):
+                table = tablebase.load(path, mmap)
+                self.assertEqual((table.rows, table.cols, table.k), (3, 3, 3))
+                np.testing.assert_array_equal(table.data, self.table.data)
+                del table
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,91 @@
+"""
+This module contains tests for the threat-space search agent.
+"""
+
+from unittest import TestCase
+from tictactoe import TicTacToe
+import random
+import numpy as np
+import rules
+from agents.threat_space import ThreatBoard, ThreatSpaceAgent
+
+
+class TestThreatSpace(TestCase):
+    def setUp(self):
+        random.seed(1)
+
+    def test_pattern_counts(self):
+        board = np.zeros((15, 15), dtype=int)
+        board[7, 6:9] = rules.CROSS
+        threats = ThreatBoard(board, 5)
+        np.testing.assert_array_equal(threats.pattern_counts(rules.CROSS),
+                [0, 3, 0, 2])
+        self.assertEqual(threats.four_moves(rules.CROSS),
+                set([7 * 15 + y for y in (4, 5, 9, 10)]))
+
+        # Blocking one end leaves a single closed three
+        threats.place(7 * 15 + 5, rules.NOUGHT)
+        np.testing.assert_array_equal(threats.pattern_counts(rules.CROSS),
+                [0, 1, 0, 0])
+
+        # Extending to a four gives a single winning cell
+        threats.place(7 * 15 + 9, rules.CROSS)
+        self.assertEqual(threats.winning_cells(rules.CROSS), set([7 * 15 + 10]))
+
+    def test_incremental_counts(self):
+        """Tests that incremental updates match counts calculated from
+        scratch."""
+        threats = ThreatBoard(np.zeros((15, 15), dtype=int), 5)
+        cells = random.sample(range(225), 80)
+        for i, cell in enumerate(cells):
+            threats.place(cell, rules.sides[i % 2])
+        self.assertEqual(threats.line_counts,
+                ThreatBoard(threats.board, 5).line_counts)
+
+        for cell in cells[40:]:
+            threats.remove(cell)
+        self.assertEqual(threats.line_counts,
+                ThreatBoard(threats.board, 5).line_counts)
+
+    def test_threat_sequence(self):
+        """Tests that the agent finds and plays out a winning threat
+        sequence."""
+        board = np.zeros((15, 15), dtype=int)
+        for cell in [(7, 4), (7, 5), (7, 6), (4, 7), (5, 7)]:
+            board[cell] = rules.CROSS
+        for cell in [(7, 3), (3, 7), (0, 0), (14, 14), (0, 14)]:
+            board[cell] = rules.NOUGHT
+
+        attacker = ThreatSpaceAgent(k=5)
+        defender = ThreatSpaceAgent(k=5)
+        game = TicTacToe([attacker, defender], n=15, k=5, shuffle=False)
+        self.assertEqual(game.run(board), attacker.side)
+
+    def test_refute(self):
+        """Tests that the agent blocks an open three."""
+        board = np.zeros((15, 15), dtype=int)
+        for cell in [(7, 6), (7, 7), (7, 8), (0, 0)]:
+            board[cell] = rules.CROSS
+        for cell in [(14, 14), (0, 14), (14, 0)]:
+            board[cell] = rules.NOUGHT
+        agent = ThreatSpaceAgent(k=5, side=rules.NOUGHT)
+        self.assertIn(agent.move(board), [(7, 5), (7, 9)])
+
+    def test_timeout(self):
+        """Tests that a search that runs out of time leaves the position as
+        it found it."""
+        board = np.zeros((15, 15), dtype=int)
+        cells = random.Random(4).sample(range(225), 60)
+        for i, cell in enumerate(cells):
+            board[divmod(cell, 15)] = rules.sides[i % 2]
+        self.assertIsNone(rules.winner(board, 5))
+
+        # A move with no time budget leaves the deadline in the past
+        agent = ThreatSpaceAgent(k=5, time_budget=0, side=rules.CROSS)
+        agent.move(board)
+        threats = ThreatBoard(board, 5)
+        _, complete = agent.search(threats, rules.CROSS)
+        self.assertFalse(complete)
+        np.testing.assert_array_equal(threats.board, board)
+        self.assertEqual(threats.line_counts,
+                ThreatBoard(board, 5).line_counts)
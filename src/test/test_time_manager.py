@@ -0,0 +1,131 @@
+"""
+This module contains tests for the game clock in the `time_manager` module.
+"""
+
+from unittest import TestCase
+import random
+import time
+import numpy as np
+import rules
+from tictactoe import TicTacToe
+from players import RandomCellAgent, WinBlockRandomCellAgent
+from agents.time_manager import TimeManager
+from agents.mcts_ucb1 import MCTSAgentUCB1
+from agents import mcts_ucb1
+from agents.mcts_tree import ROOT
+from agents.mcts_rave import MCTSAgentRAVE
+
+
+class TestTimeManager(TestCase):
+    def setUp(self):
+        random.seed(1)
+
+    def test_forced_move(self):
+        manager = TimeManager(1.0)
+        board = np.asarray([[-1, -1, 0], [1, 1, 0], [0, 0, 0]])
+        self.assertEqual(manager.forced_move(board, rules.CROSS), (0, 2))
+        self.assertEqual(manager.forced_move(board, rules.NOUGHT), (1, 2))
+
+        # A single threat must be blocked, but two threats cannot be
+        board = np.asarray([[-1, -1, 0], [0, 1, 0], [0, 0, 0]])
+        self.assertEqual(manager.forced_move(board, rules.NOUGHT), (0, 2))
+        board = np.asarray([[-1, 0, -1], [0, 1, 0], [-1, 0, 1]])
+        self.assertIsNone(manager.forced_move(board, rules.NOUGHT))
+        self.assertIsNone(manager.forced_move(np.zeros((3, 3)), rules.CROSS))
+
+        board = np.asarray([[-1, 1, -1], [-1, 1, 1], [1, -1, 0]])
+        self.assertEqual(manager.forced_move(board, rules.CROSS), (2, 2))
+
+    def test_budget(self):
+        """Tests that the clock is shared between the moves left."""
+        manager = TimeManager(3.0, max_factor=2.0, reserve=0.2)
+        target, limit = manager.budget(np.zeros((3, 3)))
+        self.assertAlmostEqual(target, 0.6)
+        self.assertAlmostEqual(limit, 1.2)
+
+        # A single search may not use the reserve
+        manager.update(2.5)
+        board = np.asarray([[-1, 1, -1], [-1, 1, 1], [1, 0, 0]])
+        target, limit = manager.budget(board)
+        self.assertAlmostEqual(target, 0.4)
+        self.assertAlmostEqual(limit, 0.4)
+        manager.start()
+        self.assertEqual(manager.remaining, 3.0)
+
+        # An overspent clock still gives each search a little time
+        manager.update(3.5)
+        target, limit = manager.budget(board)
+        self.assertEqual((target, limit), (0.01, 0.01))
+
+    def test_stop(self):
+        manager = TimeManager(3.0)
+        visits = np.asarray([100, 10, 10])
+
+        # The leader cannot be caught at 100 playouts a second
+        self.assertTrue(manager.stop(1.0, 100, visits, 0, 1.5, 3.0))
+        self.assertFalse(manager.stop(1.0, 100, visits, 0, 2.0, 3.0))
+
+        # The lead is measured from the move that would be played
+        self.assertFalse(manager.stop(1.0, 100, visits, 1, 1.5, 3.0))
+
+        # A close race carries on past the target, until the limit
+        visits = np.asarray([45, 40, 15])
+        self.assertFalse(manager.stop(2.5, 100, visits, 0, 2.0, 3.0))
+        self.assertTrue(manager.stop(3.0, 100, visits, 0, 2.0, 3.0))
+        self.assertTrue(manager.stop(2.5, 100, np.asarray([60, 40]), 0, 2.0,
+                3.0))
+        self.assertFalse(manager.stop(2.5, 100, np.asarray([60, 40]), 1, 2.0,
+                3.0))
+
+    def test_agent(self):
+        """Tests that an agent keeps to the game clock, and plays forced
+        moves without a search."""
+        manager = TimeManager(1.0)
+        agent = MCTSAgentRAVE(convergence_limit=10 ** 6,
+                time_manager=manager)
+        for _ in range(3):
+            start_time = time.time()
+            TicTacToe([agent, WinBlockRandomCellAgent()]).run()
+            self.assertLess(time.time() - start_time, 1.2)
+            self.assertGreater(manager.remaining, -0.1)
+
+        board = np.asarray([[-1, -1, 0], [0, 1, 0], [0, 0, 0]])
+        agent = MCTSAgentUCB1(time_manager=TimeManager(1.0),
+                side=rules.NOUGHT)
+        self.assertEqual(agent.move(board), (0, 2))
+        self.assertEqual(agent.playout_count, 0)
+        self.assertRaises(ValueError, MCTSAgentUCB1, processes=2,
+                time_manager=manager)
+
+    def test_overspent_clock(self):
+        """Tests that games end normally when the clock runs out."""
+        for game_time in (0.02, 0.0):
+            agent = MCTSAgentUCB1(time_manager=TimeManager(game_time))
+            game = TicTacToe([agent, RandomCellAgent()], shuffle=True)
+            for _ in range(10):
+                game.run()
+                self.assertTrue(rules.board_full(game.board) or
+                        rules.winner(game.board) is not None)
+
+    def test_agent_lead(self):
+        """Tests that a lead in visits does not stop the search early when
+        the move played is another child with a better value. The tree is
+        reused from the empty board."""
+        board = np.asarray([[-1, 0, 0], [0, 1, 0], [0, 0, 0]])
+        agent = MCTSAgentUCB1(max_playouts=100, convergence_limit=10 ** 6,
+                time_manager=TimeManager(1.0, max_factor=1.0),
+                side=rules.CROSS)
+        tree = agent.tree = agent.new_tree(np.zeros((3, 3), dtype=int))
+        node = tree.add_child(ROOT, 0,
+                np.asarray([[-1, 0, 0], [0, 0, 0], [0, 0, 0]]))
+        node = tree.add_child(node, 4, board)
+        for move in (1, 2, 3, 5, 6, 7, 8):
+            child_board = board.copy()
+            child_board.flat[move] = rules.CROSS
+            child = tree.add_child(node, move, child_board)
+            tree.visits[child], tree.wins[child] = ((20000, 4000.0) if
+                    move == 1 else (60, 60.0) if move == 8 else (20, 5.0))
+        tree.visits[node] = tree.visits[tree.children(node)].sum()
+        tree.wins[node] = tree.wins[tree.children(node)].sum()
+        agent.move(board)
+        self.assertEqual(agent.stop_reason, mcts_ucb1.STOP_PLAYOUTS)
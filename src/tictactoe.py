@@ -13,7 +13,8 @@ import sys
 
 class TicTacToe(object):
     """
-    This class simulates Tic-Tac-Toe (Noughts and Crosses) of size n x n.
+    This class simulates Tic-Tac-Toe (Noughts and Crosses) of size n x n, where
+    k cells in a row are required to win.
 
     It provides the simulation engine to model the flow of a single game,
     requesting moves from each player in turn and storing the state of the game
@@ -21,12 +22,15 @@ class TicTacToe(object):
 
     Attributes:
         board (numpy.ndarray): two dimensional array representing the game board
+        k (int): the number of cells in a row required to win, or None for a
+            full row of the board
         players ([Player]): list of game players
         logger (logging.Logger): logger
     """
-    def __init__(self, players, n=3, shuffle=False, logger=None):
+    def __init__(self, players, n=3, shuffle=False, logger=None, k=None):
         # Initialise the board and players
         self.board = np.zeros((n, n), dtype=np.int)
+        self.k = k
         self.logger = logger
         self.shuffle = shuffle
         self.set_players(players)
@@ -142,7 +146,7 @@ class TicTacToe(object):
             #     self.logger.debug(rules.board_str(self.board))
 
             # Check for a win or draw
-            winning_side = rules.winner(self.board)
+            winning_side = rules.winner(self.board, self.k)
             if winning_side is not None:
                 winner = self.player(winning_side)
                 if self.logger: